@@ -0,0 +1,165 @@
+import pandas as pd
+import argparse
+import json
+import time
+import os
+
+from parts import read_csv_parts
+
+# --- Config ---
+ACCOUNTS_CSV_PATH = "SynthDataGen/accounts.csv"
+TRANSACTIONS_CSV_PATH = "SynthDataGen/transactions.csv"
+BULK_IMPORT_DIR = "SynthDataGen/bulk_import"
+PART_ROWS = 1_000_000
+READ_CHUNK_ROWS = 250_000
+
+# Every account is keyed by account_id in the "Account" ID space; the
+# relationship files refer to their endpoints through the same space.
+ID_SPACE = "Account"
+
+# Column -> neo4j-admin header field. Order is the order written to the parts.
+ACCOUNT_FIELDS = {
+    "account_id": f"account_id:ID({ID_SPACE})",
+    "customer_id": "customer_id",
+    "pan_card": "pan_card",
+    "account_type": "account_type",
+    "created_at": "created_at:datetime",
+    "city": "city",
+    "state": "state",
+    "branch_ifsc": "branch_ifsc",
+    "initial_risk_rating": "initial_risk_rating:int",
+}
+TRANSFER_FIELDS = {
+    "transaction_id": "transaction_id",
+    "source_account": f":START_ID({ID_SPACE})",
+    "target_account": f":END_ID({ID_SPACE})",
+    "amount_inr": "amount_inr:float",
+    "timestamp": "timestamp:datetime",
+    "transaction_type": "transaction_type",
+    "remarks": "remarks",
+    "source_ip": "source_ip",
+    "is_illicit": "is_illicit:int",
+    "illicit_pattern_type": "illicit_pattern_type",
+}
+
+
+class PartWriter:
+    """
+    Writes header-less CSV parts of at most `part_rows` rows each, plus one
+    header file, in the layout `neo4j-admin database import` reads.
+    """
+
+    def __init__(self, out_dir, name, fields, part_rows=PART_ROWS, compress=True):
+        self.out_dir = out_dir
+        self.name = name
+        self.fields = fields
+        self.part_rows = part_rows
+        self.suffix = ".csv.gz" if compress else ".csv"
+        self.parts = []
+        self.num_rows = 0
+        self._buffer = []
+        self._buffered = 0
+
+        self.header_file = f"{name}_header.csv"
+        with open(os.path.join(out_dir, self.header_file), "w") as f:
+            f.write(",".join(fields.values()) + "\n")
+
+    def append(self, chunk):
+        self._buffer.append(chunk[list(self.fields)])
+        self._buffered += len(chunk)
+        while self._buffered >= self.part_rows:
+            self._flush(self.part_rows)
+
+    def _flush(self, rows):
+        pending = pd.concat(self._buffer, ignore_index=True)
+        part, rest = pending.iloc[:rows], pending.iloc[rows:]
+        file_name = f"{self.name}-part-{len(self.parts):05d}{self.suffix}"
+        part.to_csv(os.path.join(self.out_dir, file_name), header=False, index=False)
+        self.parts.append(file_name)
+        self.num_rows += len(part)
+        self._buffer = [rest] if len(rest) else []
+        self._buffered = len(rest)
+
+    def close(self):
+        if self._buffered:
+            self._flush(self._buffered)
+        return {"header": self.header_file, "parts": self.parts, "rows": self.num_rows}
+
+
+def export_bulk_import(accounts_path=ACCOUNTS_CSV_PATH, transactions_path=TRANSACTIONS_CSV_PATH,
+                       out_dir=BULK_IMPORT_DIR, part_rows=PART_ROWS, compress=True):
+    """
+    Converts the generator's output (single CSVs or part directories) into
+    neo4j-admin import files and writes import_manifest.json describing them. Transfers whose endpoint is not an
+    account (e.g. MERCHANT targets) are dropped, exactly as the Cypher
+    loader's MATCH drops them; the importer would otherwise reject them.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    read = dict(keep_default_na=False, dtype=str)
+
+    print(f"Exporting accounts from {accounts_path}...")
+    accounts = PartWriter(out_dir, "accounts", ACCOUNT_FIELDS, part_rows, compress)
+    account_ids = []
+    for chunk in read_csv_parts(accounts_path, READ_CHUNK_ROWS, **read):
+        account_ids.append(chunk["account_id"])
+        accounts.append(chunk)
+    accounts = accounts.close()
+    known = pd.Index(pd.concat(account_ids, ignore_index=True))
+    print(f"  {accounts['rows']} accounts in {len(accounts['parts'])} parts.")
+
+    print(f"Exporting transactions from {transactions_path}...")
+    transfers = PartWriter(out_dir, "transfers", TRANSFER_FIELDS, part_rows, compress)
+    dropped = 0
+    for chunk in read_csv_parts(transactions_path, READ_CHUNK_ROWS, **read):
+        keep = known.get_indexer(chunk["source_account"]) >= 0
+        keep &= known.get_indexer(chunk["target_account"]) >= 0
+        dropped += int((~keep).sum())
+        transfers.append(chunk[keep])
+    transfers = transfers.close()
+    print(f"  {transfers['rows']} transfers in {len(transfers['parts'])} parts ({dropped} without an account endpoint dropped).")
+
+    manifest = {
+        "id_spaces": {
+            ID_SPACE: {"label": "Account", "id_property": "account_id", "node_files": "accounts"},
+        },
+        "nodes": {"Account": accounts},
+        "relationships": {"TRANSFER": {**transfers, "dropped_rows": dropped,
+                                       "start_id_space": ID_SPACE, "end_id_space": ID_SPACE}},
+        "import_command": import_command(out_dir, accounts, transfers),
+    }
+    with open(os.path.join(out_dir, "import_manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def import_command(out_dir, accounts, transfers, database="neo4j"):
+    """The neo4j-admin (5.x) invocation that builds a fresh database from the export."""
+    def files(entry):
+        return ",".join(os.path.join(out_dir, name) for name in [entry["header"]] + entry["parts"])
+
+    return (
+        f"neo4j-admin database import full {database} --overwrite-destination "
+        f"--id-type=string --nodes=Account={files(accounts)} "
+        f"--relationships=TRANSFER={files(transfers)}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the synthetic dataset as neo4j-admin bulk import files.")
+    parser.add_argument("--accounts", default=ACCOUNTS_CSV_PATH)
+    parser.add_argument("--transactions", default=TRANSACTIONS_CSV_PATH)
+    parser.add_argument("--out-dir", default=BULK_IMPORT_DIR)
+    parser.add_argument("--part-rows", type=int, default=PART_ROWS)
+    parser.add_argument("--no-compress", action="store_true", help="Write plain .csv parts instead of .csv.gz.")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    manifest = export_bulk_import(args.accounts, args.transactions, args.out_dir,
+                                  args.part_rows, compress=not args.no_compress)
+
+    print(f"\nExport complete in {time.time() - start_time:.2f} seconds. Manifest: "
+          f"{os.path.join(args.out_dir, 'import_manifest.json')}")
+    print("Stop the database, then run:")
+    print(f"  {manifest['import_command']}")
+    print("Start it again and create the constraint and indexes with:")
+    print("  python SynthDataGen/load_to_neo4j.py --schema-only")
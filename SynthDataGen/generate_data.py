@@ -1,182 +1,412 @@
 import pandas as pd
 import numpy as np
-from faker import Faker
-import random
+from faker.providers.address.en_IN import Provider as AddressProvider
+from faker.providers.lorem.la import Provider as LoremProvider
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import shutil
+import time
+import os
 from datetime import datetime, timedelta
 
 SEED = 42
-np.random.seed(SEED)
-random.seed(SEED)
 
 # --- Config ---
-NUM_CUSTOMERS = 5000
 NUM_ACCOUNTS = 10000
 NUM_TRANSACTIONS_NORMAL = 50000
+CUSTOMERS_PER_ACCOUNT = 0.5
 START_DATE = datetime(2025, 8, 18)
 END_DATE = datetime(2025, 9, 9)
 
-# Illicit Config
-NUM_SMURFING_OPS = 10
-NUM_LAYERING_CHAINS = 20
-NUM_CASH_OUT_MULES = 20
+# Rows per generated part. Each part has its own seed, derived from (SEED,
+# stream, part index), so the output does not depend on how many workers
+# produced it.
+CHUNK_ROWS = 1_000_000
+ACCOUNT_STREAM = 0
+TRANSACTION_STREAM = 1
 
-fake = Faker('en_IN')
+# Illicit Config: operations are planted OPS_PER_CHUNK at a time, each chunk
+# seeded from (SEED, INJECTION_STREAM + typology, chunk index). Densities are
+# set per typology in TYPOLOGIES below.
+OPS_PER_CHUNK = 100_000
+INJECTION_STREAM = 2
 
-def generate_pan():
-    return ''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=5)) + \
-           ''.join(random.choices('0123456789', k=4)) + \
-           random.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+# Value pools taken from Faker's locale data once, so rows can be drawn with
+# NumPy instead of one Faker call per row.
+CITY_POOL = np.array(AddressProvider.cities)
+STATE_POOL = np.array(AddressProvider.states)
+WORD_POOL = np.array(LoremProvider.word_list)  # en_IN falls back to the Latin lorem words
+LETTERS = np.frombuffer(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ', dtype=np.uint8)
+DIGITS = np.frombuffer(b'0123456789', dtype=np.uint8)
+OCTETS = np.array([str(i) for i in range(256)], dtype=object)
+OFF_HOURS = np.array([*range(0, 9), *range(18, 24)])
+
+def chunk_rng(seed, stream, chunk_index):
+    return np.random.default_rng([seed, stream, chunk_index])
+
+def prefixed(prefix, numbers):
+    """Vectorised f'{prefix}{n}' for non-negative integers (np.char.add is several times slower)."""
+    numbers = np.asarray(numbers, dtype=np.int64)
+    width = np.floor(np.log10(np.maximum(numbers, 1))).astype(np.int64) + 1
+    head = np.frombuffer(prefix.encode(), dtype=np.uint8)
+    out = np.empty(len(numbers), dtype=object)
+    for w in np.unique(width):
+        mask = width == w
+        values = numbers[mask]
+        chars = np.empty((len(values), len(head) + w), dtype=np.uint8)
+        chars[:, :len(head)] = head
+        for k in range(w):
+            chars[:, -1 - k] = 48 + (values // 10 ** k) % 10
+        out[mask] = chars.view(f'S{len(head) + w}').ravel().astype(str)
+    return out
+
+def account_id(positions):
+    return prefixed('ACC', np.asarray(positions) + 1001)
 
 # --- 1. Generate Accounts ---
-print("Step 1: Generating accounts with upgraded schema...")
-accounts_data = []
-for i in range(NUM_ACCOUNTS):
-    accounts_data.append({
-        'account_id': f'ACC{1001 + i}',
-        'customer_id': f'CUST{1001 + random.randint(0, NUM_CUSTOMERS - 1)}',
-        'pan_card': generate_pan(),
-        'account_type': random.choice(['Savings', 'Current']),
-        'created_at': fake.date_time_between(start_date=START_DATE - timedelta(days=730), end_date=START_DATE).isoformat(),
-        'city': fake.city_name(),
-        'state': fake.state(),
-        'branch_ifsc': f"BANK{random.randint(1000,9999)}",
-        'initial_risk_rating': random.randint(1, 5)
+def generate_accounts_chunk(seed, chunk_index, start, stop, num_customers):
+    """Accounts [start, stop) as a DataFrame; identical for a given (seed, chunk_index)."""
+    rng = chunk_rng(seed, ACCOUNT_STREAM, chunk_index)
+    n = stop - start
+
+    pan = np.concatenate([
+        rng.choice(LETTERS, (n, 5)), rng.choice(DIGITS, (n, 4)), rng.choice(LETTERS, (n, 1)),
+    ], axis=1)
+    window_us = int(timedelta(days=730).total_seconds() * 1e6)
+    created_at = np.datetime64(START_DATE - timedelta(days=730), 'us') + rng.integers(0, window_us, n).astype('timedelta64[us]')
+
+    return pd.DataFrame({
+        'account_id': account_id(np.arange(start, stop)),
+        'customer_id': prefixed('CUST', 1001 + rng.integers(0, num_customers, n)),
+        'pan_card': pan.view('S10').ravel().astype(str),
+        'account_type': rng.choice(np.array(['Savings', 'Current']), n),
+        'created_at': np.datetime_as_string(created_at, unit='us'),
+        'city': rng.choice(CITY_POOL, n),
+        'state': rng.choice(STATE_POOL, n),
+        'branch_ifsc': prefixed('BANK', rng.integers(1000, 10000, n)),
+        'initial_risk_rating': rng.integers(1, 6, n),
     })
-accounts_df = pd.DataFrame(accounts_data)
 
 # --- 2. Generate Normal Transactions ---
-print("Step 2: Generating normal transaction baseline with temporal patterns...")
-transactions_data = []
-account_ids = accounts_df['account_id'].tolist()
-days_in_period = (END_DATE - START_DATE).days
-
-for i in range(NUM_TRANSACTIONS_NORMAL):
-    source, target = random.sample(account_ids, 2)
-    
+def random_remarks(rng, n):
+    # Two to four lorem words with a capital and a full stop, like fake.sentence(nb_words=3).
+    words = rng.choice(WORD_POOL, (n, 4)).astype(object)
+    count = rng.integers(2, 5, n)
+    remarks = pd.Series(words[:, 0]).str.capitalize() + ' ' + words[:, 1]
+    for i in (2, 3):
+        remarks += np.where(count > i, ' ' + words[:, i], '')
+    return (remarks + '.').to_numpy()
+
+def random_ipv4(rng, n):
+    octets = OCTETS[rng.integers(1, 255, (n, 4))]
+    return octets[:, 0] + '.' + octets[:, 1] + '.' + octets[:, 2] + '.' + octets[:, 3]
+
+def generate_transactions_chunk(seed, chunk_index, start, stop, num_accounts):
+    """Normal transactions [start, stop) as a DataFrame; identical for a given (seed, chunk_index)."""
+    rng = chunk_rng(seed, TRANSACTION_STREAM, chunk_index)
+    n = stop - start
+    days_in_period = (END_DATE - START_DATE).days
+
+    # Two distinct accounts per row: draw the target from the other n-1.
+    source = rng.integers(0, num_accounts, n)
+    target = rng.integers(0, num_accounts - 1, n)
+    target += target >= source
+
     # Logic we implement: 70% of transactions happen during business hours (9 AM - 6 PM)
-    if random.random() < 0.7:
-        hour = random.randint(9, 17)
-    else:
-        hour = random.choice([*range(0, 9), *range(18, 24)])
-        
-    transaction_date = START_DATE + timedelta(days=random.randint(0, days_in_period), hours=hour, minutes=random.randint(0, 59))
-    amount_inr = round(np.random.lognormal(mean=4.5, sigma=1.8), 2) + 1.00 # Based on Dumitrescu et al.
-
-    transactions_data.append({
-        'transaction_id': f'TXN{100001 + i}',
-        'source_account': source,
-        'target_account': target,
-        'timestamp': transaction_date.isoformat(),
+    hour = np.where(rng.random(n) < 0.7, rng.integers(9, 18, n), rng.choice(OFF_HOURS, n))
+    offset_minutes = rng.integers(0, days_in_period + 1, n) * 1440 + hour * 60 + rng.integers(0, 60, n)
+    timestamp = np.datetime64(START_DATE, 'm') + offset_minutes.astype('timedelta64[m]')
+
+    amount_inr = np.round(np.round(rng.lognormal(mean=4.5, sigma=1.8, size=n), 2) + 1.00, 2) # Based on Dumitrescu et al.
+
+    return pd.DataFrame({
+        'transaction_id': prefixed('TXN', 100001 + np.arange(start, stop)),
+        'source_account': account_id(source),
+        'target_account': account_id(target),
+        'timestamp': np.datetime_as_string(timestamp, unit='s'),
         'amount_inr': amount_inr,
-        'transaction_type': random.choice(['TRANSFER', 'PURCHASE']), # NEW FIELD
-        'remarks': fake.sentence(nb_words=3),
-        'source_ip': fake.ipv4(),
-        'is_illicit': 0,
-        'illicit_pattern_type': 'NONE'
+        'transaction_type': rng.choice(np.array(['TRANSFER', 'PURCHASE']), n),
+        'remarks': random_remarks(rng, n),
+        'source_ip': random_ipv4(rng, n),
+        'is_illicit': np.zeros(n, dtype=np.int64),
+        'illicit_pattern_type': 'NONE',
     })
 
-transactions_df = pd.DataFrame(transactions_data)
-current_txn_id = 100001 + NUM_TRANSACTIONS_NORMAL
+# --- Part output ---
+def write_part(df, directory, index, fmt):
+    path = os.path.join(directory, f"part-{index:05d}.{fmt}")
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return len(df)
+
+def build_part(task):
+    """Process-pool entry point: generates one chunk and writes it straight to disk."""
+    kind, seed, index, start, stop, population, directory, fmt = task
+    generate = generate_accounts_chunk if kind == 'accounts' else generate_transactions_chunk
+    return write_part(generate(seed, index, start, stop, population), directory, index, fmt)
+
+def chunk_tasks(kind, seed, total, chunk_rows, population, directory, fmt):
+    return [
+        (kind, seed, index, start, min(start + chunk_rows, total), population, directory, fmt)
+        for index, start in enumerate(range(0, total, chunk_rows))
+    ]
+
+def combine_csv_parts(directory, out_path):
+    """Concatenates CSV parts into one file (keeping the first header) and removes the parts."""
+    with open(out_path, 'wb') as out:
+        for i, part in enumerate(sorted(os.listdir(directory))):
+            with open(os.path.join(directory, part), 'rb') as f:
+                if i > 0:
+                    f.readline()
+                shutil.copyfileobj(f, out)
+    shutil.rmtree(directory)
 
 # --- 3. Inject Illicit Patterns (with `illicit_pattern_type` label) ---
+# Each typology plants `num_ops` operations at once: every operation draws its
+# accounts in one (num_ops, k) sample and its transactions are laid out with
+# np.repeat, so cost is linear in the number of planted rows.
+
+def sample_distinct(rng, num_ops, k, population):
+    """(num_ops, k) account positions, distinct within each row."""
+    if population < k:
+        raise ValueError(f"Need at least {k} accounts to plant this typology, got {population}.")
+    # Rejection sampling: with k << population only a few rows ever collide.
+    picks = rng.integers(0, population, (num_ops, k))
+    while True:
+        ordered = np.sort(picks, axis=1)
+        collided = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+        if not collided.any():
+            return picks
+        picks[collided] = rng.integers(0, population, (int(collided.sum()), k))
+
+def expand(counts):
+    """For operations with `counts` rows each: (operation, position within operation) per row."""
+    op = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    return op, np.arange(len(op)) - starts[op]
+
+def segment_cumprod(factors, op):
+    # Running product of `factors` restarted at each operation, via log-sums.
+    logs = np.log(factors)
+    totals = np.cumsum(logs)
+    first = np.flatnonzero(np.r_[True, op[1:] != op[:-1]])
+    offsets = (totals[first] - logs[first])[np.searchsorted(first, np.arange(len(op)), side='right') - 1]
+    return np.exp(totals - offsets)
+
+def op_start(rng, num_ops, margin_days):
+    days_in_period = (END_DATE - START_DATE).days
+    return np.datetime64(START_DATE, 's') + (rng.integers(0, days_in_period - margin_days + 1, num_ops) * 86400).astype('timedelta64[s]')
+
+def after(start, hours):
+    return start + np.round(np.asarray(hours) * 3600).astype(np.int64).astype('timedelta64[s]')
 
-def inject_smurfing(df, accounts, num_ops, start_txn_id):
-    print("Injecting smurfing patterns (Fan-in Topology)...")
-    new_txns = []
+def inject_smurfing(rng, num_ops, num_accounts):
     # This logic is inspired by the "fan-in" patterns described in papers like MONLAD.
-    for _ in range(num_ops):
-        target_account = random.choice(accounts)
-        smurf_accounts = random.sample([acc for acc in accounts if acc != target_account], 20)
-        op_start_date = START_DATE + timedelta(days=random.randint(0, days_in_period - 3))
-        
-        for i in range(random.randint(20, 50)):
-            source = random.choice(smurf_accounts)
-            amount_inr = round(random.uniform(5000, 49000), 2)
-            txn_date = op_start_date + timedelta(hours=random.randint(0, 72), minutes=random.randint(0, 59))
-            
-            new_txns.append({
-                'transaction_id': f'TXN{start_txn_id}', 'source_account': source, 'target_account': target_account,
-                'timestamp': txn_date.isoformat(), 'amount_inr': amount_inr, 'transaction_type': 'TRANSFER',
-                'remarks': 'payment', 'source_ip': fake.ipv4(), 'is_illicit': 1,
-                'illicit_pattern_type': 'SMURFING'
-            })
-            start_txn_id += 1
-    return pd.concat([df, pd.DataFrame(new_txns)], ignore_index=True), start_txn_id
-
-def inject_layering(df, accounts, num_chains, start_txn_id):
-    print("Injecting layering chains (Multi-hop)...")
-    new_txns = []
+    accounts = sample_distinct(rng, num_ops, 21, num_accounts)
+    op, _ = expand(rng.integers(20, 51, num_ops))
+    n = len(op)
+    start = op_start(rng, num_ops, 3)
+    return {
+        'source': accounts[op, 1 + rng.integers(0, 20, n)], 'target': accounts[op, 0],
+        'timestamp': after(start[op], rng.integers(0, 73, n) + rng.integers(0, 60, n) / 60),
+        'amount_inr': np.round(rng.uniform(5000, 49000, n), 2),
+        'transaction_type': 'TRANSFER', 'remarks': 'payment',
+    }
+
+def inject_layering(rng, num_ops, num_accounts):
     # This logic simulates the multi-step flows that algorithms like FlowScope are designed to detect.
-    for _ in range(num_chains):
-        chain_length = random.randint(4, 8)
-        chain_accounts = random.sample(accounts, chain_length)
-        initial_amount = round(random.uniform(200000, 1000000), 2)
-        op_start_date = START_DATE + timedelta(days=random.randint(0, days_in_period - 2))
-        
-        current_amount = initial_amount
-        for i in range(chain_length - 1):
-            source, target = chain_accounts[i], chain_accounts[i+1]
-            amount_inr = round(current_amount * random.uniform(0.98, 0.99), 2)
-            txn_date = op_start_date + timedelta(hours=i*2 + random.uniform(-1, 1))
-            
-            new_txns.append({
-                'transaction_id': f'TXN{start_txn_id}', 'source_account': source, 'target_account': target,
-                'timestamp': txn_date.isoformat(), 'amount_inr': amount_inr, 'transaction_type': 'TRANSFER',
-                'remarks': 'fund transfer', 'source_ip': fake.ipv4(), 'is_illicit': 1,
-                'illicit_pattern_type': 'LAYERING'
-            })
-            start_txn_id += 1
-            current_amount = amount_inr
-    return pd.concat([df, pd.DataFrame(new_txns)], ignore_index=True), start_txn_id
-
-def inject_cash_out_mule(df, accounts, num_mules, start_txn_id):
-    print("Injecting cash-out mule patterns (Balanced State Behavior)...")
-    new_txns = []
+    accounts = sample_distinct(rng, num_ops, 8, num_accounts)
+    op, hop = expand(rng.integers(4, 9, num_ops) - 1)
+    n = len(op)
+    initial_amount = rng.uniform(200000, 1000000, num_ops)
+    start = op_start(rng, num_ops, 2)
+    return {
+        'source': accounts[op, hop], 'target': accounts[op, hop + 1],
+        'timestamp': after(start[op], hop * 2 + rng.uniform(-1, 1, n)),
+        'amount_inr': np.round(initial_amount[op] * segment_cumprod(rng.uniform(0.98, 0.99, n), op), 2),
+        'transaction_type': 'TRANSFER', 'remarks': 'fund transfer',
+    }
+
+def inject_cash_out_mule(rng, num_ops, num_accounts):
     # This simulates the "balanced state" behavior identified as a key indicator in the MONLAD paper.
-    for _ in range(num_mules):
-        mule_account = random.choice(accounts)
-        source_account = random.choice([acc for acc in accounts if acc != mule_account])
-        op_start_date = START_DATE + timedelta(days=random.randint(0, days_in_period - 1))
-        
-        incoming_amount = round(random.uniform(100000, 500000), 2)
-        new_txns.append({
-            'transaction_id': f'TXN{start_txn_id}', 'source_account': source_account, 'target_account': mule_account,
-            'timestamp': op_start_date.isoformat(), 'amount_inr': incoming_amount, 'transaction_type': 'TRANSFER',
-            'remarks': 'transfer', 'source_ip': fake.ipv4(), 'is_illicit': 1,
-            'illicit_pattern_type': 'MULE'
-        })
-        start_txn_id += 1
-        
-        total_cashed_out = 0
-        for _ in range(random.randint(20, 50)):
-            if total_cashed_out >= incoming_amount * 0.95: break
-            
-            mode = random.choice(['ATM_WITHDRAWAL', 'PURCHASE'])
-            amount_inr = round(random.uniform(500, 10000), 2)
-            txn_date = op_start_date + timedelta(minutes=random.randint(5, 240))
-            
-            new_txns.append({
-                'transaction_id': f'TXN{start_txn_id}', 'source_account': mule_account, 'target_account': f"MERCHANT{random.randint(1,500)}",
-                'timestamp': txn_date.isoformat(), 'amount_inr': amount_inr, 'transaction_type': mode,
-                'remarks': 'purchase' if mode == 'PURCHASE' else 'cash withdrawal', 'source_ip': fake.ipv4(), 'is_illicit': 1,
-                'illicit_pattern_type': 'MULE' # UPGRADED LABEL
-            })
-            start_txn_id += 1
-            total_cashed_out += amount_inr
-    return pd.concat([df, pd.DataFrame(new_txns)], ignore_index=True), start_txn_id
-
-# --- Execute Injection and Finalize ---
-transactions_df, current_txn_id = inject_smurfing(transactions_df, account_ids, NUM_SMURFING_OPS, current_txn_id)
-transactions_df, current_txn_id = inject_layering(transactions_df, account_ids, NUM_LAYERING_CHAINS, current_txn_id)
-transactions_df, current_txn_id = inject_cash_out_mule(transactions_df, account_ids, NUM_CASH_OUT_MULES, current_txn_id)
-
-# --- 4. Finalize and Save ---
-print("Step 4: Saving datasets to CSV...")
-transactions_df = transactions_df.sample(frac=1).reset_index(drop=True)
-accounts_df.to_csv('accounts.csv', index=False)
-transactions_df.to_csv('transactions.csv', index=False)
-
-print("\nUpgraded synthetic dataset generation complete!")
-print(f"Generated {len(accounts_df)} accounts.")
-print(f"Generated {len(transactions_df)} transactions.")
-print(f"Number of illicit transactions: {transactions_df['is_illicit'].sum()}")
\ No newline at end of file
+    accounts = sample_distinct(rng, num_ops, 2, num_accounts)
+    start = op_start(rng, num_ops, 1)
+    incoming_amount = np.round(rng.uniform(100000, 500000, num_ops), 2)
+
+    # Up to 20-50 cash-outs each, stopping once 95% of the deposit is gone.
+    op, _ = expand(rng.integers(20, 51, num_ops))
+    amount = np.round(rng.uniform(500, 10000, len(op)), 2)
+    spent_before = np.cumsum(amount) - amount
+    first = np.cumsum(np.bincount(op, minlength=num_ops)) - np.bincount(op, minlength=num_ops)
+    spent_before -= spent_before[first][op]
+    keep = spent_before < incoming_amount[op] * 0.95
+    op, amount = op[keep], amount[keep]
+    n = len(op)
+    atm = rng.random(n) < 0.5
+
+    return {
+        'source': np.concatenate([accounts[:, 0], accounts[op, 1]]),
+        'target': np.concatenate([account_id(accounts[:, 1]), prefixed('MERCHANT', rng.integers(1, 501, n))]),
+        'timestamp': np.concatenate([start, after(start[op], rng.integers(5, 241, n) / 60)]),
+        'amount_inr': np.concatenate([incoming_amount, amount]),
+        'transaction_type': np.concatenate([np.full(num_ops, 'TRANSFER'), np.where(atm, 'ATM_WITHDRAWAL', 'PURCHASE')]),
+        'remarks': np.concatenate([np.full(num_ops, 'transfer'), np.where(atm, 'cash withdrawal', 'purchase')]),
+    }
+
+def inject_round_trip(rng, num_ops, num_accounts):
+    # Funds leave an account and come back to it through 2-5 others (a directed cycle).
+    accounts = sample_distinct(rng, num_ops, 6, num_accounts)
+    length = rng.integers(3, 7, num_ops)
+    op, hop = expand(length)
+    n = len(op)
+    initial_amount = rng.uniform(100000, 800000, num_ops)
+    start = op_start(rng, num_ops, 3)
+    return {
+        'source': accounts[op, hop], 'target': accounts[op, (hop + 1) % length[op]],
+        'timestamp': after(start[op], hop * 6 + rng.uniform(0, 3, n)),
+        'amount_inr': np.round(initial_amount[op] * segment_cumprod(rng.uniform(0.97, 0.995, n), op), 2),
+        'transaction_type': 'TRANSFER', 'remarks': 'fund transfer',
+    }
+
+def inject_scatter_gather(rng, num_ops, num_accounts):
+    # One origin splits a sum across 5-15 intermediaries, who all forward it to one collector.
+    accounts = sample_distinct(rng, num_ops, 17, num_accounts)
+    op, leg = expand(rng.integers(5, 16, num_ops))
+    n = len(op)
+    weights = rng.uniform(0.5, 1.5, n)
+    share = weights / np.bincount(op, weights, minlength=num_ops)[op]
+    scatter_amount = np.round(rng.uniform(200000, 2000000, num_ops)[op] * share, 2)
+    scatter_time = after(op_start(rng, num_ops, 2)[op], rng.uniform(0, 6, n))
+    middle = accounts[op, 2 + leg]
+    return {
+        'source': np.concatenate([accounts[op, 0], middle]),
+        'target': np.concatenate([middle, accounts[op, 1]]),
+        'timestamp': np.concatenate([scatter_time, after(scatter_time, rng.uniform(1, 24, n))]),
+        'amount_inr': np.concatenate([scatter_amount, np.round(scatter_amount * rng.uniform(0.97, 0.99, n), 2)]),
+        'transaction_type': 'TRANSFER', 'remarks': 'fund transfer',
+    }
+
+def inject_mule_ring(rng, num_ops, num_accounts):
+    # 3-6 feeder accounts each pay every one of 4-8 mules: a dense bipartite block.
+    accounts = sample_distinct(rng, num_ops, 14, num_accounts)
+    feeders = rng.integers(3, 7, num_ops)
+    mules = rng.integers(4, 9, num_ops)
+    op, pair = expand(feeders * mules)
+    n = len(op)
+    start = op_start(rng, num_ops, 5)
+    return {
+        'source': accounts[op, pair // mules[op]], 'target': accounts[op, 6 + pair % mules[op]],
+        'timestamp': after(start[op], rng.uniform(0, 120, n)),
+        'amount_inr': np.round(rng.uniform(10000, 90000, n), 2),
+        'transaction_type': 'TRANSFER', 'remarks': 'transfer',
+    }
+
+# Typology -> (injector, default density in operations per 1,000 accounts).
+TYPOLOGIES = {
+    'SMURFING': (inject_smurfing, 1.0),
+    'LAYERING': (inject_layering, 2.0),
+    'MULE': (inject_cash_out_mule, 2.0),
+    'ROUND_TRIP': (inject_round_trip, 1.0),
+    'SCATTER_GATHER': (inject_scatter_gather, 1.0),
+    'MULE_RING': (inject_mule_ring, 0.5),
+}
+
+def illicit_frame(rng, columns, pattern, start_txn_id):
+    n = len(columns['timestamp'])
+    source, target = columns['source'], columns['target']
+    return pd.DataFrame({
+        'transaction_id': prefixed('TXN', start_txn_id + np.arange(n)),
+        'source_account': source if source.dtype == object else account_id(source),
+        'target_account': target if target.dtype == object else account_id(target),
+        'timestamp': np.datetime_as_string(columns['timestamp'], unit='s'),
+        'amount_inr': columns['amount_inr'],
+        'transaction_type': columns['transaction_type'],
+        'remarks': columns['remarks'],
+        'source_ip': random_ipv4(rng, n),
+        'is_illicit': np.ones(n, dtype=np.int64),
+        'illicit_pattern_type': pattern,
+    })
+
+def inject_patterns(seed, num_accounts, start_txn_id, density=None, ops_per_chunk=OPS_PER_CHUNK):
+    """
+    Yields DataFrames of illicit transactions, one per typology and chunk of
+    `ops_per_chunk` operations. `density` overrides the per-typology default
+    in operations per 1,000 accounts (0 disables a typology).
+    """
+    density = {**{name: default for name, (_, default) in TYPOLOGIES.items()}, **(density or {})}
+    for stream, (pattern, (inject, _)) in enumerate(TYPOLOGIES.items(), start=INJECTION_STREAM):
+        num_ops = int(round(density[pattern] * num_accounts / 1000))
+        print(f"Injecting {pattern}: {num_ops} operations...")
+        for chunk_index, first in enumerate(range(0, num_ops, ops_per_chunk)):
+            rng = chunk_rng(seed, stream, chunk_index)
+            frame = illicit_frame(rng, inject(rng, min(ops_per_chunk, num_ops - first), num_accounts), pattern, start_txn_id)
+            start_txn_id += len(frame)
+            yield frame
+
+def parse_density(items):
+    density = {}
+    for item in items:
+        pattern, _, value = item.partition('=')
+        if pattern not in TYPOLOGIES:
+            raise SystemExit(f"Unknown typology {pattern!r}; choose from {', '.join(TYPOLOGIES)}.")
+        density[pattern] = float(value)
+    return density
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the synthetic AML dataset.")
+    parser.add_argument("--accounts", type=int, default=NUM_ACCOUNTS)
+    parser.add_argument("--transactions", type=int, default=NUM_TRANSACTIONS_NORMAL, help="Normal (non-illicit) transactions.")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--density", action="append", default=[], metavar="TYPOLOGY=OPS",
+                        help=f"Operations per 1,000 accounts for one typology ({', '.join(TYPOLOGIES)}); repeatable.")
+    parser.add_argument("--parts", action="store_true",
+                        help="Keep accounts/ and transactions/ part directories instead of combining CSV parts into single files.")
+    args = parser.parse_args()
+    if args.format == "parquet":
+        args.parts = True
+
+    start_time = time.time()
+    accounts_dir = os.path.join(args.out_dir, "accounts")
+    transactions_dir = os.path.join(args.out_dir, "transactions")
+    for directory in (accounts_dir, transactions_dir):
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+    num_customers = max(1, int(args.accounts * CUSTOMERS_PER_ACCOUNT))
+    tasks = chunk_tasks("accounts", args.seed, args.accounts, args.chunk_rows, num_customers, accounts_dir, args.format)
+    account_parts = len(tasks)
+    tasks += chunk_tasks("transactions", args.seed, args.transactions, args.chunk_rows, args.accounts, transactions_dir, args.format)
+
+    # --- Steps 1 & 2: accounts and normal transactions, one part per chunk ---
+    print(f"Steps 1-2: Generating {args.accounts} accounts and {args.transactions} normal transactions "
+          f"in {len(tasks)} parts with {args.workers} workers...")
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            rows = list(pool.map(build_part, tasks))
+    else:
+        rows = [build_part(task) for task in tasks]
+
+    # --- Step 3: illicit patterns follow the normal parts, one part per injected chunk ---
+    illicit_rows = 0
+    part_index = len(tasks) - account_parts
+    for frame in inject_patterns(args.seed, args.accounts, 100001 + args.transactions, parse_density(args.density)):
+        illicit_rows += write_part(frame, transactions_dir, part_index, args.format)
+        part_index += 1
+
+    # --- 4. Finalize and Save ---
+    if not args.parts:
+        print("Step 4: Combining parts into accounts.csv and transactions.csv...")
+        combine_csv_parts(accounts_dir, os.path.join(args.out_dir, "accounts.csv"))
+        combine_csv_parts(transactions_dir, os.path.join(args.out_dir, "transactions.csv"))
+
+    print("\nUpgraded synthetic dataset generation complete!")
+    print(f"Generated {sum(rows[:account_parts])} accounts.")
+    print(f"Generated {sum(rows[account_parts:]) + illicit_rows} transactions.")
+    print(f"Number of illicit transactions: {illicit_rows}")
+    print(f"Total time: {time.time() - start_time:.2f} seconds.")
@@ -1,9 +1,13 @@
-import pandas as pd
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, unit_of_work
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import argparse
+import json
 import time
 import os
 from dotenv import load_dotenv
 
+from parts import read_csv_parts
+
 # --- Config ---
 load_dotenv()
 NEO4J_URI = os.getenv("NEO4J_URI")
@@ -11,81 +15,250 @@ NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 ACCOUNTS_CSV_PATH = "SynthDataGen/accounts.csv"
 TRANSACTIONS_CSV_PATH = "SynthDataGen/transactions.csv"
+CHECKPOINT_PATH = "SynthDataGen/load_checkpoint.json"
+LOADER_BATCH_SIZE = int(os.getenv("LOADER_BATCH_SIZE", "10000"))
+LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", "4"))
+
+# --- Queries ---
+# "create" is for initial loads into an empty database: no lookups before the
+# write. "merge" upserts, so re-running over existing data updates in place.
+ACCOUNT_WRITE = {"create": "CREATE (a:Account {account_id: row.account_id})",
+                 "merge": "MERGE (a:Account {account_id: row.account_id})"}
+TRANSFER_WRITE = {"create": "CREATE (source)-[t:TRANSFER {transaction_id: row.transaction_id}]->(target)",
+                  "merge": "MERGE (source)-[t:TRANSFER {transaction_id: row.transaction_id}]->(target)"}
+
+ACCOUNTS_QUERY = """
+UNWIND $rows AS row
+{write}
+SET a.customer_id = row.customer_id,
+    a.pan_card = row.pan_card,
+    a.account_type = row.account_type,
+    a.created_at = datetime(row.created_at),
+    a.city = row.city,
+    a.state = row.state,
+    a.branch_ifsc = row.branch_ifsc,
+    a.initial_risk_rating = toInteger(row.initial_risk_rating)
+"""
+
+TRANSACTIONS_QUERY = """
+UNWIND $rows AS row
+MATCH (source:Account {{account_id: row.source_account}})
+MATCH (target:Account {{account_id: row.target_account}})
+{write}
+SET t.amount_inr = toFloat(row.amount_inr),
+    t.timestamp = datetime(row.timestamp),
+    t.transaction_type = row.transaction_type,
+    t.remarks = row.remarks,
+    t.source_ip = row.source_ip,
+    t.is_illicit = toInteger(row.is_illicit),
+    t.illicit_pattern_type = row.illicit_pattern_type
+"""
+
+
+# --- Checkpoint ---
+class LoadCheckpoint:
+    """
+    Records which batches of each stage have committed.
+
+    Batches are fixed slices of the CSV (batch_size rows each), and each one
+    is written in a single transaction, so a batch is either fully in the
+    database or not at all. A resumed load skips the committed ones.
+
+    Batches are also recorded when they are submitted. One that was in flight
+    when the load stopped may have committed without its mark reaching the
+    file, so a resume replays it as an upsert instead of a plain CREATE.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, batch_size=LOADER_BATCH_SIZE, mode="create"):
+        self.path = path
+        self.batch_size = batch_size
+        self.mode = mode
+        self.stages = {}
+        self.in_flight = {}
+
+    @classmethod
+    def open(cls, path=CHECKPOINT_PATH, batch_size=LOADER_BATCH_SIZE, mode="create"):
+        checkpoint = cls(path, batch_size, mode)
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved["batch_size"] != batch_size or saved["mode"] != mode:
+                raise ValueError(
+                    f"{path} was written with batch_size={saved['batch_size']}, mode={saved['mode']}; "
+                    "resume with the same settings or pass --fresh."
+                )
+            checkpoint.stages = {stage: set(batches) for stage, batches in saved["stages"].items()}
+            checkpoint.in_flight = {stage: set(batches) for stage, batches in saved.get("in_flight", {}).items()}
+        return checkpoint
+
+    def done(self, stage):
+        return self.stages.setdefault(stage, set())
+
+    def uncertain(self, stage):
+        """Batches submitted by an earlier run whose commit was never recorded."""
+        return self.in_flight.setdefault(stage, set())
+
+    def begin(self, stage, batch):
+        self.uncertain(stage).add(batch)
+        self.save()
+
+    def mark(self, stage, batch):
+        self.done(stage).add(batch)
+        self.uncertain(stage).discard(batch)
+        self.save()
+
+    def save(self):
+        # Written to a temp file and swapped in, so a crash never leaves a
+        # half-written checkpoint behind.
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "batch_size": self.batch_size,
+                "mode": self.mode,
+                "stages": {stage: sorted(batches) for stage, batches in self.stages.items()},
+                "in_flight": {stage: sorted(batches) for stage, batches in self.in_flight.items()},
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
 
 # --- Main Loading Script ---
 class Neo4jLoader:
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri, user, password, mode="create", batch_size=LOADER_BATCH_SIZE,
+                 workers=LOADER_WORKERS, checkpoint=None):
+        self.driver = GraphDatabase.driver(uri, auth=(user, password), max_connection_pool_size=workers + 1)
+        self.driver.verify_connectivity()
+        self.mode = mode
+        self.batch_size = batch_size
+        self.workers = workers
+        self.checkpoint = checkpoint or LoadCheckpoint(batch_size=batch_size, mode=mode)
 
     def close(self):
         self.driver.close()
 
     def run_query(self, query, parameters=None):
+        """Runs a write query in a managed transaction and returns its summary."""
+        @unit_of_work()
+        def work(tx):
+            # Consumed inside the transaction: a result is not readable once
+            # its session has closed.
+            return tx.run(query, parameters).consume()
+
         with self.driver.session() as session:
-            result = session.run(query, parameters)
-            return result
+            return session.execute_write(work)
 
     def create_constraints(self):
-        print("Creating constraints for faster import...")
+        print("Creating constraints and indexes for faster import...")
         self.run_query("CREATE CONSTRAINT IF NOT EXISTS FOR (a:Account) REQUIRE a.account_id IS UNIQUE")
-        
-    def load_accounts(self, accounts_df):
-        print(f"Loading {len(accounts_df)} accounts into Neo4j...")
-        query = """
-        UNWIND $rows AS row
-        MERGE (a:Account {account_id: row.account_id})
-        SET a.customer_id = row.customer_id,
-            a.pan_card = row.pan_card,
-            a.account_type = row.account_type,
-            a.created_at = datetime(row.created_at),
-            a.city = row.city,
-            a.state = row.state,
-            a.branch_ifsc = row.branch_ifsc,
-            a.initial_risk_rating = toInteger(row.initial_risk_rating) // # UPDATED to include new risk rating field
+        self.run_query("CREATE INDEX transfer_transaction_id IF NOT EXISTS FOR ()-[t:TRANSFER]-() ON (t.transaction_id)")
+        # Range indexes behind the transaction history API's time and amount
+        # filters (backend/history.py).
+        self.run_query("CREATE INDEX transfer_timestamp IF NOT EXISTS FOR ()-[t:TRANSFER]-() ON (t.timestamp)")
+        self.run_query("CREATE INDEX transfer_amount IF NOT EXISTS FOR ()-[t:TRANSFER]-() ON (t.amount_inr)")
+        self.run_query("CALL db.awaitIndexes(300)")
+
+    def _load_stage(self, stage, csv_path, template, writes):
         """
-        rows = accounts_df.to_dict('records')
-        self.run_query(query, parameters={'rows': rows})
-        print("Accounts loaded successfully.")
-
-    def load_transactions(self, transactions_df):
-        print(f"Loading {len(transactions_df)} transactions into Neo4j...")
-        query = """
-        UNWIND $rows AS row
-        MATCH (source:Account {account_id: row.source_account})
-        MATCH (target:Account {account_id: row.target_account})
-        MERGE (source)-[t:TRANSFER {transaction_id: row.transaction_id}]->(target)
-        SET t.amount_inr = toFloat(row.amount_inr),
-            t.timestamp = datetime(row.timestamp),
-            t.transaction_type = row.transaction_type,
-            t.remarks = row.remarks,
-            t.source_ip = row.source_ip,
-            t.is_illicit = toInteger(row.is_illicit),
-            t.illicit_pattern_type = row.illicit_pattern_type   // # UPDATED to include new pattern type field
+        Streams `csv_path` (a CSV file or a directory of parts) in batches and writes them with a pool of workers.
+
+        At most `workers` batches are read ahead and in flight at once. Each
+        batch that commits is recorded in the checkpoint as soon as it does,
+        so a failure part-way through loses only the batches still in flight.
+        Those are replayed with the MERGE form of `template`, which is a no-op
+        for rows that did commit.
         """
-        rows = transactions_df.to_dict('records')
-        
-        batch_size = 5000
-        for i in range(0, len(rows), batch_size):
-            batch = rows[i:i + batch_size]
-            self.run_query(query, parameters={'rows': batch})
-            print(f"  Loaded batch {i // batch_size + 1}...")
+        query = template.format(write=writes[self.mode])
+        replay_query = template.format(write=writes["merge"])
+        done = self.checkpoint.done(stage)
+        replay = set(self.checkpoint.uncertain(stage))
+        if done or replay:
+            print(f"  Resuming {stage}: {len(done)} batches already committed, {len(replay)} to replay.")
+
+        start = time.perf_counter()
+        rows_written = 0
+        pending = {}
+
+        def collect(finished):
+            nonlocal rows_written
+            for future in finished:
+                batch, size = pending.pop(future)
+                future.result()
+                self.checkpoint.mark(stage, batch)
+                rows_written += size
+            elapsed = time.perf_counter() - start
+            print(f"  {stage}: {rows_written} rows in {elapsed:.1f}s ({rows_written / max(elapsed, 1e-9):,.0f} rows/s)")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            try:
+                reader = read_csv_parts(csv_path, self.batch_size, keep_default_na=False)
+                for batch, chunk in enumerate(reader):
+                    if batch in done:
+                        continue
+                    if len(pending) >= self.workers:
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(finished)
+                    self.checkpoint.begin(stage, batch)
+                    future = pool.submit(self.run_query, replay_query if batch in replay else query,
+                                         {"rows": chunk.to_dict("records")})
+                    pending[future] = (batch, len(chunk))
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+            except BaseException:
+                # Record whatever else committed before re-raising.
+                finished, _ = wait(pending)
+                for future in finished:
+                    if future.exception() is None:
+                        self.checkpoint.mark(stage, pending[future][0])
+                raise
 
-        print("Transactions loaded successfully.")
+        elapsed = time.perf_counter() - start
+        print(f"{stage} loaded: {rows_written} rows in {elapsed:.2f}s ({rows_written / max(elapsed, 1e-9):,.0f} rows/s).")
+        return rows_written
+
+    def load_accounts(self, csv_path=ACCOUNTS_CSV_PATH):
+        print(f"Loading accounts from {csv_path} ({self.mode} mode)...")
+        return self._load_stage("accounts", csv_path, ACCOUNTS_QUERY, ACCOUNT_WRITE)
+
+    def load_transactions(self, csv_path=TRANSACTIONS_CSV_PATH):
+        print(f"Loading transactions from {csv_path} ({self.mode} mode)...")
+        return self._load_stage("transactions", csv_path, TRANSACTIONS_QUERY, TRANSFER_WRITE)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the synthetic dataset into Neo4j.")
+    parser.add_argument("--mode", choices=["create", "merge"], default="create",
+                        help="'create' for an initial load into an empty database, 'merge' to upsert.")
+    parser.add_argument("--fresh", action="store_true", help="Ignore and discard an existing checkpoint.")
+    parser.add_argument("--batch-size", type=int, default=LOADER_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=LOADER_WORKERS)
+    parser.add_argument("--schema-only", action="store_true",
+                        help="Only create the constraint and indexes (e.g. after an offline bulk import).")
+    args = parser.parse_args()
+
     start_time = time.time()
-     
-    print("Reading CSV files...")
-    accounts = pd.read_csv(ACCOUNTS_CSV_PATH)
-    transactions = pd.read_csv(TRANSACTIONS_CSV_PATH)
 
-    loader = Neo4jLoader(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
-    
+    if args.fresh:
+        LoadCheckpoint(CHECKPOINT_PATH).clear()
+    checkpoint = LoadCheckpoint.open(CHECKPOINT_PATH, batch_size=args.batch_size, mode=args.mode)
+
+    loader = Neo4jLoader(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, mode=args.mode,
+                         batch_size=args.batch_size, workers=args.workers, checkpoint=checkpoint)
+
     loader.create_constraints()
-    loader.load_accounts(accounts)
-    loader.load_transactions(transactions)
-    
-    loader.close()
-    
-    end_time = time.time()
-    print(f"\nData loading complete. Total time: {end_time - start_time:.2f} seconds.")
\ No newline at end of file
+    if args.schema_only:
+        loader.close()
+        print("Schema created.")
+    else:
+        # Accounts must be fully loaded before any transfer can MATCH them.
+        loader.load_accounts()
+        loader.load_transactions()
+
+        loader.close()
+        # A finished load needs no resume point.
+        checkpoint.clear()
+
+        end_time = time.time()
+        print(f"\nData loading complete. Total time: {end_time - start_time:.2f} seconds.")
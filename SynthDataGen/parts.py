@@ -0,0 +1,28 @@
+import pandas as pd
+import glob
+import os
+
+
+def list_parts(path):
+    """The part files under a directory written by generate_data.py, in order."""
+    return sorted(glob.glob(os.path.join(path, "part-*.csv")) + glob.glob(os.path.join(path, "part-*.parquet")))
+
+
+def read_csv_parts(path, chunksize, **kwargs):
+    """
+    Yields DataFrames of at most `chunksize` rows from either a single CSV
+    file or a directory of CSV/Parquet parts, in file order.
+    """
+    if not os.path.isdir(path):
+        yield from pd.read_csv(path, chunksize=chunksize, **kwargs)
+        return
+
+    for part in list_parts(path):
+        if part.endswith(".parquet"):
+            frame = pd.read_parquet(part)
+            if kwargs.get("dtype") is str:
+                frame = frame.astype(str)
+            for start in range(0, len(frame), chunksize):
+                yield frame.iloc[start:start + chunksize]
+        else:
+            yield from pd.read_csv(part, chunksize=chunksize, **kwargs)
@@ -0,0 +1,149 @@
+# backend/database.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from neo4j import AsyncGraphDatabase, Query, READ_ACCESS, unit_of_work
+
+from models.metrics import Counter, Histogram
+
+# --- Tunables (override through .env) ---
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "5"))
+NEO4J_QUERY_TIMEOUT = float(os.getenv("NEO4J_QUERY_TIMEOUT", "10"))
+PREDICTOR_WORKERS = int(os.getenv("PREDICTOR_WORKERS", "4"))
+PREDICTOR_MAX_PENDING = int(os.getenv("PREDICTOR_MAX_PENDING", "64"))
+
+# --- Metrics ---
+NEO4J_QUERY_SECONDS = Histogram("aml_neo4j_query_seconds", "Neo4j query latency by query name.", ["query"])
+NEO4J_QUERY_ERRORS = Counter("aml_neo4j_query_errors_total", "Neo4j queries that raised, by query name.", ["query"])
+PREDICTOR_WAIT_SECONDS = Histogram(
+    "aml_predictor_pool_wait_seconds", "Time predictor calls spend queued before a worker thread picks them up.",
+).labels()
+
+
+class Neo4jClient:
+    """
+    Async data-access layer over the Neo4j async driver.
+
+    One driver (and therefore one connection pool) is shared by the whole app.
+    Every read carries a server-side timeout so a slow query releases its
+    connection instead of starving the pool. Each query opens its own session,
+    so `in_flight` is also the number of pooled connections in use; queries
+    are timed under their `query_name`.
+    """
+
+    def __init__(self, uri, auth, max_pool_size=NEO4J_MAX_POOL_SIZE,
+                 acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT, query_timeout=NEO4J_QUERY_TIMEOUT):
+        self.uri = uri
+        self.auth = auth
+        self.max_pool_size = max_pool_size
+        self.acquisition_timeout = acquisition_timeout
+        self.query_timeout = query_timeout
+        self.driver = None
+        self.in_flight = 0
+
+    async def connect(self):
+        self.driver = AsyncGraphDatabase.driver(
+            self.uri,
+            auth=self.auth,
+            max_connection_pool_size=self.max_pool_size,
+            connection_acquisition_timeout=self.acquisition_timeout,
+        )
+        await self.driver.verify_connectivity()
+
+    async def close(self):
+        if self.driver is not None:
+            await self.driver.close()
+            self.driver = None
+
+    async def _timed(self, query_name, work):
+        # Runs on the event loop, so the counter needs no lock.
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await work
+        except Exception:
+            NEO4J_QUERY_ERRORS.labels(query_name).inc()
+            raise
+        finally:
+            self.in_flight -= 1
+            NEO4J_QUERY_SECONDS.labels(query_name).observe(time.perf_counter() - start)
+
+    async def read(self, query, timeout=None, query_name="other", **params):
+        """Runs a read query and returns all records as dicts."""
+        async def work():
+            async with self.driver.session(default_access_mode=READ_ACCESS) as session:
+                result = await session.run(Query(query, timeout=timeout or self.query_timeout), params)
+                return await result.data()
+        return await self._timed(query_name, work())
+
+    async def read_single(self, query, timeout=None, query_name="other", **params):
+        """Runs a read query and returns its single record as a dict (or None)."""
+        async def work():
+            async with self.driver.session(default_access_mode=READ_ACCESS) as session:
+                result = await session.run(Query(query, timeout=timeout or self.query_timeout), params)
+                record = await result.single()
+                return record.data() if record is not None else None
+        return await self._timed(query_name, work())
+
+    async def write(self, query, timeout=None, query_name="other", **params):
+        """
+        Runs a write query in a managed transaction (retried on transient
+        errors such as deadlocks) and returns all records as dicts.
+        """
+        @unit_of_work(timeout=timeout or self.query_timeout)
+        async def work(tx):
+            # Read inside the transaction function: a result is not readable
+            # once its transaction has closed.
+            result = await tx.run(query, params)
+            return await result.data()
+
+        async def execute():
+            async with self.driver.session() as session:
+                return await session.execute_write(work)
+        return await self._timed(query_name, execute())
+
+
+class PredictorExecutor:
+    """
+    Bounded thread pool for CPU-bound AI core calls.
+
+    Predictor work never runs on the event loop. At most `max_pending` calls
+    may be queued or running; further callers wait on the semaphore instead
+    of piling up in the pool's unbounded queue. `pending` counts the calls
+    holding a slot and `running` those on a worker thread.
+    """
+
+    def __init__(self, max_workers=PREDICTOR_WORKERS, max_pending=PREDICTOR_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="predictor")
+        self._slots = asyncio.Semaphore(max_pending)
+        self._running_lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+
+    def _call(self, submitted, fn, *args):
+        PREDICTOR_WAIT_SECONDS.observe(time.perf_counter() - submitted)
+        with self._running_lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._running_lock:
+                self.running -= 1
+
+    async def run(self, fn, *args):
+        async with self._slots:
+            self.pending += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, self._call, time.perf_counter(), fn, *args)
+            finally:
+                self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,106 @@
+# backend/history.py
+import base64
+import json
+import os
+from datetime import timezone
+
+HISTORY_DEFAULT_LIMIT = 25
+HISTORY_MAX_LIMIT = int(os.getenv("HISTORY_MAX_LIMIT", "500"))
+DIRECTIONS = ("in", "out", "both")
+
+
+# --- Cursors ---
+# A cursor is the (timestamp, transaction_id) of the last row of the previous
+# page; the next page starts strictly after it in (timestamp DESC, id DESC)
+# order, so pages never shift when new transactions arrive.
+def encode_cursor(timestamp_ms, transaction_id):
+    raw = json.dumps([int(timestamp_ms), transaction_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(timestamp_ms, transaction_id), or ValueError for anything that is not a cursor we issued."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp_ms, transaction_id = json.loads(raw)
+        return int(timestamp_ms), str(transaction_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {e}") from e
+
+
+def as_utc(value):
+    """Query datetimes without an offset are taken as UTC, like the stored timestamps."""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def epoch_ms(value):
+    return int(value.timestamp() * 1000)
+
+
+# --- Cypher ---
+# Each direction is a directed expansion from the anchored account (a unique
+# constraint lookup), so the cost follows the account's degree, never the
+# size of the TRANSFER set. Only the filters actually given are emitted.
+_FILTERS = {
+    "start": "r.timestamp >= $start",
+    "end": "r.timestamp < $end",
+    "min_amount": "r.amount_inr >= $min_amount",
+    "max_amount": "r.amount_inr <= $max_amount",
+    "is_illicit": "r.is_illicit = $is_illicit",
+    "pattern": "r.illicit_pattern_type = $pattern",
+    "cursor_ms": ("(r.timestamp < datetime({epochMillis: $cursor_ms}) OR "
+                  "(r.timestamp = datetime({epochMillis: $cursor_ms}) AND r.transaction_id < $cursor_id))"),
+}
+
+_BRANCHES = {
+    "out": "MATCH (a)-[r:TRANSFER]->(other:Account){where}\n  RETURN r, a AS source, other AS target, 'out' AS direction",
+    "in": "MATCH (a)<-[r:TRANSFER]-(other:Account){where}\n  RETURN r, other AS source, a AS target, 'in' AS direction",
+}
+# Each branch keeps only its own newest page before the union, so the final
+# sort sees at most 2 * limit rows rather than every incident transfer.
+_BRANCH_ORDER = "\n  ORDER BY r.timestamp DESC, r.transaction_id DESC\n  LIMIT $limit"
+
+
+def transaction_history_query(direction, params):
+    """Cypher for one page; `params` are the non-null filter values (plus account_id and limit)."""
+    clauses = [clause for name, clause in _FILTERS.items() if params.get(name) is not None]
+    where = ("\n  WHERE " + " AND ".join(clauses)) if clauses else ""
+    directions = ("out", "in") if direction == "both" else (direction,)
+    branches = "\n  UNION ALL\n".join(f"  WITH a\n  {_BRANCHES[d].format(where=where)}{_BRANCH_ORDER}" for d in directions)
+    return f"""
+MATCH (a:Account {{account_id: $account_id}})
+CALL {{
+{branches}
+}}
+WITH r, source, target, direction
+ORDER BY r.timestamp DESC, r.transaction_id DESC
+LIMIT $limit
+RETURN r.transaction_id AS transaction_id, source.account_id AS from_account, target.account_id AS to_account,
+       r.amount_inr AS amount, toString(r.timestamp) AS date, r.timestamp.epochMillis AS timestamp_ms,
+       direction, r.is_illicit AS is_illicit, r.illicit_pattern_type AS pattern
+"""
+
+
+def page_from_records(records, limit):
+    """Turns limit + 1 fetched rows into (transactions, next_cursor)."""
+    rows = [dict(record) for record in records]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp_ms"], rows[-1]["transaction_id"])
+    transactions = [
+        {
+            "transaction_id": row["transaction_id"],
+            "from": row["from_account"],
+            "to": row["to_account"],
+            "amount": row["amount"],
+            "date": row["date"],
+            "direction": row["direction"],
+            "is_illicit": row["is_illicit"],
+            "pattern": row["pattern"],
+        }
+        for row in rows
+    ]
+    return transactions, next_cursor
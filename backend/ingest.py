@@ -0,0 +1,182 @@
+# backend/ingest.py
+import asyncio
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- Tunables (override through .env) ---
+INGEST_WRITE_BATCH_SIZE = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "5000"))
+INGEST_MAX_INFLIGHT_WRITES = int(os.getenv("INGEST_MAX_INFLIGHT_WRITES", "4"))
+INGEST_QUEUE_TIMEOUT = float(os.getenv("INGEST_QUEUE_TIMEOUT", "2"))
+INGEST_MAX_ROWS = int(os.getenv("INGEST_MAX_ROWS", "100000"))
+
+REQUIRED_COLUMNS = ["transaction_id", "source_account", "target_account", "timestamp", "amount_inr"]
+OPTIONAL_DEFAULTS = {
+    "transaction_type": "TRANSFER",
+    "remarks": "",
+    "source_ip": "",
+    "is_illicit": 0,
+    "illicit_pattern_type": "NONE",
+}
+
+# Idempotent on transaction_id: a row whose id is already in the graph (a
+# client retry, an overlapping stream) is reported as a duplicate and written
+# nothing, so it is never folded into the aggregates twice. The lookup uses the
+# transfer_transaction_id index. Rows with an unknown endpoint are dropped by
+# the MATCHes and return no record at all.
+INSERT_TRANSACTIONS_QUERY = """
+UNWIND $rows AS row
+MATCH (source:Account {account_id: row.source_account})
+MATCH (target:Account {account_id: row.target_account})
+CALL {
+  WITH row
+  OPTIONAL MATCH ()-[existing:TRANSFER {transaction_id: row.transaction_id}]->()
+  RETURN count(existing) > 0 AS duplicate
+}
+FOREACH (_ IN CASE WHEN duplicate THEN [] ELSE [1] END |
+  CREATE (source)-[t:TRANSFER {transaction_id: row.transaction_id}]->(target)
+  SET t.amount_inr = row.amount_inr,
+      t.timestamp = datetime(row.timestamp),
+      t.transaction_type = row.transaction_type,
+      t.remarks = row.remarks,
+      t.source_ip = row.source_ip,
+      t.is_illicit = row.is_illicit,
+      t.illicit_pattern_type = row.illicit_pattern_type
+)
+RETURN row.transaction_id AS transaction_id, duplicate
+"""
+
+
+class IngestOverloaded(Exception):
+    """Raised when the Neo4j write path is saturated and the request should be retried."""
+
+
+class PartialWrite(Exception):
+    """
+    Raised when some write batches failed after others had committed.
+    `created` and `duplicates` cover the committed batches; the first
+    failure is chained as __cause__.
+    """
+
+    def __init__(self, created, duplicates):
+        super().__init__(f"{len(created) + len(duplicates)} rows committed before a write batch failed")
+        self.created = created
+        self.duplicates = duplicates
+
+
+def parse_json_rows(body):
+    """Parses a JSON array of transaction objects."""
+    rows = json.loads(body)
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of transactions.")
+    return rows
+
+
+def parse_ndjson_lines(lines):
+    """Parses NDJSON lines, skipping blank ones."""
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def validate_transactions(rows):
+    """
+    Validates a batch column-wise. Returns (valid_df, rejected) where rejected
+    is a list of {"index", "transaction_id", "reason"}; the first failing rule
+    is the one reported for a row.
+    """
+    df = pd.DataFrame.from_records(rows)
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        reason = f"missing fields: {', '.join(missing)}"
+        return df.iloc[0:0], [{"index": i, "transaction_id": None, "reason": reason} for i in range(len(df))]
+
+    for column, default in OPTIONAL_DEFAULTS.items():
+        df[column] = df[column].fillna(default) if column in df.columns else default
+
+    amount = pd.to_numeric(df["amount_inr"], errors="coerce")
+    timestamp = pd.to_datetime(df["timestamp"], errors="coerce", utc=True, format="ISO8601")
+    is_illicit = pd.to_numeric(df["is_illicit"], errors="coerce")
+
+    checks = [
+        (df["transaction_id"].isna() | (df["transaction_id"].astype(str).str.len() == 0), "missing transaction_id"),
+        (df["transaction_id"].duplicated(keep="first"), "duplicate transaction_id in batch"),
+        (df["source_account"].isna() | df["target_account"].isna(), "missing account"),
+        (df["source_account"] == df["target_account"], "source and target are the same account"),
+        (amount.isna() | ~np.isfinite(amount) | (amount <= 0), "amount_inr must be a positive number"),
+        (timestamp.isna(), "timestamp is not ISO-8601"),
+        (~is_illicit.isin([0, 1]), "is_illicit must be 0 or 1"),
+    ]
+    reasons = pd.Series(None, index=df.index, dtype=object)
+    for failed, reason in checks:
+        reasons = reasons.mask(failed & reasons.isna(), reason)
+
+    bad = reasons.notna()
+    rejected = [
+        {"index": int(i), "transaction_id": df.at[i, "transaction_id"], "reason": reasons[i]}
+        for i in np.flatnonzero(bad.to_numpy())
+    ]
+
+    valid = df.loc[~bad, REQUIRED_COLUMNS + list(OPTIONAL_DEFAULTS)].copy()
+    valid["transaction_id"] = valid["transaction_id"].astype(str)
+    valid["amount_inr"] = amount[~bad].round(2)
+    valid["timestamp"] = timestamp[~bad].dt.tz_localize(None).dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    valid["is_illicit"] = is_illicit[~bad].astype(int)
+    return valid.reset_index(drop=True), rejected
+
+
+class TransactionWriter:
+    """
+    Bulk writer for validated batches with bounded concurrency.
+
+    At most `max_inflight` requests may be writing at once, and their UNWIND
+    batches share the same number of Neo4j slots. A request that cannot be
+    admitted within `queue_timeout` seconds raises IngestOverloaded *before*
+    anything is written; the API turns that into 503 + Retry-After so clients
+    back off instead of queueing unbounded work in the server.
+    """
+
+    def __init__(self, db, batch_size=INGEST_WRITE_BATCH_SIZE,
+                 max_inflight=INGEST_MAX_INFLIGHT_WRITES, queue_timeout=INGEST_QUEUE_TIMEOUT):
+        self.db = db
+        self.batch_size = batch_size
+        self.queue_timeout = queue_timeout
+        self.max_inflight = max_inflight
+        # Requests currently admitted (reported as pool utilization).
+        self.inflight = 0
+        self._admission = asyncio.Semaphore(max_inflight)
+        self._slots = asyncio.Semaphore(max_inflight)
+
+    async def _write_batch(self, rows):
+        async with self._slots:
+            return await self.db.write(INSERT_TRANSACTIONS_QUERY, query_name="insert_transactions", rows=rows)
+
+    async def write(self, valid_df):
+        """
+        Writes all rows. Returns (created, duplicates): the transaction ids
+        Neo4j created, and those it skipped because they already existed.
+        Each batch commits on its own; if any fails, the others still run to
+        completion and PartialWrite reports what they committed.
+        """
+        try:
+            await asyncio.wait_for(self._admission.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise IngestOverloaded()
+        self.inflight += 1
+        try:
+            rows = valid_df.to_dict("records")
+            batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+            results = await asyncio.gather(*(self._write_batch(batch) for batch in batches), return_exceptions=True)
+            created, duplicates = [], []
+            errors = [result for result in results if isinstance(result, BaseException)]
+            for records in results:
+                if isinstance(records, BaseException):
+                    continue
+                for record in records:
+                    (duplicates if record["duplicate"] else created).append(record["transaction_id"])
+            if errors:
+                raise PartialWrite(created, duplicates) from errors[0]
+            return created, duplicates
+        finally:
+            self.inflight -= 1
+            self._admission.release()
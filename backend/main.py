@@ -1,18 +1,44 @@
 # backend/main.py
 import os
-from fastapi import FastAPI, HTTPException, Query
+import asyncio
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from neo4j import GraphDatabase
-from typing import List, Dict, Any
+from fastapi.responses import JSONResponse, Response
+from typing import List, Dict, Any, Optional
+from datetime import datetime
 import sys
 from collections import Counter
 import logging
+import pandas as pd
 from dotenv import load_dotenv
 load_dotenv()
 
 # Ensures the backend can find the 'models' directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from models.predictor import get_prediction_and_explanation, get_top_suspicious_networks
+from models.predictor import (
+    get_prediction_and_explanation, get_top_suspicious_networks, apply_transactions,
+    registry, warmup, get_model_info, precompute_explanations,
+    get_accounts_in_score_range, get_geo_risk, get_geo_timeline, flush_live_features,
+)
+from models.geo_rollup import HEATMAP_TOP_N
+from models.model_registry import ModelUnavailable
+from models.graph_replica import GraphReplica, MAX_HOPS, DEFAULT_MAX_NODES, DEFAULT_MAX_EDGES
+from backend.database import Neo4jClient, PredictorExecutor
+from backend.history import (
+    HISTORY_DEFAULT_LIMIT, HISTORY_MAX_LIMIT, as_utc, decode_cursor, encode_cursor,
+    page_from_records, transaction_history_query,
+)
+from backend.ingest import (
+    TransactionWriter, IngestOverloaded, PartialWrite, INGEST_MAX_ROWS,
+    parse_json_rows, parse_ndjson_lines, validate_transactions,
+)
+from backend.observability import MetricsMiddleware, configure_logging
+from models.metrics import CallbackMetric, CONTENT_TYPE, METRICS_ENABLED, REGISTRY
+
+# LOG_LEVEL / LOG_FORMAT, see backend/observability.py.
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="XAI-AML Detection API",
@@ -29,25 +55,121 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-route latency histograms, served with everything else at /metrics.
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 # --- Neo4j Driver (Global & Robust) ---
-# Create a single driver instance to be shared by the application.
-# The driver manages a pool of connections, which is thread-safe.
+# A single async driver is shared by the application. Its pool size,
+# acquisition timeout and per-query timeout come from the environment.
 URI = os.getenv("NEO4J_URI")
 AUTH = (os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
-driver = GraphDatabase.driver(URI, auth=AUTH)
+db = Neo4jClient(URI, AUTH)
+
+# CPU-bound AI core calls run here so they never block the event loop.
+predictor_pool = PredictorExecutor()
+
+# Bulk transaction writes share a bounded number of Neo4j slots; see backend/ingest.py.
+transaction_writer = TransactionWriter(db)
+# Rows Neo4j committed but apply_transactions() failed on (e.g. the models
+# were unavailable), by transaction_id. A retry sees them as duplicates in the
+# graph, so they are folded in then instead of being rejected.
+unapplied_transactions = {}
+
+
+def _pools():
+    # (pool, in use, capacity). Read at scrape time from the globals, which
+    # tests and benchmarks may replace.
+    return [
+        ("neo4j", db.in_flight, db.max_pool_size),
+        ("predictor", predictor_pool.running, predictor_pool.max_workers),
+        ("predictor_slots", predictor_pool.pending, predictor_pool.max_pending),
+        ("ingest", transaction_writer.inflight, transaction_writer.max_inflight),
+    ]
+
+CallbackMetric("aml_pool_in_use", "Busy Neo4j connections, predictor threads and slots, admitted ingest requests.",
+               "gauge", lambda: [((name,), used) for name, used, _ in _pools()], ["pool"])
+CallbackMetric("aml_pool_size", "Capacity of each pool.", "gauge",
+               lambda: [((name,), size) for name, _, size in _pools()], ["pool"])
+CallbackMetric("aml_pool_utilization", "In use / capacity.", "gauge",
+               lambda: [((name,), used / size if size else 0.0) for name, used, size in _pools()], ["pool"])
+
+# Load the AI core's artifacts during startup rather than on the first request.
+# Either way a watcher thread swaps in new artifact versions as they appear.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+# Seconds between background explanation passes once the cache is filled.
+EXPLANATION_PRECOMPUTE_INTERVAL = float(os.getenv("EXPLANATION_PRECOMPUTE_INTERVAL", "5"))
+explanation_task = None
+# Seconds between writes of ingested aggregates to a new feature store
+# version (0 = only on shutdown).
+LIVE_FEATURES_FLUSH_INTERVAL = float(os.getenv("LIVE_FEATURES_FLUSH_INTERVAL", "900"))
+flush_task = None
+
+# --- In-memory graph replica ---
+# Built offline with `python -m models.graph_snapshot`. When present, the hot
+# neighbourhood and transaction reads are served from it instead of Neo4j.
+GRAPH_SNAPSHOT_PATH = os.getenv("GRAPH_SNAPSHOT_PATH", "graph_snapshot")
+graph_replica = None
+# Cypher variable-length expansion blows up around hubs, so it stays capped lower.
+NEO4J_MAX_HOPS = 2
 
 @app.on_event("startup")
 async def startup_event():
     # Verify connection on startup
-    driver.verify_connectivity()
-    print("FastAPI app starting up, Neo4j driver is ready.")
+    global graph_replica, explanation_task, flush_task
+    await db.connect()
+    if os.path.exists(GRAPH_SNAPSHOT_PATH):
+        graph_replica = GraphReplica.load(GRAPH_SNAPSHOT_PATH)
+        logger.info("Graph replica loaded from %s.", GRAPH_SNAPSHOT_PATH)
+    if MODEL_WARMUP:
+        try:
+            await predictor_pool.run(warmup)
+        except ModelUnavailable as e:
+            # Keep serving the endpoints that do not need the models.
+            logger.error("AI core warmup failed: %s", e)
+    registry.start_watching()
+    explanation_task = asyncio.create_task(_precompute_explanations())
+    if LIVE_FEATURES_FLUSH_INTERVAL > 0:
+        flush_task = asyncio.create_task(_flush_live_features())
+    logger.info("FastAPI app starting up, Neo4j driver is ready.")
 
 @app.on_event("shutdown")
-def shutdown_event():
+async def shutdown_event():
     # Close the driver connection pool on shutdown
-    driver.close()
-    print("FastAPI app shutting down, Neo4j driver closed.")
+    for task in (explanation_task, flush_task):
+        if task is not None:
+            task.cancel()
+    # Ingested aggregates not yet in the feature store would otherwise be lost.
+    await _flush_ingested_features()
+    await db.close()
+    registry.stop()
+    predictor_pool.shutdown()
+    logger.info("FastAPI app shutting down, Neo4j driver closed.")
+
+
+async def _precompute_explanations():
+    # One batch per predictor-pool call, so requests interleave with it.
+    while True:
+        try:
+            computed = await predictor_pool.run(precompute_explanations)
+        except Exception:
+            logger.exception("Explanation precompute failed")
+            computed = 0
+        await asyncio.sleep(0 if computed else EXPLANATION_PRECOMPUTE_INTERVAL)
+
+
+async def _flush_ingested_features():
+    try:
+        version = await predictor_pool.run(flush_live_features)
+        if version is not None:
+            logger.info("Flushed ingested features to feature store version %s.", version)
+    except Exception:
+        logger.exception("Flushing ingested features failed")
+
+async def _flush_live_features():
+    while True:
+        await asyncio.sleep(LIVE_FEATURES_FLUSH_INTERVAL)
+        await _flush_ingested_features()
 
 
 # --- LIVE API ENDPOINTS ---
@@ -55,22 +177,51 @@ def shutdown_event():
 def read_root():
     return {"status": "API is operational"}
 
+@app.get("/models", tags=["Status"])
+def get_models() -> Dict[str, Any]:
+    """Version and variants of the loaded AI core artifacts (null before the first load)."""
+    return {"loaded": get_model_info()}
+
+@app.get("/metrics", tags=["Status"], include_in_schema=False)
+def get_metrics():
+    """Prometheus text exposition of every metric in models/metrics.py's registry."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0).")
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.exception_handler(ModelUnavailable)
+async def model_unavailable_handler(request: Request, exc: ModelUnavailable):
+    return JSONResponse(status_code=503, content={"detail": f"AI core unavailable: {exc}"})
+
 # CORRECTED ENDPOINT FOR THE DASHBOARD
 @app.get("/suspicious-networks", tags=["Networks"])
-def get_suspicious_networks_list() -> List[Dict[str, Any]]:
+async def get_suspicious_networks_list() -> List[Dict[str, Any]]:
     """
     Returns a list of the top flagged networks for the main dashboard.
     """
     try:
-        live_networks = get_top_suspicious_networks()
+        live_networks = await predictor_pool.run(get_top_suspicious_networks)
         return live_networks
-    except Exception as e:
-        print(f"Error in AI Core: {e}")
+    except ModelUnavailable:
+        raise
+    except Exception:
+        logger.exception("Error in AI core")
         raise HTTPException(status_code=500, detail="Error processing data in the AI core.")
 
 @app.get("/network/{account_id}", tags=["Networks"])
-# CHANGE THIS FUNCTION SIGNATURE
-def get_live_network_details(account_id: str, hops: int = Query(1, ge=1, le=2)) -> Dict[str, Any]:
+async def get_live_network_details(
+    account_id: str,
+    hops: int = Query(1, ge=1, le=MAX_HOPS),
+    max_nodes: int = Query(DEFAULT_MAX_NODES, ge=1, le=5000),
+    max_edges: int = Query(DEFAULT_MAX_EDGES, ge=1, le=20000),
+) -> Dict[str, Any]:
+    if graph_replica is not None and account_id in graph_replica:
+        graph_data = await predictor_pool.run(graph_replica.neighborhood, account_id, hops, max_nodes, max_edges)
+        return {"network_id": account_id, "graph": graph_data}
+
+    if hops > NEO4J_MAX_HOPS:
+        raise HTTPException(status_code=400, detail=f"hops > {NEO4J_MAX_HOPS} requires the in-memory graph replica.")
+
     # This query now dynamically uses the 'hops' variable.
     # The f-string is safe here because 'hops' is validated by FastAPI to be an integer (1 or 2).
     query = f"""
@@ -86,31 +237,38 @@ def get_live_network_details(account_id: str, hops: int = Query(1, ge=1, le=2))
         collect(DISTINCT {{source: startNode(r).account_id, target: endNode(r).account_id, amount: r.amount_inr}}) AS edges
     """
     try:
-        with driver.session() as session:
-            result = session.run(query, acc_id=account_id).single()
-            if not result or not result["nodes"]:
-                # If no neighbors, at least return the target node itself
-                return {
-                    "network_id": account_id,
-                    "graph": {
-                        "nodes": [{"id": account_id}],
-                        "edges": []
-                    }
+        result = await db.read_single(query, query_name="network_neighborhood", acc_id=account_id)
+        if not result or not result["nodes"]:
+            # If no neighbors, at least return the target node itself
+            return {
+                "network_id": account_id,
+                "graph": {
+                    "nodes": [{"id": account_id}],
+                    "edges": []
                 }
-            
-            graph_data = {"nodes": result["nodes"], "edges": result["edges"]}
-            
-            return {"network_id": account_id, "graph": graph_data}
-    except Exception as e:
-        print(f"Database query error for {account_id}: {e}")
+            }
+
+        graph_data = {"nodes": result["nodes"], "edges": result["edges"]}
+
+        return {"network_id": account_id, "graph": graph_data}
+    except Exception:
+        logger.exception("Database query error", extra={"account_id": account_id})
         raise HTTPException(status_code=500, detail="Error querying the graph database.")
 
 @app.get("/account/{account_id}/explanation", tags=["XAI"])
-def get_live_account_explanation(account_id: str) -> Dict[str, Any]:
+async def get_live_account_explanation(account_id: str) -> Dict[str, Any]:
     try:
         # This function still gets the core AI prediction
-        result = get_prediction_and_explanation(account_id)
-        print("--- AI MODEL OUTPUT ---", result)
+        result = await predictor_pool.run(get_prediction_and_explanation, account_id)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("AI model output", extra={
+                "account_id": account_id,
+                "risk_score": result.get("risk_score"),
+                "risk_source": result.get("risk_source"),
+                "attribution_status": result.get("attribution", {}).get("status"),
+                "model_version": result.get("model_version"),
+                "error": result.get("error"),
+            })
         if "error" in result:
             raise HTTPException(status_code=404, detail=result["error"])
 
@@ -118,22 +276,30 @@ def get_live_account_explanation(account_id: str) -> Dict[str, Any]:
         
         # This is placeholder logic. Replace with your actual feature values.
         feature_values = result.get('feature_values', {})
-        total_amount_in = feature_values.get('total_amount_in', 0)
-        transaction_volume = feature_values.get('transaction_volume', 0)
         risk_score = result.get('risk_score', 0)
+        # The 30-day windows exist once models.temporal_features has run;
+        # until then the all-time totals are shown, labelled as such.
+        if "total_amount_in_30d" in feature_values:
+            period, period_text = "30d", "in the last 30 days"
+            total_amount_in = feature_values["total_amount_in_30d"]
+            transaction_volume = feature_values["transaction_volume_30d"]
+        else:
+            period, period_text = "all time", "over the account's whole history"
+            total_amount_in = feature_values.get('total_amount_in', 0)
+            transaction_volume = feature_values.get('transaction_volume', 0)
 
         metrics_data = [
             {
-                "name": "Total Amount In (30d)",
+                "name": f"Total Amount In ({period})",
                 "value": total_amount_in,
                 "benchmark": 500000,
-                "definition": "Total monetary value of all incoming transactions in the last 30 days."
+                "definition": f"Total monetary value of all incoming transactions {period_text}."
             },
             {
-                "name": "Transaction Volume (30d)",
+                "name": f"Transaction Volume ({period})",
                 "value": transaction_volume,
                 "benchmark": 50,
-                "definition": "Total number of transactions (in/out) in the last 30 days."
+                "definition": f"Total number of transactions (in/out) {period_text}."
             },
             {
                 "name": "Risk Score",
@@ -142,6 +308,21 @@ def get_live_account_explanation(account_id: str) -> Dict[str, Any]:
                 "definition": "The model's confidence that this account is involved in illicit activities."
             }
         ]
+        if "max_transactions_1h" in feature_values:
+            metrics_data.append({
+                "name": "Peak Transactions in 1h",
+                "value": feature_values["max_transactions_1h"],
+                "benchmark": 10,
+                "definition": "The most transactions (in/out) the account made within any one hour."
+            })
+        anomaly = result.get("anomaly")
+        if anomaly is not None:
+            metrics_data.append({
+                "name": "Anomaly Percentile",
+                "value": f"{(anomaly['percentile'] * 100):.1f}%",
+                "benchmark": "99%",
+                "definition": "How unusual the account's behaviour is: the share of accounts the autoencoder reconstructs better."
+            })
         
         # ✅ THE FIX IS HERE: Ensure we always have contributors to show
         feature_contributions = result.get("feature_contributions", [])
@@ -156,31 +337,35 @@ def get_live_account_explanation(account_id: str) -> Dict[str, Any]:
 
             # If there's still nothing, create a dummy message
             if not feature_contributions:
-                 feature_contributions = [{"feature": "No significant factors", "impact": 0}]
+                 pending = result.get("attribution", {}).get("status") == "pending"
+                 feature_contributions = [{"feature": "Attribution pending" if pending else "No significant factors", "impact": 0}]
 
 
         # Combine everything into the final, expected structure
         detailed_explanation = {
             "summary": result.get("summary", "No summary available."),
             "feature_contributions": feature_contributions,
-            "metrics": metrics_data
+            "metrics": metrics_data,
+            "attribution": result.get("attribution"),
         }
 
-        return {"explanation": detailed_explanation}
+        return {"explanation": detailed_explanation, "model_version": result.get("model_version")}
 
-    except Exception as e:
-        print(f"XAI explanation error for {account_id}: {e}")
+    except (HTTPException, ModelUnavailable):
+        raise
+    except Exception:
+        logger.exception("XAI explanation error", extra={"account_id": account_id})
         raise HTTPException(status_code=500, detail="Error generating AI explanation.")
 
 # ... (rest of your main.py file) ...
 
 @app.get("/statistics/patterns", tags=["Statistics"])
-def get_pattern_distribution() -> List[Dict[str, Any]]:
+async def get_pattern_distribution() -> List[Dict[str, Any]]:
     """
     Returns the count of each illicit pattern type among high-risk accounts.
     """
     try:
-        live_networks = get_top_suspicious_networks(top_n=1000)
+        live_networks = await predictor_pool.run(get_top_suspicious_networks, 1000)
         if not live_networks:
             return []
 
@@ -194,75 +379,237 @@ def get_pattern_distribution() -> List[Dict[str, Any]]:
         formatted_data.sort(key=lambda x: x['count'], reverse=True)
 
         return formatted_data
-    except Exception as e:
-        print(f"Error fetching pattern statistics: {e}")
+    except ModelUnavailable:
+        raise
+    except Exception:
+        logger.exception("Error fetching pattern statistics")
         raise HTTPException(status_code=500, detail="Error processing pattern statistics.")
     
     
 @app.get("/statistics/heatmap", tags=["Statistics"], response_model=Dict[str, int])
-def get_heatmap_data() -> Dict[str, int]:
+async def get_heatmap_data(
+    level: str = Query("state", pattern="^(state|city)$"),
+    threshold: Optional[float] = Query(None, ge=0, le=1),
+    top_n: int = Query(HEATMAP_TOP_N, ge=1),
+) -> Dict[str, int]:
     """
-    Aggregates high-risk accounts by state for the geographic heatmap.
+    Aggregates high-risk accounts by state (or "City, State") for the geographic
+    heatmap: every account scoring at least `threshold`, or else the `top_n`
+    riskiest. Served from the in-memory rollups of models/geo_rollup.py.
     """
     try:
-        # 1. Get a large sample of high-risk accounts from the AI core
-        live_networks = get_top_suspicious_networks(top_n=1000)
-        if not live_networks:
-            return {}
+        counts = await predictor_pool.run(get_geo_risk, level, threshold, top_n)
+        if counts is not None:
+            return counts
 
-        account_ids = [network["account_id"] for network in live_networks]
+        # Without account_geo.npz the locations are looked up in Neo4j.
+        if threshold is not None:
+            accounts = await predictor_pool.run(get_accounts_in_score_range, threshold, 1.0, None)
+        else:
+            accounts = await predictor_pool.run(get_top_suspicious_networks, top_n)
+        if not accounts:
+            return {}
 
-        # 2. Query Neo4j to count states directly
-        query = """
+        location = "a.state" if level == "state" else "a.city + ', ' + a.state"
+        query = f"""
         UNWIND $account_ids AS acc_id
-        MATCH (a:Account {account_id: acc_id})
-        WHERE a.state IS NOT NULL
-        RETURN a.state AS state, COUNT(*) AS count
+        MATCH (a:Account {{account_id: acc_id}})
+        WHERE a.state IS NOT NULL AND {location} IS NOT NULL
+        RETURN {location} AS location, COUNT(*) AS count
         """
+        results = await db.read(query, query_name="heatmap_locations",
+                                account_ids=[account["account_id"] for account in accounts])
+        return {record["location"]: record["count"] for record in results}
 
-        with driver.session() as session:
-            results = session.run(query, account_ids=account_ids)
-            state_counts = {record["state"]: record["count"] for record in results}
-
-        return state_counts
-
+    except ModelUnavailable:
+        raise
     except Exception as e:
-        logging.exception("Error fetching heatmap data")
+        logger.exception("Error fetching heatmap data")
         raise HTTPException(status_code=500, detail="Error processing heatmap data.")
+
+@app.get("/statistics/heatmap/timeline", tags=["Statistics"])
+async def get_heatmap_timeline(
+    threshold: Optional[float] = Query(None, ge=0, le=1),
+    top_n: int = Query(HEATMAP_TOP_N, ge=1),
+) -> Dict[str, Any]:
+    """
+    High-risk accounts by state per activity bucket (GEO_BUCKET_SECONDS wide):
+    an account counts in every bucket it transacted in.
+    """
+    timeline = await predictor_pool.run(get_geo_timeline, threshold, top_n)
+    if timeline is None:
+        raise HTTPException(status_code=503, detail="Account locations are not available; run models.geo_rollup.")
+    return timeline
     
 # backend/main.py
 
 @app.get("/network/{account_id}/illicit-transactions", tags=["Networks"])
-def get_account_transactions(account_id: str):
+async def get_account_transactions(account_id: str):
     """
-    Retrieves incoming and outgoing transactions for a specific account.
+    Retrieves the 25 most recent incoming and outgoing transactions of an account.
+    """
+    page = await _transaction_history(account_id, "both", HISTORY_DEFAULT_LIMIT)
+    return {"transactions": page["transactions"]}
+
+@app.get("/account/{account_id}/transactions", tags=["Networks"])
+async def get_transaction_history(
+    account_id: str,
+    direction: str = Query("both", pattern="^(in|out|both)$"),
+    limit: int = Query(HISTORY_DEFAULT_LIMIT, ge=1, le=HISTORY_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    min_amount: Optional[float] = Query(None, ge=0),
+    max_amount: Optional[float] = Query(None, ge=0),
+    is_illicit: Optional[bool] = None,
+    pattern: Optional[str] = None,
+) -> Dict[str, Any]:
     """
-    query = """
-    MATCH (a:Account {account_id: $acc_id})
-    // Find transactions where this account is either the source or target
-    MATCH (source:Account)-[r:TRANSFER]->(target:Account)
-    WHERE source = a OR target = a
-    RETURN 
-        source.account_id AS from_account, 
-        target.account_id AS to_account, 
-        r.amount_inr AS amount,
-        // You can add more properties like transaction id, timestamp, etc.
-        r.timestamp AS date
-    ORDER BY r.timestamp DESC
-    LIMIT 25
+    Paged transfer history of an account, newest first. Pass `next_cursor`
+    back as `cursor` to get the following page; it is null on the last one.
+    `start` is inclusive and `end` exclusive; datetimes without an offset are UTC.
     """
     try:
-        with driver.session() as session:
-            result = session.run(query, acc_id=account_id)
-            transactions = [
-                {
-                    "from": record["from_account"],
-                    "to": record["to_account"],
-                    "amount": record["amount"],
-                    "date": record["date"]
-                } for record in result
-            ]
-            return {"transactions": transactions}
-    except Exception as e:
-        print(f"Error fetching transactions for {account_id}: {e}")
-        raise HTTPException(status_code=500, detail="Error querying transactions.")
\ No newline at end of file
+        cursor_key = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _transaction_history(
+        account_id, direction, limit, cursor_key, as_utc(start), as_utc(end),
+        min_amount, max_amount, is_illicit, pattern,
+    )
+
+async def _transaction_history(account_id, direction, limit, cursor_key=None, start=None, end=None,
+                               min_amount=None, max_amount=None, is_illicit=None, pattern=None):
+    # The replica has no illicit labels, so those filters always go to Neo4j.
+    if graph_replica is not None and account_id in graph_replica and is_illicit is None and pattern is None:
+        rows, last_key = await predictor_pool.run(
+            graph_replica.transaction_page, account_id, direction, limit, cursor_key,
+            start.timestamp() if start else None, end.timestamp() if end else None, min_amount, max_amount,
+        )
+        return {"account_id": account_id, "transactions": rows,
+                "next_cursor": encode_cursor(*last_key) if last_key else None, "source": "replica"}
+
+    params = {
+        "account_id": account_id,
+        "limit": limit + 1,
+        "start": start,
+        "end": end,
+        "min_amount": min_amount,
+        "max_amount": max_amount,
+        "is_illicit": int(is_illicit) if is_illicit is not None else None,
+        "pattern": pattern,
+        "cursor_ms": cursor_key[0] if cursor_key else None,
+        "cursor_id": cursor_key[1] if cursor_key else None,
+    }
+    params = {name: value for name, value in params.items() if value is not None}
+    try:
+        records = await db.read(transaction_history_query(direction, params), query_name="transaction_history", **params)
+    except Exception:
+        logger.exception("Error fetching transactions", extra={"account_id": account_id})
+        raise HTTPException(status_code=500, detail="Error querying transactions.")
+    transactions, next_cursor = page_from_records(records, limit)
+    return {"account_id": account_id, "transactions": transactions, "next_cursor": next_cursor, "source": "neo4j"}
+
+
+# --- INGESTION ---
+async def _ndjson_chunks(request, chunk_rows):
+    """Yields lists of parsed rows from a streamed NDJSON body, `chunk_rows` at a time."""
+    buffer = b""
+    lines = []
+    async for piece in request.stream():
+        buffer += piece
+        *complete, buffer = buffer.split(b"\n")
+        lines.extend(complete)
+        if len(lines) >= chunk_rows:
+            yield parse_ndjson_lines(lines[:chunk_rows])
+            lines = lines[chunk_rows:]
+    lines.append(buffer)
+    if any(line.strip() for line in lines):
+        yield parse_ndjson_lines(lines)
+
+async def _ingest_chunk(rows, offset, totals):
+    # Totals only move once the chunk is written and applied, so after an
+    # error they cover the earlier chunks only. Rows committed before the
+    # error are still applied (or kept for a retry), never lost.
+    valid_df, rejected = await predictor_pool.run(validate_transactions, rows)
+    for entry in rejected:
+        entry["index"] += offset
+    failure = None
+    try:
+        created, duplicates = await transaction_writer.write(valid_df) if not valid_df.empty else ([], [])
+    except PartialWrite as e:
+        # A retry would only see the committed batches as duplicates, so
+        # they are folded in before the failure is raised.
+        created, duplicates, failure = e.created, e.duplicates, e
+    # Popped before the await below, so concurrent retries never apply a row twice.
+    retried = [unapplied_transactions.pop(txn) for txn in duplicates if txn in unapplied_transactions]
+    applied_df = valid_df[valid_df["transaction_id"].isin(created)]
+    if retried:
+        applied_df = pd.concat([applied_df, pd.DataFrame(retried)], ignore_index=True)
+    deltas, skipped = [], 0
+    if not applied_df.empty:
+        try:
+            deltas, skipped = await predictor_pool.run(apply_transactions, applied_df)
+        except Exception:
+            for row in applied_df.to_dict("records"):
+                unapplied_transactions[row["transaction_id"]] = row
+            raise
+        if graph_replica is not None:
+            # So /network and the transaction history include them right away.
+            await predictor_pool.run(graph_replica.add_transactions, applied_df)
+    if failure is not None:
+        raise failure
+
+    totals["received"] += len(rows)
+    totals["rejected"].extend(rejected)
+    retried_ids = {row["transaction_id"] for row in retried}
+    duplicates = [txn for txn in duplicates if txn not in retried_ids]
+    if duplicates:
+        # Already in the graph (e.g. a retried request): nothing was written for them.
+        positions = {str(row.get("transaction_id")): i for i, row in enumerate(rows)}
+        totals["rejected"].extend(
+            {"index": positions[txn] + offset, "transaction_id": txn, "reason": "transaction_id already exists"}
+            for txn in duplicates
+        )
+    totals["written"] += len(created)
+    totals["accepted"] += len(valid_df) - len(duplicates)
+    totals["skipped"] += skipped
+    for delta in deltas:
+        # Later chunks of the same stream keep the first old_risk.
+        previous = totals["risk_deltas"].get(delta["account_id"])
+        if previous is not None:
+            delta["old_risk"] = previous["old_risk"]
+            delta["delta"] = delta["new_risk"] - delta["old_risk"]
+        totals["risk_deltas"][delta["account_id"]] = delta
+
+def _ingest_result(totals):
+    return {**totals, "risk_deltas": sorted(totals["risk_deltas"].values(), key=lambda d: abs(d["delta"]), reverse=True)}
+
+@app.post("/transactions/ingest", tags=["Ingestion"])
+async def ingest_transactions(request: Request) -> Dict[str, Any]:
+    """
+    Accepts a batch of transactions as a JSON array, or a stream of NDJSON
+    lines (Content-Type: application/x-ndjson). Valid rows are written to
+    Neo4j, folded into the affected accounts' features and rescored. Rows
+    whose transaction_id already exists are rejected, so retrying a request
+    is safe. Returns 503 with Retry-After when the write path is saturated;
+    error responses carry the totals of the NDJSON chunks committed before
+    the failure next to "detail", so a client resumes from row "received".
+    """
+    totals = {"received": 0, "accepted": 0, "written": 0, "skipped": 0, "rejected": [], "risk_deltas": {}}
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            async for rows in _ndjson_chunks(request, INGEST_MAX_ROWS):
+                await _ingest_chunk(rows, totals["received"], totals)
+        else:
+            rows = parse_json_rows(await request.body())
+            if len(rows) > INGEST_MAX_ROWS:
+                raise HTTPException(status_code=413, detail=f"At most {INGEST_MAX_ROWS} transactions per JSON batch; stream NDJSON for more.")
+            await _ingest_chunk(rows, 0, totals)
+    except IngestOverloaded:
+        return JSONResponse(status_code=503, headers={"Retry-After": "1"},
+                            content=jsonable_encoder({"detail": "Ingestion is saturated, retry later.", **_ingest_result(totals)}))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content=jsonable_encoder({"detail": f"Malformed request body: {e}", **_ingest_result(totals)}))
+
+    return _ingest_result(totals)
@@ -0,0 +1,96 @@
+# backend/observability.py
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from models.metrics import Histogram
+
+# --- Logging ---
+# LOG_LEVEL=DEBUG adds per-request records (e.g. each explanation served);
+# LOG_FORMAT=json writes one JSON object per line for log shippers.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the `extra=` fields as top-level keys."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_FIELDS)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain lines with the `extra=` fields appended as key=value pairs."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def formatMessage(self, record):
+        # Before the traceback, which format() appends after this.
+        line = super().formatMessage(record)
+        extra = " ".join(f"{key}={value}" for key, value in vars(record).items() if key not in _RECORD_FIELDS)
+        return f"{line} {extra}" if extra else line
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Sets up the root logger unless the host (a test runner, a custom uvicorn log config) already did."""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+# --- Request metrics ---
+HTTP_REQUEST_SECONDS = Histogram(
+    "aml_http_request_duration_seconds", "API request latency by route template.", ["method", "route", "status"],
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into HTTP_REQUEST_SECONDS. The
+    route label is the matched path template (/account/{account_id}/...),
+    so account ids never become label values; unmatched paths share one.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], route.path if route is not None else "unmatched", status,
+            ).observe(time.perf_counter() - start)
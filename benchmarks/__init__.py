@@ -0,0 +1,7 @@
+"""
+Benchmarks for the AI core and the API over generated datasets, with Neo4j
+replaced by an in-memory fake. Run from the repository root:
+
+    python -m benchmarks run --size 10k
+    python -m benchmarks compare benchmarks/results/base.json benchmarks/results/new.json
+"""
@@ -0,0 +1,110 @@
+# benchmarks/__main__.py
+import argparse
+import json
+import os
+import sys
+import time
+
+from .cases import CASES
+from .datasets import SIZES, DATA_ROOT, REPO_ROOT, prepare
+from .runner import DEFAULT_THRESHOLD, compare, run_case, run_suite
+
+RESULTS_ROOT = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+
+def _format(value):
+    return "-" if value is None else f"{value:.4g}"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="AI core and API benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prepare_parser = commands.add_parser("prepare", help="Generate a dataset and build its serving artifacts.")
+    prepare_parser.add_argument("--size", choices=SIZES, default="10k")
+    prepare_parser.add_argument("--data-root", default=DATA_ROOT)
+    prepare_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    prepare_parser.add_argument("--force", action="store_true", help="Rebuild even if the dataset exists.")
+
+    run_parser = commands.add_parser("run", help="Run cases (preparing the dataset first if needed).")
+    run_parser.add_argument("--size", choices=SIZES, default="10k")
+    run_parser.add_argument("--data-root", default=DATA_ROOT)
+    run_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    run_parser.add_argument("--cases", default=",".join(CASES), help="Comma-separated case names.")
+    run_parser.add_argument("--iterations", type=int, help="Timed calls per case (default: per case).")
+    run_parser.add_argument("--warmup", type=int, help="Untimed calls before timing (default: per case).")
+    run_parser.add_argument("--concurrency", type=int, default=1, help="Concurrent clients for the API cases.")
+    run_parser.add_argument("--neo4j-latency-ms", type=float, default=0.0,
+                            help="Simulated round trip added to every fake Neo4j query.")
+    run_parser.add_argument("--output", help="Report path (default: benchmarks/results/<size>-<time>.json).")
+
+    compare_parser = commands.add_parser("compare", help="Compare two reports; exits 1 on a regression.")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="Relative change that counts as a regression (0.10 = 10%%).")
+
+    case_parser = commands.add_parser("case", help=argparse.SUPPRESS)
+    case_parser.add_argument("name", choices=CASES)
+    case_parser.add_argument("--data", required=True)
+    case_parser.add_argument("--result", required=True)
+    case_parser.add_argument("--iterations", type=int)
+    case_parser.add_argument("--warmup", type=int)
+    case_parser.add_argument("--concurrency", type=int, default=1)
+
+    args = parser.parse_args()
+
+    if args.command == "prepare":
+        prepare(args.size, args.data_root, args.workers, args.force)
+
+    elif args.command == "run":
+        names = [name.strip() for name in args.cases.split(",") if name.strip()]
+        unknown = [name for name in names if name not in CASES]
+        if unknown:
+            sys.exit(f"Unknown case(s): {', '.join(unknown)}; choose from {', '.join(CASES)}.")
+        data = prepare(args.size, args.data_root, args.workers)
+
+        start_time = time.time()
+        print(f"--- Benchmarking {len(names)} case(s) on the {args.size} dataset "
+              f"({data.meta['accounts']} accounts, {data.meta['transactions']} transfers) ---")
+        report = run_suite(data, names, args.iterations, args.warmup, args.concurrency, args.neo4j_latency_ms)
+
+        output = args.output or os.path.join(RESULTS_ROOT, f"{args.size}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved the report to {output} in {time.time() - start_time:.2f} seconds.")
+        if any("error" in result for result in report["cases"].values()):
+            sys.exit(1)
+
+    elif args.command == "compare":
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        if base["meta"]["dataset"].get("size") != new["meta"]["dataset"].get("size"):
+            print(f"WARNING: comparing the {base['meta']['dataset'].get('size')} dataset "
+                  f"with {new['meta']['dataset'].get('size')}.")
+
+        rows, regressions = compare(base, new, args.threshold)
+        print(f"{'case':<28} {'metric':<18} {'base':>10} {'new':>10} {'change':>8}")
+        for name, metric, before, after, change in rows:
+            flag = "  REGRESSION" if (name, metric, before, after, change) in regressions else ""
+            print(f"{name:<28} {metric:<18} {_format(before):>10} {_format(after):>10} {change:>+8.1%}{flag}")
+        for name, metric, *_ in regressions:
+            if metric == "error":
+                print(f"{name:<28} now fails: {' / '.join(new['cases'][name]['error'][-1:])}")
+
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}.")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}.")
+
+    elif args.command == "case":
+        result = run_case(args.name, args.data, args.iterations, args.warmup, args.concurrency)
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
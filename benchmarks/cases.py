@@ -0,0 +1,86 @@
+# benchmarks/cases.py
+from collections import namedtuple
+
+from .fake_neo4j import FakeGraph, fake_driver
+
+# `setup` returns the call to time, `call(i)` for the i-th iteration. "sync"
+# cases get the BenchData; "api" cases also get backend.main after its
+# startup ran, and return the i-th request path instead.
+Case = namedtuple("Case", ["kind", "setup", "iterations", "warmup", "description"])
+
+SAMPLE_ACCOUNTS = 1000
+
+
+def _predictor():
+    from models import predictor
+
+    predictor.warmup()
+    return predictor
+
+
+# --- AI core ---
+def _top_suspicious_networks(data):
+    predictor = _predictor()
+    return lambda i: predictor.get_top_suspicious_networks()
+
+
+def _prediction_and_explanation(data):
+    predictor = _predictor()
+    accounts = data.sample_accounts(SAMPLE_ACCOUNTS)
+    return lambda i: predictor.get_prediction_and_explanation(accounts[i % len(accounts)])
+
+
+def _snapshot_from_neo4j(data):
+    from models.graph_snapshot import snapshot_from_neo4j
+
+    graph = FakeGraph.load()
+
+    def call(i):
+        with fake_driver(graph):
+            snapshot_from_neo4j("bolt://benchmark", "neo4j", "benchmark")
+    return call
+
+
+# --- API (request paths) ---
+def _accounts_path(template):
+    def setup(data, main):
+        accounts = data.sample_accounts(SAMPLE_ACCOUNTS)
+        return lambda i: template.format(account_id=accounts[i % len(accounts)])
+    return setup
+
+
+def _without_replica(setup):
+    # Sends the graph reads to the (fake) Neo4j client instead of the replica.
+    def wrapped(data, main):
+        main.graph_replica = None
+        return setup(data, main)
+    return wrapped
+
+
+def _fixed_path(path):
+    return lambda data, main: (lambda i: path)
+
+
+CASES = {
+    "top_suspicious_networks": Case("sync", _top_suspicious_networks, 1000, 100,
+                                    "predictor.get_top_suspicious_networks()"),
+    "prediction_and_explanation": Case("sync", _prediction_and_explanation, 1000, 100,
+                                       "predictor.get_prediction_and_explanation() on sampled accounts"),
+    "snapshot_from_neo4j": Case("sync", _snapshot_from_neo4j, 3, 1,
+                                "graph_snapshot.snapshot_from_neo4j() streaming from the fake driver"),
+    "api_suspicious_networks": Case("api", _fixed_path("/suspicious-networks"), 500, 50,
+                                    "GET /suspicious-networks"),
+    "api_explanation": Case("api", _accounts_path("/account/{account_id}/explanation"), 500, 50,
+                            "GET /account/{id}/explanation"),
+    "api_network": Case("api", _accounts_path("/network/{account_id}?hops=2"), 500, 50,
+                        "GET /network/{id}?hops=2 from the graph replica"),
+    "api_network_neo4j": Case("api", _without_replica(_accounts_path("/network/{account_id}")), 500, 50,
+                              "GET /network/{id} through the fake Neo4j client"),
+    "api_transactions": Case("api", _accounts_path("/account/{account_id}/transactions"), 500, 50,
+                             "GET /account/{id}/transactions from the graph replica"),
+    "api_transactions_neo4j": Case("api", _accounts_path("/account/{account_id}/transactions?is_illicit=true"),
+                                   500, 50, "GET /account/{id}/transactions through the fake Neo4j client"),
+    "api_heatmap": Case("api", _fixed_path("/statistics/heatmap"), 500, 50, "GET /statistics/heatmap"),
+    "api_patterns": Case("api", _fixed_path("/statistics/patterns"), 500, 50, "GET /statistics/patterns"),
+    "api_metrics": Case("api", _fixed_path("/metrics"), 500, 50, "GET /metrics"),
+}
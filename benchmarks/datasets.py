@@ -0,0 +1,173 @@
+# benchmarks/datasets.py
+import json
+import os
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import torch
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATA_ROOT = os.path.join(REPO_ROOT, "benchmarks", "data")
+DATASET_META = "dataset.json"
+
+# Accounts per dataset; the generator adds TRANSACTIONS_PER_ACCOUNT normal
+# transfers per account on top of its injected laundering operations.
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+TRANSACTIONS_PER_ACCOUNT = 5
+SEED = 0
+
+
+class BenchData:
+    """A prepared dataset directory: the generator's CSVs plus every serving artifact."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with open(os.path.join(self.path, DATASET_META)) as f:
+            self.meta = json.load(f)
+        self._account_ids = None
+
+    @property
+    def account_ids(self):
+        if self._account_ids is None:
+            from models.graph_snapshot import GraphSnapshot, GRAPH_SNAPSHOT_PATH
+            self._account_ids = GraphSnapshot.load(os.path.join(self.path, GRAPH_SNAPSHOT_PATH)).account_ids
+        return self._account_ids
+
+    def sample_accounts(self, n, seed=SEED):
+        """`n` account ids drawn uniformly (with replacement), the same ones on every run."""
+        rng = np.random.default_rng(seed)
+        return self.account_ids[rng.integers(0, len(self.account_ids), n)].tolist()
+
+
+def dataset_path(size, root=DATA_ROOT):
+    return os.path.join(root, size)
+
+
+def generate(size, path, workers=None):
+    """Runs SynthDataGen/generate_data.py for `size` into `path`."""
+    accounts = SIZES[size]
+    subprocess.run(
+        [sys.executable, os.path.join(REPO_ROOT, "SynthDataGen", "generate_data.py"),
+         "--accounts", str(accounts), "--transactions", str(accounts * TRANSACTIONS_PER_ACCOUNT),
+         "--workers", str(workers or os.cpu_count()), "--out-dir", path],
+        check=True,
+    )
+
+
+def _random_models(num_features):
+    """
+    Seeded, untrained GCN and autoencoder weights. Serving latency does not
+    depend on the weight values, so the benchmark skips training.
+    """
+    from models.optimized_models import ScriptableGCN
+    from models.train_autoencoder import Autoencoder
+
+    torch.manual_seed(SEED)
+    gcn = ScriptableGCN(num_features, 16, 2).eval()
+    # Saved in train_gcn.GCN's layout (GraphConv weights are (in, out)).
+    gcn_state = {
+        "conv1.weight": gcn.conv1.linear.weight.detach().t().contiguous(),
+        "conv1.bias": gcn.conv1.bias.detach(),
+        "conv2.weight": gcn.conv2.linear.weight.detach().t().contiguous(),
+        "conv2.bias": gcn.conv2.bias.detach(),
+    }
+    return gcn, gcn_state, Autoencoder(num_features).eval()
+
+
+def build_artifacts(workers=None):
+    """
+    Builds the serving artifacts from the CSVs in the current directory, the
+    same files steps 3-9 of the readme produce: graph snapshot, feature store
+    and aggregates, scaler, models, GCN and anomaly scores, account locations
+    and typology labels.
+    """
+    from models.anomaly_scoring import reconstruction_errors, calibrate, save_scores as save_anomaly_scores
+    from models.anomaly_scoring import ANOMALY_SCORES_PATH
+    from models.feature_store import open_or_import
+    from models.gcn_inference import save_scores as save_gcn_scores, GCN_SCORES_PATH
+    from models.geo_rollup import geo_from_csv
+    from models.graph_snapshot import snapshot_from_csv
+    from models.incremental_features import full_recompute
+    from models.optimized_models import normalized_adjacency, GCN_STATE_PATH, AUTOENCODER_STATE_PATH
+    from models.train_autoencoder import fit_scaler_in_chunks
+    from models.typology_detection import detect_typologies, edges_from_frame, save_typologies, TYPOLOGY_LABELS_PATH
+
+    print(" > Graph snapshot...")
+    snapshot = snapshot_from_csv("accounts.csv", "transactions.csv")
+    snapshot.save()
+
+    print(" > Feature store...")
+    accounts = pd.read_csv("accounts.csv", usecols=["account_id", "initial_risk_rating"])
+    transactions = pd.read_csv("transactions.csv",
+                               usecols=["source_account", "target_account", "timestamp", "amount_inr"])
+    aggregator = full_recompute(accounts["account_id"], accounts["initial_risk_rating"], transactions)
+    aggregator.save()
+    aggregator.write_store()
+    store = open_or_import()
+
+    print(" > Scaler and models...")
+    scaler = fit_scaler_in_chunks(store)
+    scaler.feature_columns = list(store.columns)
+    joblib.dump(scaler, "scaler.pkl")
+    gcn, gcn_state, autoencoder = _random_models(len(store.columns))
+    torch.save(gcn_state, GCN_STATE_PATH)
+    torch.save(autoencoder.state_dict(), AUTOENCODER_STATE_PATH)
+
+    print(" > GCN scores...")
+    adjacency = normalized_adjacency(snapshot.src, snapshot.dst, snapshot.num_nodes)
+    features = torch.as_tensor(scaler.transform(store.get_batch(snapshot.account_ids)), dtype=torch.float32)
+    with torch.no_grad():
+        hidden = torch.relu(gcn.conv1(adjacency, features))
+        probabilities = torch.softmax(gcn.conv2(adjacency, hidden), dim=1)[:, 1]
+    save_gcn_scores(GCN_SCORES_PATH, snapshot.account_ids, probabilities.numpy(), hidden.numpy(), snapshot.content_hash)
+    del adjacency, features, hidden
+
+    print(" > Anomaly scores...")
+    errors = reconstruction_errors(autoencoder, scaler, store)
+    percentiles, quantiles = calibrate(errors)
+    save_anomaly_scores(ANOMALY_SCORES_PATH, store.account_ids, errors, percentiles, quantiles)
+
+    print(" > Account locations and typologies...")
+    geo_from_csv("accounts.csv").save()
+    evidence = detect_typologies(edges_from_frame(accounts["account_id"], transactions), workers=workers or os.cpu_count())
+    save_typologies(TYPOLOGY_LABELS_PATH, evidence, source="csv:transactions.csv")
+    return snapshot
+
+
+def prepare(size, root=DATA_ROOT, workers=None, force=False):
+    """
+    Generates and builds the `size` dataset under `root` unless it is already
+    there. Returns its BenchData.
+    """
+    path = dataset_path(size, root)
+    if not force and os.path.exists(os.path.join(path, DATASET_META)):
+        return BenchData(path)
+
+    start_time = time.time()
+    os.makedirs(path, exist_ok=True)
+    print(f"--- Generating the {size} dataset in {path} ---")
+    generate(size, path, workers)
+
+    print("\n--- Building serving artifacts ---")
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        snapshot = build_artifacts(workers)
+    finally:
+        os.chdir(cwd)
+
+    meta = {
+        "size": size,
+        "accounts": snapshot.num_nodes,
+        "transactions": len(snapshot.src),
+        "graph_hash": snapshot.content_hash,
+        "build_seconds": round(time.time() - start_time, 2),
+    }
+    with open(os.path.join(path, DATASET_META), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f" > Dataset ready in {meta['build_seconds']:.2f} seconds.")
+    return BenchData(path)
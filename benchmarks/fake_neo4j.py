@@ -0,0 +1,283 @@
+# benchmarks/fake_neo4j.py
+import asyncio
+import functools
+import itertools
+import os
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from models.geo_rollup import AccountGeo, ACCOUNT_GEO_PATH
+from models.graph_replica import GraphReplica
+from models.graph_snapshot import GraphSnapshot, GRAPH_SNAPSHOT_PATH
+
+# Added to every fake query, to stand in for the network round trip.
+DEFAULT_LATENCY = float(os.getenv("BENCH_NEO4J_LATENCY_MS", "0")) / 1000
+
+
+class FakeGraph:
+    """
+    In-memory answers to the queries the code base sends to Neo4j, computed
+    from a graph snapshot (and account locations, when present). It recognises
+    queries by their shape rather than parsing Cypher, so a new query needs a
+    new branch here.
+    """
+
+    def __init__(self, snapshot, geo=None):
+        self.snapshot = snapshot
+        self.replica = GraphReplica(snapshot)
+        self.geo = geo
+        # Transaction ids in the graph, for the idempotent ingest query; built on first write.
+        self._transaction_ids = None
+
+    @classmethod
+    def load(cls, snapshot_path=GRAPH_SNAPSHOT_PATH, geo_path=ACCOUNT_GEO_PATH):
+        try:
+            geo = AccountGeo.load(geo_path)
+        except FileNotFoundError:
+            geo = None
+        return cls(GraphSnapshot.load(snapshot_path), geo)
+
+    # --- Sync driver queries (offline scripts) ---
+    def run(self, query, params):
+        """Yields records (as (keys, values)) for one query."""
+        snapshot = self.snapshot
+        if "count(a) AS accounts" in query:
+            yield ("accounts", "transfers"), (snapshot.num_nodes, len(snapshot.src))
+        elif "[r:TRANSFER]->(b:Account)" in query:
+            ids = snapshot.account_ids
+            keys = ("a.account_id", "b.account_id", "r.amount_inr", "r.timestamp.epochSeconds", "r.transaction_id")
+            columns = (ids[snapshot.src].tolist(), ids[snapshot.dst].tolist(), snapshot.amount.tolist(),
+                       snapshot.timestamp.tolist(), snapshot.transaction_ids.tolist())
+            for values in zip(*columns):
+                yield keys, values
+        elif "a.state AS state" in query:
+            for values in zip(self.geo.account_ids.tolist(), self._states(), self._cities()):
+                yield ("account_id", "state", "city"), values
+        elif "MATCH (a:Account) RETURN a.account_id" in query:
+            for account_id in snapshot.account_ids.tolist():
+                yield ("a.account_id",), (account_id,)
+        else:
+            raise NotImplementedError(f"FakeGraph does not answer this query:\n{query}")
+
+    def _states(self):
+        states = self.geo.states.tolist()
+        return [states[code] if code >= 0 else None for code in self.geo.state_codes.tolist()]
+
+    def _cities(self):
+        cities = self.geo.city_names.tolist()
+        return [cities[code] if code >= 0 else None for code in self.geo.city_codes.tolist()]
+
+    # --- Async client queries (API) ---
+    def read(self, query, params):
+        if "ORDER BY r.timestamp DESC" in query:
+            return self._history(query, params)
+        if "UNWIND $account_ids" in query:
+            return self._locations(query, params["account_ids"])
+        raise NotImplementedError(f"FakeGraph does not answer this query:\n{query}")
+
+    def read_single(self, query, params):
+        if "[:TRANSFER*1.." in query:
+            hops = int(query.split("[:TRANSFER*1..", 1)[1].split("]", 1)[0])
+            graph = self.replica.neighborhood(params["acc_id"], hops)
+            return {"nodes": graph["nodes"], "edges": graph["edges"]} if graph is not None else None
+        raise NotImplementedError(f"FakeGraph does not answer this query:\n{query}")
+
+    def write(self, query, params):
+        if "UNWIND $rows" not in query:
+            raise NotImplementedError(f"FakeGraph does not answer this query:\n{query}")
+        # Ingestion: only the id bookkeeping is applied, not the edges.
+        if self._transaction_ids is None:
+            self._transaction_ids = set(self.snapshot.transaction_ids.tolist())
+        records = []
+        for row in params["rows"]:
+            if row["source_account"] not in self.replica or row["target_account"] not in self.replica:
+                continue
+            duplicate = row["transaction_id"] in self._transaction_ids
+            self._transaction_ids.add(row["transaction_id"])
+            records.append({"transaction_id": row["transaction_id"], "duplicate": duplicate})
+        return records
+
+    def _history(self, query, params):
+        # Filters the replica cannot apply (is_illicit, pattern) are ignored.
+        directions = [name for name in ("out", "in") if f"'{name}' AS direction" in query]
+        direction = directions[0] if len(directions) == 1 else "both"
+        cursor = (params["cursor_ms"], params["cursor_id"]) if "cursor_ms" in params else None
+        page = self.replica.transaction_page(
+            params["account_id"], direction, params["limit"], cursor,
+            params["start"].timestamp() if "start" in params else None,
+            params["end"].timestamp() if "end" in params else None,
+            params.get("min_amount"), params.get("max_amount"),
+        )
+        if page is None:
+            return []
+        rows, _ = page
+        return [
+            {"transaction_id": row["transaction_id"], "from_account": row["from"], "to_account": row["to"],
+             "amount": row["amount"], "date": row["date"],
+             "timestamp_ms": int(pd.Timestamp(row["date"]).timestamp() * 1000),
+             "direction": row["direction"], "is_illicit": None, "pattern": None}
+            for row in rows
+        ]
+
+    def _locations(self, query, account_ids):
+        if self.geo is None:
+            return []
+        positions = pd.Index(self.geo.account_ids).get_indexer(account_ids)
+        if "a.city" in query:
+            codes, labels = self.geo.city_codes, np.asarray(self.geo.city_labels())
+        else:
+            codes, labels = self.geo.state_codes, self.geo.states
+        codes = codes[positions[positions >= 0]]
+        labels = labels[codes[codes >= 0]]
+        counts = pd.Series(labels).value_counts()
+        return [{"location": location, "count": int(count)} for location, count in counts.items()]
+
+
+# --- Sync driver (neo4j.GraphDatabase.driver) ---
+class _Record(tuple):
+    """
+    Like neo4j.Record: a tuple of the values that can also be indexed by key.
+    Iteration goes through a Python generator, as the driver's does (it
+    checks each value for hydration errors), so loops over records cost here
+    what they cost against a real driver.
+    """
+
+    _keys = ()
+
+    def __iter__(self):
+        for value in super().__iter__():
+            yield value
+
+    def __getitem__(self, key):
+        return super().__getitem__(key if isinstance(key, (int, slice)) else self._keys.index(key))
+
+    def keys(self):
+        return list(self._keys)
+
+    def values(self):
+        return list(self)
+
+    def data(self):
+        return dict(zip(self._keys, self))
+
+
+@functools.lru_cache(maxsize=None)
+def _record_type(keys):
+    # One subclass per key tuple, so building a record is a plain tuple construction.
+    return type("_Record", (_Record,), {"_keys": keys})
+
+
+class _Result:
+    def __init__(self, rows):
+        self._records = (_record_type(keys)(values) for keys, values in rows)
+
+    def __iter__(self):
+        return self._records
+
+    def fetch(self, n):
+        return list(itertools.islice(self._records, n))
+
+    def single(self):
+        return next(iter(self), None)
+
+    def data(self):
+        return [record.data() for record in self]
+
+
+class FakeSession:
+    def __init__(self, graph, latency):
+        self.graph = graph
+        self.latency = latency
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def run(self, query, parameters=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return _Result(self.graph.run(str(query), {**(parameters or {}), **kwargs}))
+
+
+class FakeDriver:
+    """Stand-in for neo4j.Driver: sessions run queries against a FakeGraph."""
+
+    def __init__(self, graph, latency=DEFAULT_LATENCY):
+        self.graph = graph
+        self.latency = latency
+
+    def session(self, **config):
+        return FakeSession(self.graph, self.latency)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def fake_driver(graph, latency=DEFAULT_LATENCY):
+    """Makes neo4j.GraphDatabase.driver() return a FakeDriver over `graph`."""
+    from neo4j import GraphDatabase
+
+    with mock.patch.object(GraphDatabase, "driver", lambda uri, auth=None, **config: FakeDriver(graph, latency)):
+        yield
+
+
+# --- Async client (backend.database.Neo4jClient) ---
+class FakeNeo4jClient:
+    """
+    Drop-in for the API's Neo4jClient, answering reads from a FakeGraph.
+    Without `graph`, one is loaded from the working directory on the first
+    query, so runs that never reach Neo4j do not pay for it.
+    """
+
+    def __init__(self, graph=None, latency=DEFAULT_LATENCY, max_pool_size=50):
+        self._graph = graph
+        self.latency = latency
+        self.max_pool_size = max_pool_size
+        self.in_flight = 0
+        self.queries = 0
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = FakeGraph.load()
+        return self._graph
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def _round_trip(self):
+        self.queries += 1
+        if self.latency:
+            self.in_flight += 1
+            try:
+                await asyncio.sleep(self.latency)
+            finally:
+                self.in_flight -= 1
+
+    async def read(self, query, timeout=None, query_name="other", **params):
+        await self._round_trip()
+        return self.graph.read(query, params)
+
+    async def read_single(self, query, timeout=None, query_name="other", **params):
+        await self._round_trip()
+        return self.graph.read_single(query, params)
+
+    async def write(self, query, timeout=None, query_name="other", **params):
+        await self._round_trip()
+        return self.graph.write(query, params)
@@ -0,0 +1,212 @@
+# benchmarks/runner.py
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .cases import CASES
+from .datasets import BenchData, REPO_ROOT
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Compared by `compare`: metric -> whether a larger value is better.
+METRICS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "throughput_per_s": True, "peak_rss_mb": False}
+DEFAULT_THRESHOLD = 0.10
+
+
+# --- 1. Measurement (runs inside the case's own process) ---
+def peak_rss_mb():
+    """High-water mark of this process's resident set size."""
+    if resource is None:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes everywhere else.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(latencies, wall_seconds):
+    latencies_ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "iterations": len(latencies_ms),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(latencies_ms.mean()), 4),
+        "max_ms": round(float(latencies_ms.max()), 4),
+        "throughput_per_s": round(len(latencies_ms) / wall_seconds, 2),
+    }
+
+
+def measure(call, iterations, warmup):
+    for i in range(warmup):
+        call(i)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        call(i)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def measure_async(call, iterations, warmup, concurrency):
+    """`concurrency` workers issue the calls back to back; latency is per call."""
+    for i in range(warmup):
+        await call(i)
+    latencies = []
+    next_call = iter(range(iterations))
+
+    async def worker():
+        for i in next_call:
+            call_start = time.perf_counter()
+            await call(i)
+            latencies.append(time.perf_counter() - call_start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def _run_api(case, data, iterations, warmup, concurrency):
+    import httpx
+    import backend.main as main
+    from backend.ingest import TransactionWriter
+    from .fake_neo4j import FakeNeo4jClient
+
+    main.db = FakeNeo4jClient()
+    main.transaction_writer = TransactionWriter(main.db)
+    setup_start = time.perf_counter()
+    # Runs the app's startup (replica load, model warmup, background tasks) and shutdown.
+    async with main.app.router.lifespan_context(main.app):
+        path = case.setup(data, main)
+        setup_seconds = time.perf_counter() - setup_start
+        setup_rss = peak_rss_mb()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            async def call(i):
+                response = await client.get(path(i))
+                response.raise_for_status()
+            result = await measure_async(call, iterations, warmup, concurrency)
+    result.update(setup_seconds=round(setup_seconds, 3), setup_rss_mb=round(setup_rss, 1),
+                  concurrency=concurrency, neo4j_queries=main.db.queries)
+    return result
+
+
+def run_case(name, data_path, iterations=None, warmup=None, concurrency=1):
+    """Sets up and times one case in this process; the working directory becomes the dataset."""
+    case = CASES[name]
+    data = BenchData(data_path)
+    os.chdir(data.path)
+    iterations = case.iterations if iterations is None else iterations
+    warmup = case.warmup if warmup is None else warmup
+
+    if case.kind == "api":
+        result = asyncio.run(_run_api(case, data, iterations, warmup, concurrency))
+    else:
+        setup_start = time.perf_counter()
+        call = case.setup(data)
+        setup_seconds = time.perf_counter() - setup_start
+        setup_rss = peak_rss_mb()
+        result = measure(call, iterations, warmup)
+        result.update(setup_seconds=round(setup_seconds, 3), setup_rss_mb=round(setup_rss, 1))
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return result
+
+
+# --- 2. Orchestration ---
+def run_isolated(name, data_path, iterations=None, warmup=None, concurrency=1, env=None):
+    """
+    Runs one case in a fresh interpreter, so its peak RSS and warm caches are
+    its own. Returns the result dict, or {"error": ...} when the case failed.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        result_path = os.path.join(tmp, "result.json")
+        command = [sys.executable, "-m", "benchmarks", "case", name, "--data", data_path, "--result", result_path,
+                   "--concurrency", str(concurrency)]
+        if iterations is not None:
+            command += ["--iterations", str(iterations)]
+        if warmup is not None:
+            command += ["--warmup", str(warmup)]
+        child_env = {**os.environ, **(env or {})}
+        child_env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, child_env.get("PYTHONPATH")]))
+        # The case's own output (startup prints, progress) only matters when it fails.
+        process = subprocess.run(command, cwd=REPO_ROOT, env=child_env, capture_output=True, text=True)
+        if process.returncode != 0:
+            return {"error": (process.stderr or process.stdout).strip().splitlines()[-20:]}
+        with open(result_path) as f:
+            return json.load(f)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(data):
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "dataset": data.meta,
+    }
+
+
+def run_suite(data, names, iterations=None, warmup=None, concurrency=1, neo4j_latency_ms=0.0):
+    env = {"BENCH_NEO4J_LATENCY_MS": str(neo4j_latency_ms)}
+    report = {"meta": {**environment(data), "neo4j_latency_ms": neo4j_latency_ms}, "cases": {}}
+    for name in names:
+        print(f" > {name}...", end=" ", flush=True)
+        result = run_isolated(name, data.path, iterations, warmup, concurrency, env)
+        report["cases"][name] = result
+        if "error" in result:
+            print("FAILED\n   " + "\n   ".join(result["error"]))
+        else:
+            print(f"p50 {result['p50_ms']:.3f} ms, p95 {result['p95_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms, "
+                  f"{result['throughput_per_s']:.1f}/s, peak RSS {result['peak_rss_mb']:.0f} MB")
+    return report
+
+
+# --- 3. Comparison ---
+def compare(base, new, threshold=DEFAULT_THRESHOLD):
+    """
+    Metric-by-metric comparison of two reports. Returns (rows, regressions):
+    each row is (case, metric, base, new, relative change); a regression is a
+    row whose change is worse than `threshold` (0.10 = 10%), or a case that
+    now fails.
+    """
+    rows, regressions = [], []
+    for name, new_result in new["cases"].items():
+        base_result = base["cases"].get(name)
+        if base_result is None or "error" in base_result:
+            continue
+        if "error" in new_result:
+            # A case that used to run and now fails is the worst regression.
+            regressions.append((name, "error", None, None, None))
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = base_result.get(metric), new_result.get(metric)
+            if before is None or after is None or before == 0:
+                continue
+            change = (after - before) / before
+            row = (name, metric, before, after, change)
+            rows.append(row)
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(row)
+    return rows, regressions
@@ -0,0 +1,108 @@
+# models/anomaly_scoring.py
+import time
+
+import joblib
+import numpy as np
+import torch
+
+from .feature_store import open_or_import, trained_columns
+from .optimized_models import load_autoencoder
+
+ANOMALY_SCORES_PATH = "anomaly_scores.npz"
+
+# Error quantiles kept for calibrating errors that were not part of the
+# scoring run (0.1-percentile resolution).
+CALIBRATION_POINTS = np.linspace(0.0, 1.0, 1001)
+
+
+# --- 1. Offline batch scoring ---
+def reconstruction_errors(model, scaler, store, columns=None, chunk_size=65536):
+    """
+    Per-account mean squared reconstruction error, in feature-store row order.
+    Works through `columns` of the store `chunk_size` rows at a time.
+    """
+    errors = np.empty(len(store), dtype=np.float32)
+    start = 0
+    with torch.no_grad():
+        for _, chunk in store.iter_chunks(chunk_size, columns):
+            x = torch.as_tensor(scaler.transform(chunk), dtype=torch.float32)
+            errors[start:start + len(x)] = ((model(x) - x) ** 2).mean(dim=1).numpy()
+            start += len(x)
+    return errors
+
+
+def calibrate(errors):
+    """Returns (percentiles, quantiles): each error's rank in [0, 1] and the error quantile grid."""
+    ordered = np.sort(errors)
+    percentiles = np.searchsorted(ordered, errors, side="right") / max(len(errors), 1)
+    quantiles = np.quantile(ordered, CALIBRATION_POINTS) if len(errors) else np.zeros_like(CALIBRATION_POINTS)
+    return percentiles.astype(np.float32), quantiles.astype(np.float32)
+
+
+def save_scores(path, account_ids, errors, percentiles, quantiles):
+    np.savez(
+        path,
+        account_ids=np.asarray(account_ids, dtype=str),
+        reconstruction_error=np.asarray(errors, dtype=np.float32),
+        percentile=np.asarray(percentiles, dtype=np.float32),
+        quantiles=np.asarray(quantiles, dtype=np.float32),
+    )
+
+
+# --- 2. Request-time lookups ---
+class AnomalyScoreStore:
+    """Read-only view over the persisted reconstruction errors and their calibration."""
+
+    def __init__(self, account_ids, errors, percentiles, quantiles):
+        self.account_ids = account_ids
+        self.errors = errors
+        self.percentiles = percentiles
+        self.quantiles = quantiles
+        self._positions = {account_id: i for i, account_id in enumerate(account_ids.tolist())}
+
+    @classmethod
+    def load(cls, path=ANOMALY_SCORES_PATH):
+        with np.load(path) as data:
+            return cls(data["account_ids"], data["reconstruction_error"], data["percentile"], data["quantiles"])
+
+    def __len__(self):
+        return len(self.account_ids)
+
+    def __contains__(self, account_id):
+        return account_id in self._positions
+
+    def score(self, account_id):
+        """{"reconstruction_error", "percentile"} for a scored account, or None."""
+        position = self._positions.get(account_id)
+        if position is None:
+            return None
+        return {
+            "reconstruction_error": float(self.errors[position]),
+            "percentile": float(self.percentiles[position]),
+        }
+
+    def percentile_of(self, errors):
+        """Calibrates new errors against the scored population's quantiles."""
+        return np.interp(errors, self.quantiles, CALIBRATION_POINTS)
+
+
+# --- 3. Batch scoring script ---
+if __name__ == "__main__":
+    start_time = time.time()
+
+    print("--- Step 1: Loading features, scaler and autoencoder ---")
+    store = open_or_import()
+    scaler = joblib.load("scaler.pkl")
+    columns = trained_columns(scaler, store)
+    model, variant = load_autoencoder(len(columns))
+    print(f" > Using the {variant} autoencoder.")
+
+    print("\n--- Step 2: Scoring reconstruction error ---")
+    errors = reconstruction_errors(model, scaler, store, columns)
+    percentiles, quantiles = calibrate(errors)
+    print(f" > Scored {len(errors)} accounts; p50 error {quantiles[500]:.4f}, "
+          f"p99 {quantiles[990]:.4f}, max {quantiles[-1]:.4f}.")
+
+    save_scores(ANOMALY_SCORES_PATH, store.account_ids, errors, percentiles, quantiles)
+    print(f" > Saved scores and calibration to {ANOMALY_SCORES_PATH}")
+    print(f"\nAnomaly scoring complete. Total time: {time.time() - start_time:.2f} seconds.")
@@ -0,0 +1,168 @@
+# models/attribution.py
+import contextlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+import torch
+
+from .khop_inference import to_torch_sparse
+from .temporal_features import WINDOWS, BURST_WINDOWS
+
+EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "10000"))
+# Riskiest accounts whose explanations are computed ahead of any request.
+EXPLANATION_PRECOMPUTE_TOP_N = int(os.getenv("EXPLANATION_PRECOMPUTE_TOP_N", "1000"))
+# Accounts attributed per forward/backward pass.
+EXPLANATION_BATCH_SIZE = int(os.getenv("EXPLANATION_BATCH_SIZE", "64"))
+
+# Neighbours listed individually per explanation; the rest are only summed.
+TOP_NEIGHBORS = 5
+
+FEATURE_LABELS = {
+    "initial_risk": "Initial Risk",
+    "out_degree": "Outgoing Transfers",
+    "in_degree": "Incoming Transfers",
+    "total_amount_out": "Total Amount Out",
+    "total_amount_in": "Total Amount In",
+    "avg_amount_out": "Average Amount Out",
+    "avg_amount_in": "Average Amount In",
+    "transaction_volume": "Transaction Volume",
+    "net_flow": "Net Flow Behavior",
+}
+# Temporal features (models/temporal_features.py), e.g. "Amount In (30d)".
+FEATURE_LABELS.update({
+    f"{name}_{window}": f"{label} ({window})"
+    for name, label in (("in_count", "Incoming Transfers"), ("out_count", "Outgoing Transfers"),
+                        ("amount_in", "Amount In"), ("amount_out", "Amount Out"))
+    for window in WINDOWS
+})
+FEATURE_LABELS.update({f"max_count_{window}": f"Peak Transactions per {window}" for window in BURST_WINDOWS})
+FEATURE_LABELS.update({f"max_amount_out_{window}": f"Peak Amount Out per {window}" for window in BURST_WINDOWS})
+
+
+def feature_label(column):
+    return FEATURE_LABELS.get(column, column.replace("_", " ").title())
+
+
+# --- 1. Batched gradient x input ---
+def attribute(scorer, model, account_ids, columns, lock=None):
+    """
+    Gradient x input attributions of the GCN's illicit logit margin
+    (logit[1] - logit[0]) for each account, over its own features and those of
+    its 2-hop receptive field.
+
+    Inputs are scaled features, so the implicit baseline is the population
+    mean and each contribution says how far that value moves the margin away
+    from an average account. Each target gets its own copy of its receptive
+    field, stacked block-diagonally, so one forward/backward pass covers the
+    whole batch without neighbours shared by two targets mixing their
+    gradients.
+
+    `model` must be differentiable (optimized_models.ScriptableGCN, not an
+    int8 export). `lock`, when given, is held while each account's receptive
+    field is read, so ingestion updating the scorer in place cannot interleave
+    with it. Returns one dict per account, in order.
+    """
+    fields = []
+    for account_id in account_ids:
+        with lock or contextlib.nullcontext():
+            fields.append(scorer.receptive_field(np.array([scorer.node_map[account_id]], dtype=np.int64)))
+    messages1 = sp.block_diag([field[2] for field in fields], format="csr")
+    messages2 = sp.block_diag([field[3] for field in fields], format="csr")
+    x = torch.from_numpy(np.concatenate([field[4] for field in fields])).requires_grad_(True)
+
+    logits = model(to_torch_sparse(messages1), to_torch_sparse(messages2), x)
+    margins = logits[:, 1] - logits[:, 0]
+    margins.sum().backward()
+    contributions = (x.grad * x).detach().numpy()
+    margins = margins.detach().numpy()
+
+    results = []
+    start = 0
+    for account_id, (_, hop2, _, _, _), margin in zip(account_ids, fields, margins):
+        block = contributions[start:start + len(hop2)]
+        start += len(hop2)
+        own = int(np.searchsorted(hop2, scorer.node_map[account_id]))
+        own_values = block[own]
+        others = np.delete(np.arange(len(hop2)), own)
+        neighbor_values = block[others].sum(axis=0)
+
+        entries = [{"feature": feature_label(c), "column": c, "source": "self", "impact": float(v)}
+                   for c, v in zip(columns, own_values)]
+        entries += [{"feature": f"Neighbours' {feature_label(c)}", "column": c, "source": "neighbors",
+                     "impact": float(v)} for c, v in zip(columns, neighbor_values)]
+        entries.sort(key=lambda entry: abs(entry["impact"]), reverse=True)
+
+        per_neighbor = block[others].sum(axis=1)
+        top = np.argsort(-np.abs(per_neighbor), kind="stable")[:TOP_NEIGHBORS]
+        results.append({
+            "margin": float(margin),
+            "contributions": entries,
+            "top_neighbors": [{"node": int(hop2[others[i]]), "impact": float(per_neighbor[i])} for i in top],
+            "receptive_field_size": len(hop2),
+        })
+    return results
+
+
+# --- 2. Cache ---
+class ExplanationCache:
+    """
+    Bounded LRU of attribution results keyed by (account_id, model_version),
+    so a model swap never serves explanations of the previous version.
+    """
+
+    def __init__(self, max_entries=EXPLANATION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Number of discard() calls so far, and the call that last dropped each
+        # account: put() refuses results computed before their account changed.
+        self.discards = 0
+        self._discarded_at = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, account_id, version):
+        key = (account_id, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def begin(self):
+        """
+        Returns the `since` token for results whose inputs are read from now
+        on. Forgets older discards, so only one producer may be in flight.
+        """
+        with self._lock:
+            self._discarded_at.clear()
+            return self.discards
+
+    def put(self, account_id, version, entry, since=None):
+        with self._lock:
+            if since is not None and self._discarded_at.get(account_id, 0) > since:
+                return
+            self._entries[(account_id, version)] = entry
+            self._entries.move_to_end((account_id, version))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, account_ids, version):
+        """Drops entries whose inputs changed (e.g. accounts rescored after ingestion)."""
+        with self._lock:
+            self.discards += 1
+            for account_id in account_ids:
+                self._entries.pop((account_id, version), None)
+                self._discarded_at[account_id] = self.discards
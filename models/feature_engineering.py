@@ -1,43 +1,114 @@
 # models/feature_engineering.py
 import pandas as pd
+import numpy as np
 from neo4j import GraphDatabase
+from concurrent.futures import ThreadPoolExecutor
 import os
 from dotenv import load_dotenv
 
+from .feature_store import FEATURE_COLUMNS, FeatureStoreWriter
+
 class FeatureExtractor:
-    def __init__(self, uri, user, password):
+    def __init__(self, uri, user, password, partition_size=20000, workers=4):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
         self.driver.verify_connectivity()
+        self.partition_size = partition_size
+        self.workers = workers
 
     def close(self):
         self.driver.close()
 
-    def get_node_features(self):
-        print("Fetching features in batches to prevent timeouts...")
-        # This APOC query processes nodes in batches of 2000 to avoid timeouts.
+    def get_partition_bounds(self):
+        """
+        Splits the account-id space into contiguous [lower, upper) ranges of
+        roughly `partition_size` accounts, using the account_id uniqueness index.
+
+        Each bound is found by walking `partition_size` ids on from the
+        previous one in index order, so the whole walk reads every id once and
+        nothing is collected inside Neo4j.
+        """
+        first_query = """
+        MATCH (a:Account) WHERE a.account_id IS NOT NULL
+        RETURN a.account_id AS lower ORDER BY a.account_id LIMIT 1
+        """
+        next_query = """
+        MATCH (a:Account) WHERE a.account_id >= $previous
+        RETURN a.account_id AS lower ORDER BY a.account_id SKIP $step LIMIT 1
+        """
+        lowers = []
+        with self.driver.session() as session:
+            record = session.run(first_query).single()
+            while record is not None:
+                lowers.append(record["lower"])
+                record = session.run(next_query, previous=lowers[-1], step=self.partition_size).single()
+        # The last partition is open-ended (upper = None).
+        return list(zip(lowers, lowers[1:] + [None]))
+
+    def _extract_partition(self, bounds):
+        # Each direction is aggregated on its own before the next MATCH, so an
+        # account contributes out_degree + in_degree rows instead of their product.
+        lower, upper = bounds
+        # Two variants rather than `$upper IS NULL OR ...`, which the planner
+        # cannot turn into a bounded index range seek.
+        if upper is None:
+            where = "a.account_id >= $lower"
+        else:
+            where = "a.account_id >= $lower AND a.account_id < $upper"
         query = """
         MATCH (a:Account)
+        WHERE """ + where + """
         OPTIONAL MATCH (a)-[r_out:TRANSFER]->()
+        WITH a,
+             COUNT(r_out) AS out_degree,
+             COALESCE(SUM(r_out.amount_inr), 0) AS total_amount_out,
+             COALESCE(AVG(r_out.amount_inr), 0) AS avg_amount_out
         OPTIONAL MATCH (a)<-[r_in:TRANSFER]-()
         RETURN
             a.account_id AS account_id,
-            a.initial_risk_rating as initial_risk,
-            COUNT(DISTINCT r_out) AS out_degree,
-            COUNT(DISTINCT r_in) AS in_degree,
-            COALESCE(SUM(r_out.amount_inr), 0) AS total_amount_out,
+            a.initial_risk_rating AS initial_risk,
+            out_degree,
+            COUNT(r_in) AS in_degree,
+            total_amount_out,
             COALESCE(SUM(r_in.amount_inr), 0) AS total_amount_in,
-            COALESCE(AVG(r_out.amount_inr), 0) AS avg_amount_out,
+            avg_amount_out,
             COALESCE(AVG(r_in.amount_inr), 0) AS avg_amount_in
         """
+        account_ids = []
+        values = []
         with self.driver.session() as session:
-            results = session.run(query)
-            df = pd.DataFrame([record.data() for record in results])
-        
+            for record in session.run(query, lower=lower, upper=upper):
+                account_ids.append(record[0])
+                values.append(record.values()[1:])
+
+        chunk = pd.DataFrame(np.array(values, dtype=np.float64).reshape(-1, 7), columns=FEATURE_COLUMNS[:7])
+        chunk = chunk.astype({"initial_risk": np.int64, "out_degree": np.int64, "in_degree": np.int64})
+        chunk.insert(0, "account_id", account_ids)
         # Additional feature engineering (this part is unchanged)
-        df['transaction_volume'] = df['total_amount_in'] + df['total_amount_out']
-        df['net_flow'] = df['total_amount_in'] - df['total_amount_out']
-        
-        return df
+        chunk['transaction_volume'] = chunk['total_amount_in'] + chunk['total_amount_out']
+        chunk['net_flow'] = chunk['total_amount_in'] - chunk['total_amount_out']
+        return chunk
+
+    def iter_node_features(self):
+        """
+        Yields one feature DataFrame per account-id partition, in id order.
+
+        Partitions are extracted by a pool of workers, but at most `workers`
+        of them are in flight at once, so peak memory stays bounded by a few
+        partitions no matter how large the graph is.
+        """
+        bounds = self.get_partition_bounds()
+        print(f"Extracting features in {len(bounds)} partitions with {self.workers} workers...")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = [pool.submit(self._extract_partition, b) for b in bounds[:self.workers]]
+            for next_bounds in bounds[self.workers:] + [None] * len(pending):
+                chunk = pending.pop(0).result()
+                if next_bounds is not None:
+                    pending.append(pool.submit(self._extract_partition, next_bounds))
+                yield chunk
+
+    def get_node_features(self):
+        """Collects every partition into a single DataFrame (small graphs only)."""
+        return pd.concat(self.iter_node_features(), ignore_index=True)
 
 if __name__ == "__main__":
     # Load credentials from the .env file in the root folder
@@ -51,10 +122,15 @@ if __name__ == "__main__":
     extractor = FeatureExtractor(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
 
     print("Extracting features from the database...")
-    features_df = extractor.get_node_features()
+    # Stream partitions straight into a new feature store version; only a
+    # handful are ever in memory.
+    writer = FeatureStoreWriter(source="neo4j")
+    for i, chunk in enumerate(extractor.iter_node_features()):
+        writer.append(chunk)
+        print(f"  Wrote partition {i + 1} ({writer.num_rows} accounts so far)...")
+    version = writer.commit()
 
-    # Save features to be used by the models
-    features_df.to_csv("account_features.csv", index=False)
-    print("Feature extraction complete. Saved to account_features.csv")
+    print(f"Feature extraction complete. Saved to {writer.path} (version {version}).")
+    print("Use `python -m models.feature_store export` if you need account_features.csv.")
 
-    extractor.close()
\ No newline at end of file
+    extractor.close()
@@ -0,0 +1,275 @@
+# models/feature_store.py
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FEATURE_STORE_PATH = "feature_store"
+FEATURE_CSV_PATH = "account_features.csv"
+MANIFEST_NAME = "manifest.json"
+# Versions kept on disk besides the current one; older ones are removed on commit.
+FEATURE_STORE_KEEP_VERSIONS = int(os.getenv("FEATURE_STORE_KEEP_VERSIONS", "2"))
+
+# Column order the models were trained on (matches account_features.csv).
+FEATURE_COLUMNS = [
+    "initial_risk", "out_degree", "in_degree",
+    "total_amount_out", "total_amount_in", "avg_amount_out", "avg_amount_in",
+    "transaction_volume", "net_flow",
+]
+
+
+def _read_manifest(path):
+    with open(os.path.join(path, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+class FeatureStore:
+    """
+    Read-only, memory-mapped view over one version of the account features.
+
+    Each column is a raw float32 file opened with np.memmap, so opening costs a
+    few syscalls and every process that opens the same version shares the same
+    page-cache pages instead of holding its own float64 copy.
+
+    Layout:
+        feature_store/manifest.json        -> points at the current version
+        feature_store/v0001/meta.json      -> columns, row count, creation time
+        feature_store/v0001/account_ids.npy
+        feature_store/v0001/id_order.npy   -> argsort of account_ids, for lookups
+        feature_store/v0001/<column>.f32
+    """
+
+    def __init__(self, path, version_dir, meta):
+        self.path = path
+        self.version = meta["version"]
+        self.columns = list(meta["columns"])
+        self.num_rows = meta["num_rows"]
+        self.meta = meta
+        self._version_dir = version_dir
+
+        self.account_ids = np.load(os.path.join(version_dir, "account_ids.npy"), mmap_mode="r")
+        self._id_order = np.load(os.path.join(version_dir, "id_order.npy"), mmap_mode="r")
+        self._sorted_ids = None
+        self._data = {
+            name: np.memmap(os.path.join(version_dir, f"{name}.f32"), dtype=np.float32, mode="r", shape=(self.num_rows,))
+            if self.num_rows else np.zeros(0, dtype=np.float32)
+            for name in self.columns
+        }
+
+    @classmethod
+    def open(cls, path=FEATURE_STORE_PATH):
+        manifest = _read_manifest(path)
+        version_dir = os.path.join(path, manifest["current"])
+        with open(os.path.join(version_dir, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(path, version_dir, meta)
+
+    def __len__(self):
+        return self.num_rows
+
+    def __contains__(self, account_id):
+        return self.row_of(account_id) is not None
+
+    # --- Id lookups ---
+    def rows_of(self, account_ids):
+        """Row positions for `account_ids` (-1 where an id is unknown)."""
+        if self._sorted_ids is None:
+            self._sorted_ids = self.account_ids[self._id_order]
+        account_ids = np.asarray(account_ids, dtype=self.account_ids.dtype)
+        slots = np.searchsorted(self._sorted_ids, account_ids)
+        slots = np.minimum(slots, max(self.num_rows - 1, 0))
+        found = (self.num_rows > 0) & (self._sorted_ids[slots] == account_ids)
+        return np.where(found, self._id_order[slots], -1)
+
+    def row_of(self, account_id):
+        row = int(self.rows_of([account_id])[0])
+        return None if row < 0 else row
+
+    # --- Reads ---
+    def get_column(self, name):
+        """Zero-copy, read-only float32 view of a column."""
+        return self._data[name]
+
+    def get_row(self, account_id, columns=None):
+        """Feature vector of one account (float32, in `columns` order), or None."""
+        row = self.row_of(account_id)
+        if row is None:
+            return None
+        return np.array([self._data[name][row] for name in columns or self.columns], dtype=np.float32)
+
+    def get_batch(self, account_ids, columns=None):
+        """(len(account_ids), len(columns)) float32 matrix. Unknown ids raise KeyError."""
+        rows = self.rows_of(account_ids)
+        if (rows < 0).any():
+            missing = np.asarray(account_ids)[rows < 0][:5].tolist()
+            raise KeyError(f"Unknown account ids: {missing}")
+        return self.matrix(columns, rows=rows)
+
+    def matrix(self, columns=None, rows=None):
+        """Dense float32 matrix of `columns` (all by default), optionally for `rows` only."""
+        columns = columns or self.columns
+        selector = slice(None) if rows is None else rows
+        return np.column_stack([self._data[name][selector] for name in columns]).astype(np.float32, copy=False)
+
+    def iter_chunks(self, chunk_size=65536, columns=None):
+        """Yields (account_ids, matrix) pairs of at most `chunk_size` rows, in row order."""
+        columns = columns or self.columns
+        for start in range(0, self.num_rows, chunk_size):
+            rows = slice(start, min(start + chunk_size, self.num_rows))
+            yield self.account_ids[rows], np.column_stack([self._data[name][rows] for name in columns])
+
+    def to_frame(self):
+        """Materializes the store as a DataFrame indexed by account_id (copies)."""
+        frame = pd.DataFrame({name: np.asarray(self._data[name]) for name in self.columns})
+        frame.index = pd.Index(np.asarray(self.account_ids), name="account_id")
+        return frame
+
+
+class FeatureStoreWriter:
+    """
+    Builds a new store version from DataFrame chunks and publishes it
+    atomically. Readers keep using the previous version until commit().
+    """
+
+    def __init__(self, path=FEATURE_STORE_PATH, columns=FEATURE_COLUMNS, source=None, meta=None,
+                 keep_versions=FEATURE_STORE_KEEP_VERSIONS):
+        self.path = path
+        self.columns = list(columns)
+        self.source = source
+        self.keep_versions = keep_versions
+        # Extra fields recorded in meta.json (e.g. the temporal features' reference time).
+        self.meta = dict(meta or {})
+        os.makedirs(path, exist_ok=True)
+
+        try:
+            self.version = _read_manifest(path)["version"] + 1
+        except FileNotFoundError:
+            self.version = 1
+        self.version_name = f"v{self.version:04d}"
+        self.version_dir = os.path.join(path, self.version_name)
+        os.makedirs(self.version_dir, exist_ok=False)
+
+        self._files = {name: open(os.path.join(self.version_dir, f"{name}.f32"), "wb") for name in self.columns}
+        self._account_ids = []
+        self.num_rows = 0
+
+    def append(self, chunk):
+        """Appends a DataFrame with an `account_id` column plus every store column."""
+        for name in self.columns:
+            self._files[name].write(chunk[name].to_numpy(dtype=np.float32).tobytes())
+        self._account_ids.extend(chunk["account_id"].astype(str).tolist())
+        self.num_rows += len(chunk)
+
+    def commit(self):
+        for f in self._files.values():
+            f.close()
+
+        account_ids = np.asarray(self._account_ids, dtype=str)
+        np.save(os.path.join(self.version_dir, "account_ids.npy"), account_ids)
+        np.save(os.path.join(self.version_dir, "id_order.npy"), np.argsort(account_ids, kind="stable"))
+
+        meta = {
+            "version": self.version,
+            "columns": self.columns,
+            "num_rows": self.num_rows,
+            "dtype": "float32",
+            "source": self.source,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **self.meta,
+        }
+        with open(os.path.join(self.version_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+        # Publish: write the new manifest next to the old one, then rename over it.
+        manifest = {"current": self.version_name, **meta}
+        tmp_path = os.path.join(self.path, MANIFEST_NAME + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_NAME))
+        self._prune()
+        return self.version
+
+    def _prune(self):
+        # Only versions older than this one: a higher number may be a writer
+        # still in progress. Readers that have an old version mapped keep
+        # their pages; the files disappear once they let go.
+        older = sorted(
+            int(name[1:]) for name in os.listdir(self.path)
+            if name.startswith("v") and name[1:].isdigit() and int(name[1:]) < self.version
+        )
+        for version in older[:max(len(older) - self.keep_versions, 0)]:
+            try:
+                shutil.rmtree(os.path.join(self.path, f"v{version:04d}"))
+            except OSError as e:
+                # E.g. still memory-mapped on Windows; the next commit retries.
+                logger.warning("Could not remove feature store version %d: %s", version, e)
+
+
+def trained_columns(scaler, store):
+    """
+    The store columns `scaler` was fitted on, in order: the input of every
+    model trained on its output. New columns in the store (e.g. from
+    models.temporal_features) are only used once the models are retrained.
+    Raises ValueError when the scaler and the store do not fit together.
+    """
+    # Scalers fitted before the column list was recorded only ever saw FEATURE_COLUMNS.
+    columns = list(getattr(scaler, "feature_columns", FEATURE_COLUMNS))
+    if len(columns) != scaler.n_features_in_:
+        raise ValueError(f"The scaler was fitted on {scaler.n_features_in_} features but records "
+                         f"{len(columns)} columns; retrain from models.train_autoencoder.")
+    missing = [column for column in columns if column not in store.columns]
+    if missing:
+        raise ValueError(f"Feature store version {store.version} lacks the trained columns {missing}.")
+    return columns
+
+
+# --- CSV compatibility ---
+def import_csv(csv_path=FEATURE_CSV_PATH, path=FEATURE_STORE_PATH, chunk_size=200000):
+    """Streams an account_features.csv into a new store version."""
+    writer = FeatureStoreWriter(path, source=os.path.basename(csv_path))
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        writer.append(chunk)
+    return writer.commit()
+
+
+def export_csv(store, csv_path=FEATURE_CSV_PATH):
+    """Writes a store version back out in the account_features.csv layout."""
+    for i, (account_ids, values) in enumerate(store.iter_chunks()):
+        chunk = pd.DataFrame(values, columns=store.columns)
+        chunk.insert(0, "account_id", account_ids)
+        chunk.to_csv(csv_path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+
+
+def open_or_import(path=FEATURE_STORE_PATH, csv_path=FEATURE_CSV_PATH):
+    """Opens the store, importing account_features.csv first if no store exists yet."""
+    if not os.path.exists(os.path.join(path, MANIFEST_NAME)) and os.path.exists(csv_path):
+        logger.info("No feature store found, importing %s.", csv_path)
+        import_csv(csv_path, path)
+    return FeatureStore.open(path)
+
+
+if __name__ == "__main__":
+    # Usage: python -m models.feature_store import [account_features.csv]
+    #        python -m models.feature_store export [account_features.csv]
+    command = sys.argv[1] if len(sys.argv) > 1 else "import"
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else FEATURE_CSV_PATH
+    start_time = time.time()
+
+    if command == "import":
+        version = import_csv(csv_path)
+        print(f"Imported {csv_path} into {FEATURE_STORE_PATH} as version {version}.")
+    elif command == "export":
+        store = FeatureStore.open()
+        export_csv(store, csv_path)
+        print(f"Exported version {store.version} ({len(store)} accounts) to {csv_path}.")
+    else:
+        sys.exit(f"Unknown command: {command}")
+    print(f"Done in {time.time() - start_time:.2f} seconds.")
@@ -0,0 +1,133 @@
+# models/gcn_inference.py
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import torch
+from dotenv import load_dotenv
+
+from .feature_store import open_or_import, trained_columns
+from .graph_snapshot import load_or_build_snapshot
+
+GCN_SCORES_PATH = "gcn_scores.npz"
+
+
+# --- 1. Offline full-graph inference ---
+def run_full_graph_inference(graph, features, model):
+    """
+    Runs the GCN once over the whole graph.
+
+    `features` must already be scaled and aligned with the graph's node order.
+    Returns (illicit_probabilities, hidden_embeddings) as NumPy arrays.
+    """
+    import dgl
+
+    graph = dgl.add_self_loop(graph)
+    with torch.no_grad():
+        logits, hidden = model.forward_with_hidden(graph, torch.as_tensor(features, dtype=torch.float32))
+        probabilities = torch.softmax(logits, dim=1)[:, 1]
+    return probabilities.numpy(), hidden.numpy()
+
+
+def save_scores(path, account_ids, probabilities, embeddings, graph_hash=""):
+    # float16 embeddings halve the file size; they are only used for similarity
+    # lookups and display, never fed back into training.
+    np.savez(
+        path,
+        account_ids=np.asarray(account_ids, dtype=str),
+        illicit_prob=np.asarray(probabilities, dtype=np.float32),
+        embeddings=np.asarray(embeddings, dtype=np.float16),
+        graph_hash=np.asarray(graph_hash),
+    )
+
+
+# --- 2. Request-time lookups ---
+class GCNScoreStore:
+    """
+    Read-only view over the persisted inference output.
+
+    Lookups are a dict hit plus an array index, so the API never needs to run
+    a forward pass over the full graph.
+    """
+
+    def __init__(self, account_ids, probabilities, embeddings, graph_hash=""):
+        self.account_ids = account_ids
+        self.probabilities = probabilities
+        self.embeddings = embeddings
+        # Content hash of the graph snapshot these scores were computed on.
+        self.graph_hash = graph_hash
+        self._positions = {account_id: i for i, account_id in enumerate(account_ids.tolist())}
+
+    @classmethod
+    def load(cls, path=GCN_SCORES_PATH):
+        with np.load(path) as data:
+            graph_hash = str(data["graph_hash"]) if "graph_hash" in data.files else ""
+            return cls(data["account_ids"], data["illicit_prob"], data["embeddings"], graph_hash)
+
+    def __len__(self):
+        return len(self.account_ids)
+
+    def __contains__(self, account_id):
+        return account_id in self._positions
+
+    def probability(self, account_id):
+        position = self._positions.get(account_id)
+        if position is None:
+            return None
+        return float(self.probabilities[position])
+
+    def embedding(self, account_id):
+        position = self._positions.get(account_id)
+        if position is None:
+            return None
+        return self.embeddings[position].astype(np.float32)
+
+    def probabilities_for(self, account_ids, missing=0.0):
+        """Vector of probabilities aligned with `account_ids` (unknown ids get `missing`)."""
+        positions = np.array([self._positions.get(a, -1) for a in account_ids], dtype=np.int64)
+        result = np.full(len(positions), missing, dtype=np.float64)
+        found = positions >= 0
+        result[found] = self.probabilities[positions[found]]
+        return result
+
+
+# --- 3. Batch inference script ---
+if __name__ == "__main__":
+    # Imported here so the API can read GCNScoreStore without loading DGL.
+    from .train_gcn import GCN, load_training_meta
+
+    load_dotenv()
+    start_time = time.time()
+
+    print("--- Step 1: Loading features, scaler and model ---")
+    store = open_or_import()
+    scaler = joblib.load("scaler.pkl")
+    columns = trained_columns(scaler, store)
+    model = GCN(in_feats=len(columns), h_feats=16, num_classes=2)
+    model.load_state_dict(torch.load("gcn.pth"))
+    model.eval()
+
+    print("\n--- Step 2: Loading Graph Snapshot ---")
+    snapshot = load_or_build_snapshot(
+        os.getenv("NEO4J_URI"),
+        os.getenv("NEO4J_USER"),
+        os.getenv("NEO4J_PASSWORD"),
+        rebuild="--rebuild-snapshot" in sys.argv,
+    )
+    training = load_training_meta()
+    if training is not None and training["graph_hash"] != snapshot.content_hash:
+        print(f" > WARNING: gcn.pth was trained on graph {training['graph_hash'][:12]}, "
+              f"scoring graph {snapshot.content_hash[:12]}. Consider retraining.")
+    graph = snapshot.to_dgl()
+    account_ids = snapshot.account_ids
+    features = scaler.transform(store.get_batch(account_ids, columns))
+
+    print("\n--- Step 3: Running full-graph inference ---")
+    probabilities, embeddings = run_full_graph_inference(graph, features, model)
+    print(f" > Scored {len(account_ids)} accounts, {int((probabilities > 0.5).sum())} above 0.5.")
+
+    save_scores(GCN_SCORES_PATH, account_ids, probabilities, embeddings, snapshot.content_hash)
+    print(f" > Saved probabilities and embeddings to {GCN_SCORES_PATH}")
+    print(f"\nBatch inference complete. Total time: {time.time() - start_time:.2f} seconds.")
@@ -0,0 +1,277 @@
+# models/geo_rollup.py
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+ACCOUNT_GEO_PATH = "account_geo.npz"
+# Risk thresholds resolve to this grid: a threshold counts every account whose
+# score is at least the threshold rounded up to the next 1/SCORE_RESOLUTION.
+SCORE_RESOLUTION = 100
+# Width of the activity buckets of the timeline rollup (a week by default).
+GEO_BUCKET_SECONDS = int(os.getenv("GEO_BUCKET_SECONDS", str(7 * 86400)))
+# Riskiest accounts shown on the heatmap when no threshold is given.
+HEATMAP_TOP_N = 1000
+LEVELS = ("state", "city")
+
+
+# --- 1. Account locations ---
+class AccountGeo:
+    """
+    State and city of every account as integer codes. Cities are keyed by
+    (state, city), since the same city name can appear under several states.
+    A code of -1 means the account has no location.
+    """
+
+    def __init__(self, account_ids, state_codes, city_codes, states, city_names, city_states):
+        self.account_ids = np.asarray(account_ids, dtype=str)
+        self.state_codes = np.asarray(state_codes, dtype=np.int32)
+        self.city_codes = np.asarray(city_codes, dtype=np.int32)
+        self.states = np.asarray(states, dtype=str)
+        self.city_names = np.asarray(city_names, dtype=str)
+        # State code of each city.
+        self.city_states = np.asarray(city_states, dtype=np.int32)
+
+    @classmethod
+    def from_frame(cls, accounts_df):
+        """From a frame with account_id, state and city columns."""
+        state = accounts_df["state"].replace("", np.nan)
+        city = accounts_df["city"].replace("", np.nan)
+        state_codes, states = pd.factorize(state, sort=True)
+        located = (state_codes >= 0) & city.notna().to_numpy()
+        city_codes = np.full(len(accounts_df), -1, dtype=np.int32)
+        pairs = pd.MultiIndex.from_arrays([state_codes[located], city.to_numpy()[located]])
+        city_codes[located], cities = pairs.factorize(sort=True)
+        return cls(accounts_df["account_id"].to_numpy(), state_codes, city_codes, states.to_numpy(),
+                   cities.get_level_values(1), cities.get_level_values(0))
+
+    def save(self, path=ACCOUNT_GEO_PATH):
+        # Written next to the old file and renamed, so a watching API never reads half of it.
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, account_ids=self.account_ids, state_codes=self.state_codes, city_codes=self.city_codes,
+                 states=self.states, city_names=self.city_names, city_states=self.city_states)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=ACCOUNT_GEO_PATH):
+        with np.load(path) as data:
+            return cls(data["account_ids"], data["state_codes"], data["city_codes"], data["states"],
+                       data["city_names"], data["city_states"])
+
+    def city_labels(self):
+        return [f"{city}, {self.states[state]}" for city, state in zip(self.city_names, self.city_states)]
+
+
+def geo_from_csv(accounts_path):
+    accounts = pd.read_csv(accounts_path, usecols=["account_id", "state", "city"], dtype=str)
+    return AccountGeo.from_frame(accounts)
+
+
+def geo_from_neo4j(uri, user, password):
+    from neo4j import GraphDatabase
+
+    driver = GraphDatabase.driver(uri, auth=(user, password))
+    try:
+        with driver.session() as session:
+            records = session.run("MATCH (a:Account) RETURN a.account_id AS account_id, a.state AS state, a.city AS city")
+            accounts = pd.DataFrame([record.values() for record in records], columns=["account_id", "state", "city"])
+    finally:
+        driver.close()
+    return AccountGeo.from_frame(accounts)
+
+
+def score_bins(scores):
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.clip(np.floor(scores * SCORE_RESOLUTION), 0, SCORE_RESOLUTION).astype(np.int16)
+
+
+def threshold_bin(threshold):
+    return min(max(math.ceil(threshold * SCORE_RESOLUTION - 1e-9), 0), SCORE_RESOLUTION + 1)
+
+
+# --- 2. Rollups ---
+class GeoRollup:
+    """
+    Risk-score histograms per state, per city and per (activity bucket, state),
+    so "accounts at or above a threshold" is a sum over a few hundred bins
+    instead of a scan or a database round trip.
+
+    Positions are those of the risk index the rollup was built from. Score
+    changes move one count between bins (update()), and transfers ingested
+    after the snapshot add (account, bucket) activity (add_activity()), so
+    neither needs a rebuild. An account counts once per bucket it was active in.
+    """
+
+    def __init__(self, geo, account_ids, scores, snapshot=None, bucket_seconds=GEO_BUCKET_SECONDS):
+        self._lock = threading.Lock()
+        self.bucket_seconds = bucket_seconds
+        self.states = geo.states
+        self.cities = geo.city_labels()
+        self._index = pd.Index(account_ids)
+        rows = pd.Index(geo.account_ids).get_indexer(self._index)
+        located = rows >= 0
+        self.state = np.where(located, geo.state_codes[rows], -1).astype(np.int32)
+        self.city = np.where(located, geo.city_codes[rows], -1).astype(np.int32)
+        self.bins = score_bins(scores)
+
+        width = SCORE_RESOLUTION + 1
+        self.state_hist = self._histogram(self.state, len(self.states))
+        self.city_hist = self._histogram(self.city, len(self.cities))
+
+        # Activity as sorted (position << 32 | bucket) keys, plus what ingestion added since.
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._extra = {}
+        self._first_bucket = 0
+        self.bucket_hist = np.zeros((0, len(self.states), width), dtype=np.int32)
+        if snapshot is not None and snapshot.num_edges:
+            nodes = self._index.get_indexer(snapshot.account_ids)
+            ends = np.concatenate([nodes[snapshot.src], nodes[snapshot.dst]]).astype(np.int64)
+            buckets = np.tile(np.asarray(snapshot.timestamp) // bucket_seconds, 2)
+            keep = (ends >= 0) & (self.state[np.maximum(ends, 0)] >= 0)
+            self._keys = np.unique((ends[keep] << 32) | buckets[keep])
+        if len(self._keys):
+            positions, buckets = self._keys >> 32, self._keys & 0xFFFFFFFF
+            self._first_bucket = int(buckets.min())
+            self.bucket_hist = self._histogram(self.state[positions], len(self.states), self.bins[positions],
+                                               outer=buckets - self._first_bucket,
+                                               outer_size=int(buckets.max()) - self._first_bucket + 1)
+        self._indptr = np.searchsorted(self._keys >> 32, np.arange(len(self._index) + 1))
+
+    def _histogram(self, codes, size, bins=None, outer=None, outer_size=1):
+        width = SCORE_RESOLUTION + 1
+        bins = self.bins if bins is None else bins
+        keep = codes >= 0
+        flat = codes[keep].astype(np.int64) * width + bins[keep]
+        if outer is not None:
+            flat += outer[keep] * size * width
+            return np.bincount(flat, minlength=outer_size * size * width).reshape(outer_size, size, width).astype(np.int32)
+        return np.bincount(flat, minlength=size * width).reshape(size, width).astype(np.int32)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _buckets_of(self, positions):
+        # (owner, bucket) pairs for every bucket the given accounts were active in.
+        starts, ends = self._indptr[positions], self._indptr[positions + 1]
+        counts = ends - starts
+        owner = np.repeat(np.arange(len(positions)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        buckets = self._keys[starts[owner] + offsets] & 0xFFFFFFFF
+        extra = [(i, b) for i, p in enumerate(positions.tolist()) for b in self._extra.get(p, ())]
+        if extra:
+            owner = np.concatenate([owner, [i for i, _ in extra]])
+            buckets = np.concatenate([buckets, [b for _, b in extra]])
+        return owner, buckets
+
+    # --- Incremental updates ---
+    def update(self, account_ids, scores):
+        """Moves accounts whose score changed to their new bins; ids must be unique."""
+        positions = self._index.get_indexer(account_ids)
+        known = positions >= 0
+        positions, new = positions[known], score_bins(scores)[known]
+        with self._lock:
+            old = self.bins[positions]
+            changed = old != new
+            positions, old, new = positions[changed], old[changed], new[changed]
+            if not len(positions):
+                return
+            for hist, codes in ((self.state_hist, self.state), (self.city_hist, self.city)):
+                rows = codes[positions]
+                located = rows >= 0
+                np.subtract.at(hist, (rows[located], old[located]), 1)
+                np.add.at(hist, (rows[located], new[located]), 1)
+            owner, buckets = self._buckets_of(positions)
+            rows = (buckets - self._first_bucket, self.state[positions][owner])
+            np.subtract.at(self.bucket_hist, rows + (old[owner],), 1)
+            np.add.at(self.bucket_hist, rows + (new[owner],), 1)
+            self.bins[positions] = new
+
+    def add_activity(self, account_ids, timestamps):
+        """Records transfers (epoch seconds) of accounts in buckets they were not active in yet."""
+        positions = self._index.get_indexer(account_ids).astype(np.int64)
+        buckets = np.asarray(timestamps, dtype=np.int64) // self.bucket_seconds
+        keep = (positions >= 0) & (self.state[np.maximum(positions, 0)] >= 0)
+        keys = np.unique((positions[keep] << 32) | buckets[keep])
+        found = np.searchsorted(self._keys, keys)
+        known = found < len(self._keys)
+        known[known] = self._keys[found[known]] == keys[known]
+        with self._lock:
+            for key in keys[~known].tolist():
+                position, bucket = key >> 32, key & 0xFFFFFFFF
+                active = self._extra.setdefault(position, [])
+                if bucket in active:
+                    continue
+                active.append(bucket)
+                self._grow(bucket)
+                self.bucket_hist[bucket - self._first_bucket, self.state[position], self.bins[position]] += 1
+
+    def _grow(self, bucket):
+        if not self.bucket_hist.shape[0]:
+            self._first_bucket = bucket
+        before = max(self._first_bucket - bucket, 0)
+        after = max(bucket - (self._first_bucket + self.bucket_hist.shape[0] - 1), 0)
+        if before or after:
+            self.bucket_hist = np.pad(self.bucket_hist, ((before, after), (0, 0), (0, 0)))
+            self._first_bucket -= before
+
+    def extra_activity(self):
+        """(account_ids, bucket start seconds) added since the snapshot, to carry into a rebuilt rollup."""
+        pairs = [(p, b) for p, buckets in self._extra.items() for b in buckets]
+        if not pairs:
+            return np.zeros(0, dtype=str), np.zeros(0, dtype=np.int64)
+        positions, buckets = map(np.asarray, zip(*pairs))
+        return self._index.to_numpy()[positions], buckets * self.bucket_seconds
+
+    # --- Queries ---
+    def _labels(self, level):
+        return self.states if level == "state" else self.cities
+
+    def counts_above(self, threshold, level="state"):
+        """{state or "City, State": accounts with a score >= threshold}, omitting zeros."""
+        hist = self.state_hist if level == "state" else self.city_hist
+        with self._lock:
+            counts = hist[:, threshold_bin(threshold):].sum(axis=1)
+        labels = self._labels(level)
+        return {str(labels[i]): int(counts[i]) for i in np.flatnonzero(counts)}
+
+    def counts_at(self, positions, level="state"):
+        """Same as counts_above() for an explicit set of positions (e.g. the top N of the risk index)."""
+        codes = (self.state if level == "state" else self.city)[positions]
+        labels = self._labels(level)
+        counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+        return {str(labels[i]): int(counts[i]) for i in np.flatnonzero(counts)}
+
+    def timeline(self, threshold):
+        """Per activity bucket, the accounts with a score >= threshold active in it, by state."""
+        with self._lock:
+            counts = self.bucket_hist[:, :, threshold_bin(threshold):].sum(axis=2)
+            first = self._first_bucket
+        buckets = []
+        for offset in np.flatnonzero(counts.sum(axis=1)):
+            start = datetime.fromtimestamp((first + int(offset)) * self.bucket_seconds, tz=timezone.utc)
+            row = counts[offset]
+            buckets.append({"start": start.isoformat(),
+                            "counts": {str(self.states[i]): int(row[i]) for i in np.flatnonzero(row)}})
+        return buckets
+
+
+if __name__ == "__main__":
+    # Usage: python -m models.geo_rollup            (from Neo4j)
+    #        python -m models.geo_rollup --csv      (from SynthDataGen/accounts.csv)
+    load_dotenv()
+    start_time = time.time()
+
+    if "--csv" in sys.argv:
+        geo = geo_from_csv("SynthDataGen/accounts.csv")
+    else:
+        geo = geo_from_neo4j(os.getenv("NEO4J_URI"), os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+
+    geo.save(ACCOUNT_GEO_PATH)
+    print(f"Saved the locations of {len(geo.account_ids)} accounts ({len(geo.states)} states, "
+          f"{len(geo.city_names)} cities) to {ACCOUNT_GEO_PATH} in {time.time() - start_time:.2f} seconds.")
@@ -0,0 +1,321 @@
+# models/graph_replica.py
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .graph_snapshot import GraphSnapshot, GRAPH_SNAPSHOT_PATH
+
+MAX_HOPS = 4
+DEFAULT_MAX_NODES = 500
+DEFAULT_MAX_EDGES = 2000
+# Ingested transfers are scanned linearly until there are this many; then
+# they are merged into the indexed edges in one linear pass.
+REPLICA_MERGE_EDGES = int(os.getenv("REPLICA_MERGE_EDGES", "100000"))
+
+# Edge columns; account ids are node ids into the replica's accounts.
+_Edges = namedtuple("_Edges", ["src", "dst", "amount", "timestamp", "transaction_ids"])
+# Edges plus `out_edges` (CSR, grouped by source) and `in_edges` (CSC,
+# grouped by target): permutations of edge ids, each sorted by timestamp
+# inside an account's segment.
+_Indexed = namedtuple("_Indexed", ["edges", "out_edges", "out_indptr", "in_edges", "in_indptr"])
+
+
+def _expand(indptr, nodes):
+    """Positions [indptr[n], indptr[n+1]) for every n in `nodes`, concatenated."""
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+def _index(edges, num_nodes):
+    out_indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges.src, minlength=num_nodes), out=out_indptr[1:])
+    in_indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges.dst, minlength=num_nodes), out=in_indptr[1:])
+    return _Indexed(
+        edges,
+        np.lexsort((edges.timestamp, edges.src)), out_indptr,
+        np.lexsort((edges.timestamp, edges.dst)), in_indptr,
+    )
+
+
+def _merge(indexed, recent, num_nodes):
+    """
+    `indexed` with the `recent` edges folded in, equal to _index() over all
+    of them but without re-sorting the graph: each new edge is placed into
+    its account's time-sorted segment by binary search. New edges get the
+    highest ids, so they land after existing edges with the same timestamp,
+    as the stable sort would put them.
+    """
+    edges = _concat(indexed.edges, recent)
+    new_ids = np.arange(len(indexed.edges.src), len(edges.src))
+    merged = []
+    for ordered, indptr, endpoint in ((indexed.out_edges, indexed.out_indptr, "src"),
+                                      (indexed.in_edges, indexed.in_indptr, "dst")):
+        # (account, timestamp) packed into one sortable int64 key; epoch seconds fit in 32 bits.
+        accounts = getattr(edges, endpoint)
+        keys = (accounts.astype(np.int64) << 32) + edges.timestamp
+        added = new_ids[np.argsort(keys[new_ids], kind="stable")]
+        at = np.searchsorted(keys[ordered], keys[added], side="right")
+        indptr = indptr.copy()
+        indptr[1:] += np.cumsum(np.bincount(accounts[added], minlength=num_nodes))
+        merged += [np.insert(ordered, at, added), indptr]
+    return _Indexed(edges, *merged)
+
+
+def _take(edges, positions):
+    return _Edges(*(column[positions] for column in edges))
+
+
+def _concat(*parts):
+    return _Edges(*(np.concatenate(columns) for columns in zip(*parts)))
+
+
+class GraphReplica:
+    """
+    In-process copy of the TRANSFER graph.
+
+    Edges from the snapshot are indexed once; transfers ingested since
+    (add_transactions) sit in a small unindexed overlay that every read also
+    scans, and are merged into the index once there are REPLICA_MERGE_EDGES
+    of them. Both are swapped in as one tuple, so a read never sees half an
+    update. Neo4j stays the system of record; this only serves the hot read
+    paths.
+    """
+
+    def __init__(self, snapshot, merge_edges=REPLICA_MERGE_EDGES):
+        self.account_ids = snapshot.account_ids
+        self.account_index = pd.Index(snapshot.account_ids)
+        self.merge_edges = merge_edges
+        edges = _Edges(snapshot.src, snapshot.dst, snapshot.amount, snapshot.timestamp, snapshot.transaction_ids)
+        self._state = (_index(edges, snapshot.num_nodes), _take(edges, slice(0, 0)))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=GRAPH_SNAPSHOT_PATH):
+        return cls(GraphSnapshot.load(path))
+
+    def __contains__(self, account_id):
+        return account_id in self.account_index
+
+    def _node(self, account_id):
+        try:
+            return self.account_index.get_loc(account_id)
+        except KeyError:
+            return None
+
+    # --- Ingestion ---
+    def add_transactions(self, transactions_df):
+        """
+        Adds ingested transfers (generator column names, ISO timestamps).
+        Transfers with an endpoint the replica does not know are left out.
+        Returns how many were added.
+        """
+        src = self.account_index.get_indexer(transactions_df["source_account"])
+        dst = self.account_index.get_indexer(transactions_df["target_account"])
+        known = (src >= 0) & (dst >= 0)
+        if not known.any():
+            return 0
+        timestamps = pd.to_datetime(transactions_df["timestamp"][known], format="ISO8601", utc=True)
+        added = _Edges(
+            src[known].astype(np.int32),
+            dst[known].astype(np.int32),
+            transactions_df["amount_inr"].to_numpy(dtype=np.float64)[known],
+            timestamps.astype("int64").to_numpy() // 10**9,
+            transactions_df["transaction_id"].to_numpy(dtype=str)[known],
+        )
+        with self._lock:
+            indexed, recent = self._state
+            recent = _concat(recent, added)
+            if len(recent.src) >= self.merge_edges:
+                indexed, recent = _merge(indexed, recent, len(self.account_ids)), _take(recent, slice(0, 0))
+            self._state = (indexed, recent)
+        return int(known.sum())
+
+    # --- Neighbourhood ---
+    def neighborhood(self, account_id, hops=1, max_nodes=DEFAULT_MAX_NODES, max_edges=DEFAULT_MAX_EDGES):
+        """
+        Undirected k-hop neighbourhood, in the same shape as the Cypher endpoint.
+
+        Nodes are added frontier by frontier until `max_nodes` is reached; edges
+        are those incident to nodes closer than `hops`, kept only when both ends
+        made it into the node set, capped at `max_edges`.
+        """
+        hops = min(hops, MAX_HOPS)
+        root = self._node(account_id)
+        if root is None:
+            return None
+
+        indexed, recent = self._state
+        edges = indexed.edges
+        visited = np.array([root], dtype=np.int64)
+        frontier = visited
+        edge_ids = []
+        recent_ids = []
+        truncated = False
+
+        for _ in range(hops):
+            out_ids = indexed.out_edges[_expand(indexed.out_indptr, frontier)]
+            in_ids = indexed.in_edges[_expand(indexed.in_indptr, frontier)]
+            recent_out = np.flatnonzero(np.isin(recent.src, frontier))
+            recent_in = np.flatnonzero(np.isin(recent.dst, frontier))
+            edge_ids += [out_ids, in_ids]
+            recent_ids += [recent_out, recent_in]
+
+            neighbors = np.unique(np.concatenate([
+                edges.dst[out_ids], edges.src[in_ids], recent.dst[recent_out], recent.src[recent_in],
+            ]))
+            new_nodes = np.setdiff1d(neighbors, visited, assume_unique=True)
+            room = max_nodes - len(visited)
+            if len(new_nodes) > room:
+                new_nodes = new_nodes[:max(room, 0)]
+                truncated = True
+            if len(new_nodes) == 0:
+                break
+            visited = np.union1d(visited, new_nodes)
+            frontier = new_nodes
+
+        found = _concat(_take(edges, np.unique(np.concatenate(edge_ids))),
+                        _take(recent, np.unique(np.concatenate(recent_ids))))
+        found = _take(found, np.isin(found.src, visited) & np.isin(found.dst, visited))
+        if len(found.src) > max_edges:
+            found = _take(found, slice(0, max_edges))
+            truncated = True
+
+        ids = self.account_ids
+        return {
+            "nodes": [{"id": account} for account in ids[visited].tolist()],
+            "edges": [
+                {"source": source, "target": target, "amount": amount}
+                for source, target, amount in zip(
+                    ids[found.src].tolist(),
+                    ids[found.dst].tolist(),
+                    found.amount.tolist(),
+                )
+            ],
+            "truncated": truncated,
+        }
+
+    # --- Paged history ---
+    @staticmethod
+    def _bisect(timestamps, segment, lo, hi, timestamp, right=False):
+        # Binary search on the timestamps of a time-sorted edge segment without
+        # materialising them, so a page costs O(log degree) to locate.
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = timestamps[segment[mid]]
+            if value < timestamp or (right and value == timestamp):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    @staticmethod
+    def _newest(timestamps, segment, lo, hi, keep, need):
+        """
+        Edge ids of segment[lo:hi] passing `keep`, scanning back from the
+        newest in growing chunks until `need` are found (plus any that tie
+        with the oldest of them, so the id tie-break stays exact).
+        """
+        found = []
+        count = 0
+        end = hi
+        step = max(need * 2, 64)
+        while end > lo:
+            begin = max(lo, end - step)
+            chunk = segment[begin:end]
+            chunk = chunk[keep(chunk)]
+            found.append(chunk)
+            count += len(chunk)
+            end = begin
+            step *= 2
+            if count >= need:
+                boundary = np.sort(timestamps[np.concatenate(found)])[-need]
+                if timestamps[segment[begin]] < boundary:
+                    break
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def transaction_page(self, account_id, direction="both", limit=25, cursor=None,
+                         start=None, end=None, min_amount=None, max_amount=None):
+        """
+        One page of an account's transfers, newest first, ordered by
+        (timestamp, transaction_id) descending. `cursor` is the
+        (timestamp_ms, transaction_id) of the previous page's last row;
+        `start`/`end` are epoch seconds (end exclusive). Returns
+        (rows, last_key) where last_key is set when there are more rows.
+        """
+        node = self._node(account_id)
+        if node is None:
+            return None
+
+        indexed, recent = self._state
+        cursor_ts = cursor_id = None
+        if cursor is not None:
+            cursor_ts, cursor_id = cursor[0] / 1000, cursor[1]
+
+        def keep(edges, ids):
+            mask = np.ones(len(ids), dtype=bool)
+            if min_amount is not None:
+                mask &= edges.amount[ids] >= min_amount
+            if max_amount is not None:
+                mask &= edges.amount[ids] <= max_amount
+            if cursor_ts is not None:
+                ts = edges.timestamp[ids]
+                mask &= (ts < cursor_ts) | ((ts == cursor_ts) & (edges.transaction_ids[ids] < cursor_id))
+            return mask
+
+        edges, timestamps = indexed.edges, indexed.edges.timestamp
+        candidates, directions = [], []
+        for name, ordered, indptr, endpoint in (("out", indexed.out_edges, indexed.out_indptr, "src"),
+                                                ("in", indexed.in_edges, indexed.in_indptr, "dst")):
+            if direction not in (name, "both"):
+                continue
+            segment = ordered[indptr[node]:indptr[node + 1]]
+            lo = self._bisect(timestamps, segment, 0, len(segment), start) if start is not None else 0
+            hi = len(segment)
+            if end is not None:
+                hi = self._bisect(timestamps, segment, lo, hi, end)
+            if cursor_ts is not None:
+                hi = self._bisect(timestamps, segment, lo, hi, cursor_ts, right=True)
+            newest = self._newest(timestamps, segment, lo, hi, lambda ids: keep(edges, ids), limit + 1)
+            candidates.append(_take(edges, newest))
+            directions.append(np.full(len(newest), name))
+
+            # Ingested transfers: few enough to filter directly.
+            ids = np.flatnonzero(getattr(recent, endpoint) == node)
+            mask = keep(recent, ids)
+            if start is not None:
+                mask &= recent.timestamp[ids] >= start
+            if end is not None:
+                mask &= recent.timestamp[ids] < end
+            candidates.append(_take(recent, ids[mask]))
+            directions.append(np.full(int(mask.sum()), name))
+
+        page = _concat(*candidates)
+        directions = np.concatenate(directions)
+        order = np.lexsort((page.transaction_ids, page.timestamp))[::-1][:limit + 1]
+        page, directions = _take(page, order), directions[order]
+        last_key = None
+        if len(page.src) > limit:
+            page, directions = _take(page, slice(0, limit)), directions[:limit]
+            last_key = (int(page.timestamp[-1]) * 1000, str(page.transaction_ids[-1]))
+
+        ids = self.account_ids
+        dates = pd.to_datetime(page.timestamp, unit="s").strftime("%Y-%m-%dT%H:%M:%SZ")
+        rows = [
+            {"transaction_id": txn, "from": source, "to": target, "amount": amount, "date": date,
+             "direction": edge_direction, "is_illicit": None, "pattern": None}
+            for txn, source, target, amount, date, edge_direction in zip(
+                page.transaction_ids.tolist(),
+                ids[page.src].tolist(),
+                ids[page.dst].tolist(),
+                page.amount.tolist(),
+                dates.tolist(),
+                directions.tolist(),
+            )
+        ]
+        return rows, last_key
@@ -0,0 +1,266 @@
+# models/graph_snapshot.py
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+GRAPH_SNAPSHOT_PATH = "graph_snapshot"
+META_NAME = "meta.json"
+ARRAYS = ["account_ids", "src", "dst", "amount", "timestamp", "transaction_ids"]
+
+
+class GraphSnapshot:
+    """
+    Array form of the TRANSFER graph: integer account ids plus one entry per
+    edge. Account ids index into `account_ids`; timestamps are epoch seconds.
+
+    Accounts are sorted by id and edges by (src, dst, timestamp, id), so the
+    same graph always produces the same arrays and the same `content_hash`,
+    however the source returned it.
+    """
+
+    def __init__(self, account_ids, src, dst, amount, timestamp, transaction_ids, source_counts=None, content_hash=None):
+        self.account_ids = np.asarray(account_ids, dtype=str)
+        self.src = np.asarray(src, dtype=np.int32)
+        self.dst = np.asarray(dst, dtype=np.int32)
+        self.amount = np.asarray(amount, dtype=np.float64)
+        self.timestamp = np.asarray(timestamp, dtype=np.int64)
+        self.transaction_ids = np.asarray(transaction_ids, dtype=str)
+        # (accounts, transfers) counted in the source when the snapshot was
+        # taken; compared against the live counts to detect staleness.
+        self.source_counts = source_counts
+        self.content_hash = content_hash or self._hash()
+        self._index = None
+
+    @property
+    def num_nodes(self):
+        return len(self.account_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.src)
+
+    @property
+    def account_index(self):
+        """pd.Index over account_ids, for vectorised id -> node lookups."""
+        if self._index is None:
+            self._index = pd.Index(self.account_ids)
+        return self._index
+
+    def node_map(self):
+        """Dict of account_id -> node id (builds a Python dict; prefer account_index for bulk lookups)."""
+        return dict(zip(self.account_ids.tolist(), range(self.num_nodes)))
+
+    def to_dgl(self):
+        import dgl
+        import torch
+
+        return dgl.graph((torch.from_numpy(np.asarray(self.src, dtype=np.int64)),
+                          torch.from_numpy(np.asarray(self.dst, dtype=np.int64))), num_nodes=self.num_nodes)
+
+    def _hash(self):
+        digest = hashlib.sha256()
+        for name in ARRAYS:
+            array = np.ascontiguousarray(getattr(self, name))
+            digest.update(f"{name}:{array.dtype.str}:{array.shape}".encode())
+            digest.update(array.data)
+        return digest.hexdigest()
+
+    # --- Persistence ---
+    def save(self, path=GRAPH_SNAPSHOT_PATH):
+        """
+        Writes one .npy per array plus meta.json into `path`. The directory
+        is built next to the old one and swapped in, so readers never see a
+        half-written snapshot.
+        """
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_path, META_NAME), "w") as f:
+            json.dump({
+                "content_hash": self.content_hash,
+                "num_nodes": self.num_nodes,
+                "num_edges": self.num_edges,
+                "source_counts": self.source_counts,
+                "created_at": time.time(),
+            }, f, indent=2)
+
+        old_path = path + ".old"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path=GRAPH_SNAPSHOT_PATH):
+        # Arrays are memory-mapped, so loading costs the same for any graph size.
+        with open(os.path.join(path, META_NAME)) as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS]
+        return cls(*arrays, source_counts=meta["source_counts"], content_hash=meta["content_hash"])
+
+    @staticmethod
+    def read_meta(path=GRAPH_SNAPSHOT_PATH):
+        with open(os.path.join(path, META_NAME)) as f:
+            return json.load(f)
+
+
+def snapshot_from_frames(account_ids, transactions_df, source_counts=None):
+    """
+    Builds a snapshot from an account-id list and a transactions frame with the
+    generator's column names. Edges whose endpoints are not accounts (e.g. the
+    MERCHANT targets of cash-out mules) are dropped, exactly as the Neo4j loader
+    drops them.
+    """
+    account_index = pd.Index(account_ids).sort_values()
+    src = account_index.get_indexer(transactions_df["source_account"])
+    dst = account_index.get_indexer(transactions_df["target_account"])
+    keep = (src >= 0) & (dst >= 0)
+
+    timestamp = pd.to_datetime(transactions_df["timestamp"][keep], format="ISO8601").astype("int64").to_numpy() // 10**9
+    transaction_ids = transactions_df["transaction_id"][keep].to_numpy().astype(str)
+    src, dst = src[keep], dst[keep]
+    order = np.lexsort((transaction_ids, timestamp, dst, src))
+
+    return GraphSnapshot(
+        account_ids=account_index.to_numpy(),
+        src=src[order],
+        dst=dst[order],
+        amount=transactions_df["amount_inr"][keep].to_numpy()[order],
+        timestamp=timestamp[order],
+        transaction_ids=transaction_ids[order],
+        source_counts=source_counts,
+    )
+
+
+def snapshot_from_csv(accounts_path, transactions_path):
+    accounts = pd.read_csv(accounts_path, usecols=["account_id"])
+    transactions = pd.read_csv(
+        transactions_path,
+        usecols=["transaction_id", "source_account", "target_account", "timestamp", "amount_inr"],
+    )
+    return snapshot_from_frames(accounts["account_id"], transactions)
+
+
+# Both counts come from Neo4j's count store, so this costs a few milliseconds
+# regardless of graph size.
+COUNT_QUERY = """
+CALL { MATCH (a:Account) RETURN count(a) AS accounts }
+CALL { MATCH ()-[r:TRANSFER]->() RETURN count(r) AS transfers }
+RETURN accounts, transfers
+"""
+
+
+def neo4j_counts(driver):
+    with driver.session() as session:
+        record = session.run(COUNT_QUERY).single()
+        return [record["accounts"], record["transfers"]]
+
+
+# Records pulled from the driver and converted per step.
+NEO4J_FETCH_PAGE = 100000
+_ALL = slice(None)
+
+
+def _fetch_columns(result, num_columns, page_size=NEO4J_FETCH_PAGE):
+    """
+    All records of `result` as a (rows, num_columns) object array, pulled a
+    page at a time and converted one page per step.
+    """
+    pages = []
+    while True:
+        page = result.fetch(page_size)
+        if not page:
+            break
+        # Records are tuples: slicing through tuple's own __getitem__ copies
+        # the values in C, skipping Record's Python-level iteration. That
+        # also skips its hydration check, which only temporal and spatial
+        # values need; the queries here return plain strings and numbers.
+        values = list(map(tuple.__getitem__, page, itertools.repeat(_ALL)))
+        pages.append(np.array(values, dtype=object).reshape(len(page), num_columns))
+    return np.concatenate(pages) if pages else np.empty((0, num_columns), dtype=object)
+
+
+def snapshot_from_neo4j(uri, user, password):
+    """Streams every Account and TRANSFER edge out of Neo4j into a snapshot."""
+    from neo4j import GraphDatabase
+
+    driver = GraphDatabase.driver(uri, auth=(user, password))
+    try:
+        counts = neo4j_counts(driver)
+        with driver.session() as session:
+            print(" > Fetching account ids...")
+            account_ids = _fetch_columns(session.run("MATCH (a:Account) RETURN a.account_id"), 1)[:, 0]
+
+            print(" > Streaming TRANSFER relationships...")
+            edge_query = """
+            MATCH (a:Account)-[r:TRANSFER]->(b:Account)
+            RETURN a.account_id, b.account_id, r.amount_inr, r.timestamp.epochSeconds, r.transaction_id
+            """
+            edges = _fetch_columns(session.run(edge_query), 5)
+    finally:
+        driver.close()
+
+    transactions = pd.DataFrame({
+        "source_account": edges[:, 0],
+        "target_account": edges[:, 1],
+        "amount_inr": edges[:, 2].astype(np.float64),
+        "timestamp": pd.to_datetime(edges[:, 3].astype(np.int64), unit="s"),
+        "transaction_id": edges[:, 4],
+    })
+    return snapshot_from_frames(account_ids, transactions, source_counts=counts)
+
+
+def load_or_build_snapshot(uri, user, password, path=GRAPH_SNAPSHOT_PATH, rebuild=False):
+    """
+    Returns the cached snapshot at `path` when it still matches Neo4j's
+    account and transfer counts; otherwise re-reads the graph from Neo4j and
+    refreshes the cache. Snapshots built from CSV have no counts and are
+    always trusted.
+    """
+    if os.path.exists(path) and not rebuild:
+        cached = GraphSnapshot.load(path)
+        if cached.source_counts is None:
+            return cached
+
+        from neo4j import GraphDatabase
+
+        driver = GraphDatabase.driver(uri, auth=(user, password))
+        try:
+            counts = neo4j_counts(driver)
+        finally:
+            driver.close()
+        if counts == cached.source_counts:
+            print(f" > Using cached graph snapshot {cached.content_hash[:12]} from {path}.")
+            return cached
+        print(f" > Graph snapshot is stale (snapshot {cached.source_counts}, Neo4j {counts}); rebuilding...")
+
+    snapshot = snapshot_from_neo4j(uri, user, password)
+    snapshot.save(path)
+    print(f" > Saved graph snapshot {snapshot.content_hash[:12]} to {path}.")
+    return snapshot
+
+
+if __name__ == "__main__":
+    # Usage: python -m models.graph_snapshot            (from Neo4j)
+    #        python -m models.graph_snapshot --csv      (from SynthDataGen CSVs)
+    load_dotenv()
+    start_time = time.time()
+
+    if "--csv" in sys.argv:
+        snapshot = snapshot_from_csv("SynthDataGen/accounts.csv", "SynthDataGen/transactions.csv")
+    else:
+        snapshot = snapshot_from_neo4j(os.getenv("NEO4J_URI"), os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+
+    snapshot.save(GRAPH_SNAPSHOT_PATH)
+    print(f"Saved {snapshot.num_nodes} accounts and {snapshot.num_edges} transfers to {GRAPH_SNAPSHOT_PATH} "
+          f"(content hash {snapshot.content_hash[:12]}) in {time.time() - start_time:.2f} seconds.")
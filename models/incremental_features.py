@@ -0,0 +1,245 @@
+# models/incremental_features.py
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .feature_store import FEATURE_COLUMNS, FEATURE_STORE_PATH, FeatureStore, FeatureStoreWriter
+
+AGGREGATE_STATE_PATH = "account_aggregates.npz"
+
+
+def _to_paise(amounts):
+    # Amounts carry two decimals. Summing them as integer paise makes the
+    # totals independent of summation order, so applying deltas in any batch
+    # order lands on exactly the same numbers as a full recompute.
+    return np.rint(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int64)
+
+
+class IncrementalAggregator:
+    """
+    Running per-account transaction aggregates that can absorb new batches.
+
+    Only the base sums are stored (degrees and paise totals); averages,
+    transaction_volume and net_flow are derived on read, so a batch touches
+    the affected accounts' counters and nothing else.
+    """
+
+    def __init__(self, account_ids, initial_risk, out_degree=None, in_degree=None, out_paise=None, in_paise=None):
+        n = len(account_ids)
+        self.account_index = pd.Index(np.asarray(account_ids, dtype=str))
+        self.initial_risk = np.asarray(initial_risk, dtype=np.int64)
+        self.out_degree = np.zeros(n, dtype=np.int64) if out_degree is None else np.asarray(out_degree, dtype=np.int64)
+        self.in_degree = np.zeros(n, dtype=np.int64) if in_degree is None else np.asarray(in_degree, dtype=np.int64)
+        self.out_paise = np.zeros(n, dtype=np.int64) if out_paise is None else np.asarray(out_paise, dtype=np.int64)
+        self.in_paise = np.zeros(n, dtype=np.int64) if in_paise is None else np.asarray(in_paise, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.account_index)
+
+    # --- Persistence ---
+    def save(self, path=AGGREGATE_STATE_PATH):
+        np.savez(
+            path,
+            account_ids=self.account_index.to_numpy(dtype=str),
+            initial_risk=self.initial_risk,
+            out_degree=self.out_degree,
+            in_degree=self.in_degree,
+            out_paise=self.out_paise,
+            in_paise=self.in_paise,
+        )
+
+    @classmethod
+    def load(cls, path=AGGREGATE_STATE_PATH):
+        with np.load(path) as data:
+            return cls(
+                data["account_ids"], data["initial_risk"],
+                data["out_degree"], data["in_degree"], data["out_paise"], data["in_paise"],
+            )
+
+    # --- Updates ---
+    def apply(self, transactions_df):
+        """
+        Applies a batch of transactions (generator column names) as deltas.
+
+        Transfers with an endpoint that is not a known account are skipped, the
+        same way the Neo4j loader's MATCH drops them. Returns the positions of
+        the accounts whose features changed and the number of skipped rows.
+        """
+        src = self.account_index.get_indexer(transactions_df["source_account"])
+        dst = self.account_index.get_indexer(transactions_df["target_account"])
+        keep = (src >= 0) & (dst >= 0)
+        src, dst = src[keep], dst[keep]
+        paise = _to_paise(transactions_df["amount_inr"].to_numpy()[keep])
+
+        affected, local = np.unique(np.concatenate([src, dst]), return_inverse=True)
+        local_src, local_dst = local[:len(src)], local[len(src):]
+        m = len(affected)
+
+        self.out_degree[affected] += np.bincount(local_src, minlength=m)
+        self.in_degree[affected] += np.bincount(local_dst, minlength=m)
+        self.out_paise[affected] += self._sum_by(local_src, paise, m)
+        self.in_paise[affected] += self._sum_by(local_dst, paise, m)
+        return affected, int((~keep).sum())
+
+    @staticmethod
+    def _sum_by(groups, values, size):
+        # np.bincount only sums in float64; np.add.at keeps the int64 totals exact.
+        totals = np.zeros(size, dtype=np.int64)
+        np.add.at(totals, groups, values)
+        return totals
+
+    # --- Reads ---
+    def features(self, positions=None):
+        """Feature frame (account_features.csv layout) for `positions`, or all accounts."""
+        selector = slice(None) if positions is None else positions
+        out_degree = self.out_degree[selector]
+        in_degree = self.in_degree[selector]
+        total_out = self.out_paise[selector] / 100.0
+        total_in = self.in_paise[selector] / 100.0
+
+        frame = pd.DataFrame({
+            "account_id": self.account_index.to_numpy()[selector],
+            "initial_risk": self.initial_risk[selector],
+            "out_degree": out_degree,
+            "in_degree": in_degree,
+            "total_amount_out": total_out,
+            "total_amount_in": total_in,
+            "avg_amount_out": np.divide(total_out, out_degree, out=np.zeros(len(total_out)), where=out_degree > 0),
+            "avg_amount_in": np.divide(total_in, in_degree, out=np.zeros(len(total_in)), where=in_degree > 0),
+        })
+        frame["transaction_volume"] = frame["total_amount_in"] + frame["total_amount_out"]
+        frame["net_flow"] = frame["total_amount_in"] - frame["total_amount_out"]
+        return frame
+
+    def write_store(self, path=FEATURE_STORE_PATH, chunk_size=200000, carry=None):
+        """
+        Publishes the current aggregates as a new feature store version.
+
+        Columns of the `carry` store that are not aggregated here (e.g. the
+        temporal features of models/temporal_features.py) are copied over by
+        account id, zeros for new accounts, until they are next recomputed.
+        """
+        extra = [column for column in carry.columns if column not in FEATURE_COLUMNS] if carry is not None else []
+        meta = {key: carry.meta[key] for key in ("temporal_as_of",) if extra and key in carry.meta}
+        writer = FeatureStoreWriter(path, columns=FEATURE_COLUMNS + extra, source="incremental", meta=meta)
+        for start in range(0, len(self), chunk_size):
+            chunk = self.features(np.arange(start, min(start + chunk_size, len(self))))
+            if extra:
+                rows = carry.rows_of(chunk["account_id"].to_numpy())
+                values = carry.matrix(extra, rows=np.maximum(rows, 0))
+                values[rows < 0] = 0.0
+                chunk[extra] = values
+            writer.append(chunk)
+        return writer.commit()
+
+
+def full_recompute(account_ids, initial_risk, transactions_df):
+    """Builds the aggregator state from scratch by applying the whole history as one batch."""
+    aggregator = IncrementalAggregator(account_ids, initial_risk)
+    aggregator.apply(transactions_df)
+    return aggregator
+
+
+def reference_features(account_ids, initial_risk, transactions_df):
+    """
+    The FeatureExtractor aggregates computed with a plain pandas groupby,
+    sharing no code with IncrementalAggregator, so check_consistency can
+    catch a bug in apply() itself. Amounts are summed in paise for the same
+    exactness; transfers with an unknown endpoint are dropped like the
+    loader's MATCH drops them.
+    """
+    accounts = pd.Index(np.asarray(account_ids, dtype=str))
+    transactions = transactions_df[["source_account", "target_account"]].astype(str)
+    transactions = transactions.assign(
+        paise=np.rint(transactions_df["amount_inr"].to_numpy(dtype=np.float64) * 100).astype(np.int64)
+    )
+    transactions = transactions[transactions["source_account"].isin(accounts)
+                                & transactions["target_account"].isin(accounts)]
+
+    out = transactions.groupby("source_account")["paise"].agg(["size", "sum"]).reindex(accounts, fill_value=0)
+    into = transactions.groupby("target_account")["paise"].agg(["size", "sum"]).reindex(accounts, fill_value=0)
+
+    frame = pd.DataFrame({
+        "account_id": accounts.to_numpy(),
+        "initial_risk": np.asarray(initial_risk, dtype=np.int64),
+        "out_degree": out["size"].to_numpy(dtype=np.int64),
+        "in_degree": into["size"].to_numpy(dtype=np.int64),
+        "total_amount_out": out["sum"].to_numpy() / 100.0,
+        "total_amount_in": into["sum"].to_numpy() / 100.0,
+    })
+    frame["avg_amount_out"] = (frame["total_amount_out"] / frame["out_degree"]).where(frame["out_degree"] > 0, 0.0)
+    frame["avg_amount_in"] = (frame["total_amount_in"] / frame["in_degree"]).where(frame["in_degree"] > 0, 0.0)
+    frame["transaction_volume"] = frame["total_amount_in"] + frame["total_amount_out"]
+    frame["net_flow"] = frame["total_amount_in"] - frame["total_amount_out"]
+    return frame[["account_id"] + FEATURE_COLUMNS]
+
+
+def check_consistency(aggregator, transactions_df):
+    """
+    Recomputes the aggregator's accounts from the full transaction history
+    with reference_features() and compares every feature column. Returns a
+    report; `report["ok"]` is True only when all columns match exactly.
+    """
+    incremental = aggregator.features()
+    expected = reference_features(aggregator.account_index, aggregator.initial_risk, transactions_df)
+
+    mismatched = {}
+    for column in FEATURE_COLUMNS:
+        differs = incremental[column].to_numpy() != expected[column].to_numpy()
+        if differs.any():
+            mismatched[column] = incremental["account_id"][differs].head(5).tolist()
+
+    return {
+        "accounts_checked": len(aggregator),
+        "transactions_checked": len(transactions_df),
+        "mismatched_columns": mismatched,
+        "ok": not mismatched,
+    }
+
+
+def _current_store(path=FEATURE_STORE_PATH):
+    # Carried into the versions the CLI writes, as the serving flush does, so
+    # columns computed elsewhere (the temporal features) are not dropped.
+    try:
+        return FeatureStore.open(path)
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    # Usage: python -m models.incremental_features init <accounts.csv> <transactions.csv>
+    #        python -m models.incremental_features apply <batch.csv>
+    #        python -m models.incremental_features check <transactions.csv>
+    command = sys.argv[1]
+    start_time = time.time()
+
+    if command == "init":
+        accounts = pd.read_csv(sys.argv[2], usecols=["account_id", "initial_risk_rating"])
+        transactions = pd.read_csv(sys.argv[3], usecols=["source_account", "target_account", "amount_inr"])
+        aggregator = full_recompute(accounts["account_id"], accounts["initial_risk_rating"], transactions)
+        aggregator.save()
+        version = aggregator.write_store(carry=_current_store())
+        print(f"Built aggregates for {len(aggregator)} accounts; feature store version {version}.")
+
+    elif command == "apply":
+        aggregator = IncrementalAggregator.load()
+        batch = pd.read_csv(sys.argv[2], usecols=["source_account", "target_account", "amount_inr"])
+        affected, skipped = aggregator.apply(batch)
+        aggregator.save()
+        version = aggregator.write_store(carry=_current_store())
+        print(f"Applied {len(batch)} transactions ({skipped} skipped); "
+              f"{len(affected)} accounts updated; feature store version {version}.")
+
+    elif command == "check":
+        aggregator = IncrementalAggregator.load()
+        transactions = pd.read_csv(sys.argv[2], usecols=["source_account", "target_account", "amount_inr"])
+        report = check_consistency(aggregator, transactions)
+        print(report)
+        if not report["ok"]:
+            sys.exit(1)
+    else:
+        sys.exit(f"Unknown command: {command}")
+
+    print(f"Done in {time.time() - start_time:.2f} seconds.")
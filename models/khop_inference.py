@@ -0,0 +1,331 @@
+# models/khop_inference.py
+import os
+import time
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+import torch
+from dotenv import load_dotenv
+
+# Max |khop - full graph| on logits when no fan-out cap is hit. The two paths
+# do the same float32 arithmetic in a different summation order.
+LOGIT_TOLERANCE = 1e-4
+
+# Hub accounts with more in-edges than this get a uniform sample of their
+# neighbours, rescaled so the aggregated message stays unbiased.
+DEFAULT_FANOUT_CAP = 200
+
+
+# Ingested edges sit in a small sorted overlay until there are this many,
+# then they are merged into the CSR arrays in one linear pass.
+ADJACENCY_MERGE_EDGES = int(os.getenv("ADJACENCY_MERGE_EDGES", "100000"))
+
+_NO_EDGES = np.zeros(0, dtype=np.int64)
+
+
+# --- 1. In-memory incoming adjacency ---
+class GroupedEdges:
+    """
+    Edges grouped by one endpoint (the key): CSR arrays built once, plus an
+    overlay of edges added since, sorted by key. Adding a batch costs the
+    batch and the overlay, not the graph; the overlay is folded into the CSR
+    arrays when it reaches `merge_edges`.
+
+    The four arrays are swapped in as one tuple, so a reader running next to
+    add() sees either the old edge set or the new one.
+    """
+
+    def __init__(self, keys, values, num_nodes, merge_edges=ADJACENCY_MERGE_EDGES):
+        keys = np.asarray(keys, dtype=np.int64)
+        values = np.asarray(values, dtype=np.int64)
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=num_nodes), out=indptr[1:])
+        self.num_nodes = num_nodes
+        self.merge_edges = merge_edges
+        # (indptr, values grouped by key, overlay keys, overlay values)
+        self._state = (indptr, values[np.argsort(keys, kind="stable")], _NO_EDGES, _NO_EDGES)
+
+    def __len__(self):
+        indptr, _, overlay_keys, _ = self._state
+        return int(indptr[-1]) + len(overlay_keys)
+
+    def add(self, keys, values):
+        indptr, grouped, overlay_keys, overlay_values = self._state
+        order = np.argsort(keys, kind="stable")
+        keys = np.asarray(keys, dtype=np.int64)[order]
+        values = np.asarray(values, dtype=np.int64)[order]
+        # After the overlay's own edges of the same key, so each key's edges stay in arrival order.
+        at = np.searchsorted(overlay_keys, keys, side="right")
+        overlay_keys, overlay_values = np.insert(overlay_keys, at, keys), np.insert(overlay_values, at, values)
+        if len(overlay_keys) >= self.merge_edges:
+            # Each overlay edge goes right after its key's CSR segment: a
+            # linear merge, no sort of the whole edge set.
+            grouped = np.insert(grouped, indptr[overlay_keys + 1], overlay_values)
+            indptr = indptr.copy()
+            indptr[1:] += np.cumsum(np.bincount(overlay_keys, minlength=self.num_nodes))
+            overlay_keys = overlay_values = _NO_EDGES
+        self._state = (indptr, grouped, overlay_keys, overlay_values)
+
+    def gather(self, nodes, fanout_cap=None, seed=0):
+        """
+        (owner, values, counts, capped) for the edges of `nodes`: `owner`
+        indexes into `nodes`, `counts` are the full per-node degrees and
+        `capped` how many were returned. Nodes over `fanout_cap` get a uniform
+        sample of their edges.
+        """
+        indptr, grouped, overlay_keys, overlay_values = self._state
+        starts = indptr[nodes]
+        base_counts = indptr[nodes + 1] - starts
+        overlay_starts = np.searchsorted(overlay_keys, nodes, side="left")
+        counts = base_counts + np.searchsorted(overlay_keys, nodes, side="right") - overlay_starts
+        capped = counts if fanout_cap is None else np.minimum(counts, fanout_cap)
+
+        segment_starts = np.cumsum(capped) - capped
+        owner = np.repeat(np.arange(len(nodes)), capped)
+        offsets = np.arange(capped.sum()) - np.repeat(segment_starts, capped)
+
+        if fanout_cap is not None:
+            rng = np.random.default_rng(seed)
+            for hub in np.flatnonzero(counts > fanout_cap):
+                segment = slice(segment_starts[hub], segment_starts[hub] + fanout_cap)
+                offsets[segment] = rng.choice(counts[hub], fanout_cap, replace=False)
+
+        # Offsets past a node's CSR segment continue into its overlay edges.
+        in_base = offsets < base_counts[owner]
+        values = np.empty(len(offsets), dtype=np.int64)
+        values[in_base] = grouped[starts[owner[in_base]] + offsets[in_base]]
+        spill = ~in_base
+        values[spill] = overlay_values[overlay_starts[owner[spill]] + offsets[spill] - base_counts[owner[spill]]]
+        return owner, values, counts, capped
+
+
+class InNeighborIndex:
+    """
+    Incoming and outgoing adjacency (edges grouped by destination and by
+    source) plus full-graph degrees.
+
+    GraphConv normalises by the degrees of the *full* graph, so those are kept
+    here and reused for every subgraph instead of being recomputed locally.
+    Self-loops are implicit: every node counts one extra in and out edge,
+    matching dgl.add_self_loop() in training.
+    """
+
+    def __init__(self, src, dst, num_nodes):
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        self.num_nodes = num_nodes
+        self.incoming = GroupedEdges(dst, src, num_nodes)
+        self.outgoing = GroupedEdges(src, dst, num_nodes)
+        self.out_degree = np.bincount(src, minlength=num_nodes) + 1
+        self.in_degree = np.bincount(dst, minlength=num_nodes) + 1
+        self.out_norm = np.power(self.out_degree, -0.5).astype(np.float32)
+        self.in_norm = np.power(self.in_degree, -0.5).astype(np.float32)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Builds the index from a DGL graph (without self-loops)."""
+        src, dst = graph.edges()
+        return cls(src.numpy(), dst.numpy(), graph.num_nodes())
+
+    def add_edges(self, src, dst):
+        """Adds ingested edges in place; only their endpoints' degrees and norms change."""
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        if len(src) == 0:
+            return
+        np.add.at(self.out_degree, src, 1)
+        np.add.at(self.in_degree, dst, 1)
+        touched = np.unique(src)
+        self.out_norm[touched] = np.power(self.out_degree[touched], -0.5)
+        touched = np.unique(dst)
+        self.in_norm[touched] = np.power(self.in_degree[touched], -0.5)
+        self.incoming.add(dst, src)
+        self.outgoing.add(src, dst)
+
+    def in_edges(self, nodes, fanout_cap=None, seed=0):
+        """
+        Incoming edges of `nodes` as (owner, src, scale) arrays, where `owner`
+        indexes into `nodes`. Nodes over `fanout_cap` keep a sampled subset and
+        a scale of degree / cap.
+        """
+        owner, src, counts, capped = self.incoming.gather(nodes, fanout_cap, seed)
+        scale = (counts / np.maximum(capped, 1))[owner].astype(np.float32)
+        return owner, src, scale
+
+    def downstream(self, nodes, hops=2):
+        """
+        `nodes` plus every node up to `hops` out-edges away: the nodes whose
+        `hops`-layer receptive field contains one of `nodes`.
+        """
+        reached = frontier = np.unique(np.asarray(nodes, dtype=np.int64))
+        for _ in range(hops):
+            _, dst, _, _ = self.outgoing.gather(frontier)
+            frontier = np.setdiff1d(dst, reached)
+            if len(frontier) == 0:
+                break
+            reached = np.union1d(reached, frontier)
+        return reached
+
+
+# --- 2. Receptive-field scoring ---
+def to_torch_sparse(matrix):
+    """scipy sparse matrix -> float32 torch COO tensor."""
+    coo = matrix.tocoo()
+    indices = np.vstack([coo.row, coo.col]).astype(np.int64)
+    return torch.sparse_coo_tensor(indices, coo.data.astype(np.float32), coo.shape)
+
+
+class KHopScorer:
+    """
+    Scores individual accounts with the two-layer GCN using only their 2-hop
+    receptive field (conv2 reads conv1 outputs of in-neighbours, conv1 reads
+    raw features of *their* in-neighbours).
+    """
+
+    def __init__(self, adjacency, node_map, raw_features, scaler, state_dict=None, fanout_cap=DEFAULT_FANOUT_CAP,
+                 model=None):
+        self.adjacency = adjacency
+        self.node_map = node_map
+        self.raw_features = np.asarray(raw_features, dtype=np.float64)
+        self.scaler = scaler
+        self.fanout_cap = fanout_cap
+        # Either `model`, a module called as model(adjacency1, adjacency2, x)
+        # (optimized_models.ScriptableGCN or its TorchScript export), or the
+        # GCN `state_dict` for the plain NumPy path.
+        self.model = model
+        if model is None:
+            self.w1 = state_dict["conv1.weight"].numpy()
+            self.b1 = state_dict["conv1.bias"].numpy()
+            self.w2 = state_dict["conv2.weight"].numpy()
+            self.b2 = state_dict["conv2.bias"].numpy()
+
+    def set_features(self, account_ids, raw_rows):
+        """Overwrites the raw feature rows of changed accounts before rescoring."""
+        positions = [self.node_map[account_id] for account_id in account_ids]
+        self.raw_features[positions] = raw_rows
+
+    def _messages(self, dst_nodes, src_nodes):
+        # GraphConv(norm='both') coefficients of one layer restricted to
+        # `dst_nodes`, as a (dst, src) matrix; src_nodes is sorted.
+        adjacency = self.adjacency
+        owner, src, scale = adjacency.in_edges(dst_nodes, self.fanout_cap)
+        src_pos = np.searchsorted(src_nodes, src)
+        self_pos = np.searchsorted(src_nodes, dst_nodes)
+
+        coefficients = np.concatenate([scale * adjacency.out_norm[src], adjacency.out_norm[dst_nodes]])
+        rows = np.concatenate([owner, np.arange(len(dst_nodes))])
+        cols = np.concatenate([src_pos, self_pos])
+        messages = sp.csr_matrix((coefficients, (rows, cols)), shape=(len(dst_nodes), len(src_nodes)))
+        return sp.diags(adjacency.in_norm[dst_nodes]) @ messages
+
+    def receptive_field(self, targets):
+        """
+        Everything the two layers read for the sorted node ids `targets`:
+        (hop1, hop2, messages1, messages2, x), where x holds the scaled
+        features of hop2 and messages1/messages2 are the layers' coefficients.
+        """
+        _, hop1_src, _ = self.adjacency.in_edges(targets, self.fanout_cap)
+        hop1 = np.unique(np.concatenate([targets, hop1_src]))
+        _, hop2_src, _ = self.adjacency.in_edges(hop1, self.fanout_cap)
+        hop2 = np.unique(np.concatenate([hop1, hop2_src]))
+
+        x = self.scaler.transform(self.raw_features[hop2]).astype(np.float32)
+        return hop1, hop2, self._messages(hop1, hop2), self._messages(targets, hop1), x
+
+    def logits(self, account_ids):
+        """Returns a (len(account_ids), num_classes) array of GCN logits."""
+        targets = np.array([self.node_map[account_id] for account_id in account_ids], dtype=np.int64)
+        unique_targets, inverse = np.unique(targets, return_inverse=True)
+
+        _, _, messages1, messages2, x = self.receptive_field(unique_targets)
+        if self.model is not None:
+            with torch.no_grad():
+                logits = self.model(to_torch_sparse(messages1), to_torch_sparse(messages2), torch.from_numpy(x))
+            logits = logits.numpy()
+        else:
+            hidden = np.maximum(messages1 @ (x @ self.w1) + self.b1, 0).astype(np.float32)
+            logits = messages2 @ (hidden @ self.w2) + self.b2
+        return logits[inverse]
+
+    def probabilities(self, account_ids):
+        logits = self.logits(account_ids)
+        shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return shifted[:, 1] / shifted.sum(axis=1)
+
+
+# --- 3. Benchmark against full-graph inference ---
+def benchmark(graph, node_map, features_df, scaler, model, sample_size=1000, fanout_cap=DEFAULT_FANOUT_CAP,
+              serving_model=None):
+    """
+    Times both paths on the same graph and reports the worst logit difference.
+    With `serving_model` (see optimized_models.load_gcn) its uncapped k-hop
+    path is measured too, under "serving".
+    """
+    import dgl
+
+    account_ids = list(node_map.keys())
+    raw = features_df.loc[account_ids].values
+    x = torch.as_tensor(scaler.transform(raw), dtype=torch.float32)
+
+    start = time.perf_counter()
+    with torch.no_grad():
+        full_logits = model(dgl.add_self_loop(graph), x).numpy()
+    full_seconds = time.perf_counter() - start
+
+    adjacency = InNeighborIndex.from_graph(graph)
+    sample = np.random.default_rng(0).choice(len(account_ids), min(sample_size, len(account_ids)), replace=False)
+    sample_ids = [account_ids[i] for i in sample]
+
+    results = {"full_graph_seconds": full_seconds}
+    runs = [("uncapped", None, None), ("capped", fanout_cap, None)]
+    if serving_model is not None:
+        runs.append(("serving", None, serving_model))
+    for label, cap, scorer_model in runs:
+        scorer = KHopScorer(adjacency, node_map, raw, scaler, model.state_dict(), fanout_cap=cap, model=scorer_model)
+        latencies = []
+        worst = 0.0
+        for account_id, row in zip(sample_ids, sample):
+            start = time.perf_counter()
+            logits = scorer.logits([account_id])[0]
+            latencies.append(time.perf_counter() - start)
+            worst = max(worst, float(np.abs(logits - full_logits[row]).max()))
+        results[label] = {
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "max_abs_logit_diff": worst,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    from .train_gcn import GCN
+    from .feature_store import open_or_import, trained_columns
+    from .graph_snapshot import load_or_build_snapshot
+    from .optimized_models import load_gcn
+
+    load_dotenv()
+    store = open_or_import()
+    scaler = joblib.load("scaler.pkl")
+    features_df = store.to_frame()[trained_columns(scaler, store)]
+    model = GCN(in_feats=features_df.shape[1], h_feats=16, num_classes=2)
+    model.load_state_dict(torch.load("gcn.pth"))
+    model.eval()
+
+    snapshot = load_or_build_snapshot(
+        os.getenv("NEO4J_URI"),
+        os.getenv("NEO4J_USER"),
+        os.getenv("NEO4J_PASSWORD")
+    )
+    graph, node_map = snapshot.to_dgl(), snapshot.node_map()
+    serving_model, variant = load_gcn()
+    results = benchmark(graph, node_map, features_df, scaler, model, serving_model=serving_model)
+
+    print(f"\nFull-graph forward pass: {results['full_graph_seconds'] * 1000:.1f} ms")
+    for label in ("uncapped", "capped", "serving"):
+        r = results[label]
+        name = f"{label}, {variant}" if label == "serving" else label
+        print(f"k-hop ({name}): p50 {r['p50_ms']:.2f} ms, p99 {r['p99_ms']:.2f} ms, "
+              f"max |logit diff| {r['max_abs_logit_diff']:.2e}")
+    status = "PASS" if results["uncapped"]["max_abs_logit_diff"] <= LOGIT_TOLERANCE else "FAIL"
+    print(f"Parity with full-graph inference (tolerance {LOGIT_TOLERANCE:g}): {status}")
@@ -0,0 +1,221 @@
+# models/metrics.py
+import bisect
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# METRICS_ENABLED=0 drops the API's request timing and /metrics and makes the
+# timed() / .time() hooks no-ops; the remaining counters cost one addition.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Seconds, from sub-millisecond lookups up to model loads.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Registry:
+    """Every metric of the process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# --- 1. Metric types ---
+class _Metric:
+    """
+    A named family of time series, one per combination of label values.
+    Resolve children once with labels() and keep them: observing on a bound
+    child is a lock and an addition.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}.")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield from child.samples(self.name, self.labelnames, values)
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = float(value)
+
+    def samples(self, name, labelnames, values):
+        yield f"{name}{_labels(labelnames, values)} {_number(self.value)}"
+
+
+class Counter(_Metric):
+    type = "counter"
+    _new_child = _Value
+
+
+class Gauge(_Metric):
+    type = "gauge"
+    _new_child = _Value
+
+
+class _Buckets:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        # Prometheus buckets are inclusive upper bounds ("le").
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager observing the seconds spent inside it."""
+        return _Timer(self) if METRICS_ENABLED else nullcontext()
+
+    def samples(self, name, labelnames, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            cumulative += count
+            yield f"{name}_bucket{_labels(labelnames + ('le',), values + (_number(bound),))} {cumulative}"
+        yield f"{name}_sum{_labels(labelnames, values)} {_number(total)}"
+        yield f"{name}_count{_labels(labelnames, values)} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ("_buckets", "_start")
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._buckets.observe(time.perf_counter() - self._start)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+
+class CallbackMetric(_Metric):
+    """
+    Values read at scrape time from `collect()`, which returns (label values,
+    value) pairs. For state the code already keeps (pool sizes, cache
+    counters), so the hot path does no extra work.
+    """
+
+    def __init__(self, name, documentation, type, collect, labelnames=(), registry=REGISTRY):
+        self.type = type
+        self._collect = collect
+        super().__init__(name, documentation, labelnames, registry)
+
+    def samples(self):
+        for values, value in self._collect():
+            yield f"{self.name}{_labels(self.labelnames, tuple(values))} {_number(value)}"
+
+
+# --- 2. Timing hooks ---
+def timed(histogram, *label_values):
+    """
+    Decorator observing each call's duration on `histogram` under
+    `label_values`. With metrics disabled the function is returned as is.
+    """
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+        child = histogram.labels(*label_values)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def ratio(hits, misses):
+    total = hits + misses
+    return hits / total if total else 0.0
@@ -0,0 +1,145 @@
+# models/model_registry.py
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from .metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+MODEL_LOAD_SECONDS = Histogram("aml_model_load_seconds", "Time to build a model bundle from the artifact files.").labels()
+MODEL_RELOAD_FAILURES = Counter("aml_model_reload_failures_total", "Watcher reloads that failed.").labels()
+
+# Seconds between checks for new artifact versions; 0 disables watching.
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+
+
+class ModelUnavailable(RuntimeError):
+    """A required artifact is missing or unreadable, so nothing can be served."""
+
+
+def fingerprint(paths):
+    """{path: (mtime_ns, size)} for each watched file, None where it is missing."""
+    sources = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            sources[path] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            sources[path] = None
+    return sources
+
+
+def version_of(sources):
+    """Short, stable id for one combination of artifact files."""
+    digest = hashlib.sha256(repr(sorted(sources.items())).encode())
+    return digest.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """
+    Holds the current bundle of loaded artifacts and swaps in a new one when
+    the watched files change.
+
+    `build(version, sources)` loads a bundle, which must expose `version` and
+    `sources`. Nothing is loaded until the first get() (or warmup()). Callers
+    take one reference with get() and use it for the whole request, so a swap
+    never changes artifacts under a request that is already running: it keeps
+    the old bundle until it returns, and the old bundle is freed after that.
+
+    `adopt(new, old)` runs under `swap_lock` right before a swap, to carry
+    state that the new artifacts do not contain yet (e.g. live rescoring).
+    """
+
+    def __init__(self, build, watched_paths, adopt=None, swap_lock=None, interval=MODEL_RELOAD_INTERVAL):
+        self._build = build
+        self._adopt = adopt
+        self._paths = list(watched_paths)
+        self._swap_lock = swap_lock or threading.RLock()
+        self._load_lock = threading.Lock()
+        self._current = None
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.interval = interval
+
+    @property
+    def loaded(self):
+        return self._current is not None
+
+    def get(self):
+        """The current bundle, loading it on first use."""
+        bundle = self._current
+        if bundle is None:
+            with self._load_lock:
+                if self._current is None:
+                    self._load(fingerprint(self._paths))
+                bundle = self._current
+        return bundle
+
+    warmup = get
+
+    def reload(self, force=False):
+        """Builds and swaps in a new bundle if the watched files changed. Returns True on a swap."""
+        with self._load_lock:
+            sources = fingerprint(self._paths)
+            if not force and self._current is not None and sources == self._current.sources:
+                return False
+            self._load(sources)
+            return True
+
+    def _load(self, sources):
+        # Callers hold self._load_lock, so bundles are built one at a time.
+        start = time.perf_counter()
+        bundle = self._build(version_of(sources), sources)
+        with self._swap_lock:
+            old = self._current
+            if old is not None and self._adopt is not None:
+                self._adopt(bundle, old)
+            self._current = bundle
+        seconds = time.perf_counter() - start
+        MODEL_LOAD_SECONDS.observe(seconds)
+        logger.info("Loaded model version %s in %.2f s (previous: %s).", bundle.version,
+                    seconds, old.version if old is not None else None)
+
+    # --- Watching ---
+    def check(self):
+        """
+        One watcher step. A change is only picked up once two consecutive
+        checks agree, so files that are still being written are left alone.
+        """
+        current = self._current
+        if current is None:
+            return False
+        sources = fingerprint(self._paths)
+        if sources == current.sources:
+            self._pending = None
+            return False
+        if sources != self._pending:
+            self._pending = sources
+            return False
+        try:
+            return self.reload()
+        except Exception:
+            MODEL_RELOAD_FAILURES.inc()
+            logger.exception("Model reload failed; still serving version %s.", current.version)
+            return False
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start_watching(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,310 @@
+# models/optimized_models.py
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+
+import joblib
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from dotenv import load_dotenv
+from torch.ao.quantization import quantize_dynamic
+
+from .train_autoencoder import Autoencoder
+from .feature_store import open_or_import, trained_columns
+from .graph_snapshot import load_or_build_snapshot
+
+logger = logging.getLogger(__name__)
+
+GCN_STATE_PATH = "gcn.pth"
+AUTOENCODER_STATE_PATH = "autoencoder.pth"
+OPTIMIZED_REPORT_PATH = "optimized_models.json"
+ARTIFACT_PATHS = {
+    ("gcn", "fp32"): "gcn.ts.pt",
+    ("gcn", "int8"): "gcn.int8.ts.pt",
+    ("autoencoder", "fp32"): "autoencoder.ts.pt",
+    ("autoencoder", "int8"): "autoencoder.int8.ts.pt",
+}
+
+# Max |optimized - eager| on GCN logits / autoencoder reconstruction errors.
+# fp32 artifacts only reorder float32 arithmetic; int8 ones quantize the
+# Linear weights, so they are held to a looser bound on the outputs we serve
+# (illicit probabilities and reconstruction errors) instead.
+FP32_TOLERANCE = 1e-4
+INT8_PROBABILITY_TOLERANCE = 0.02
+INT8_ERROR_TOLERANCE = 0.05
+
+
+# --- 1. DGL-free GCN ---
+class GraphConvLayer(nn.Module):
+    """
+    GraphConv(norm='both') over an explicit sparse matrix. `adjacency` is
+    (num_dst, num_src) and already holds D_in^-1/2 A D_out^-1/2, so the layer
+    is a Linear followed by one sparse matmul, which TorchScript and dynamic
+    quantization both handle.
+    """
+
+    def __init__(self, in_feats, out_feats):
+        super().__init__()
+        self.linear = nn.Linear(in_feats, out_feats, bias=False)
+        self.bias = nn.Parameter(torch.zeros(out_feats))
+
+    def forward(self, adjacency: torch.Tensor, x: torch.Tensor) -> torch.Tensor:
+        return torch.sparse.mm(adjacency, self.linear(x)) + self.bias
+
+
+class ScriptableGCN(nn.Module):
+    """
+    Same network as train_gcn.GCN without DGL. Each layer gets its own
+    adjacency, so one signature covers the full graph (pass the same matrix
+    twice) and the k-hop receptive fields of the serving path.
+    """
+
+    def __init__(self, in_feats, h_feats, num_classes):
+        super().__init__()
+        self.conv1 = GraphConvLayer(in_feats, h_feats)
+        self.conv2 = GraphConvLayer(h_feats, num_classes)
+
+    def forward(self, adjacency1: torch.Tensor, adjacency2: torch.Tensor, x: torch.Tensor) -> torch.Tensor:
+        h = F.relu(self.conv1(adjacency1, x))
+        return self.conv2(adjacency2, h)
+
+    @classmethod
+    def from_gcn_state_dict(cls, state_dict):
+        """Builds the model from a train_gcn.GCN state dict (GraphConv weights are (in, out))."""
+        in_feats, h_feats = state_dict["conv1.weight"].shape
+        model = cls(in_feats, h_feats, state_dict["conv2.weight"].shape[1])
+        model.load_state_dict({
+            "conv1.linear.weight": state_dict["conv1.weight"].t(),
+            "conv1.bias": state_dict["conv1.bias"],
+            "conv2.linear.weight": state_dict["conv2.weight"].t(),
+            "conv2.bias": state_dict["conv2.bias"],
+        })
+        return model.eval()
+
+
+def normalized_adjacency(src, dst, num_nodes):
+    """Full-graph (dst, src) matrix with self-loops and GraphConv's symmetric normalisation."""
+    loops = np.arange(num_nodes, dtype=np.int64)
+    src = np.concatenate([np.asarray(src, dtype=np.int64), loops])
+    dst = np.concatenate([np.asarray(dst, dtype=np.int64), loops])
+    out_norm = np.power(np.bincount(src, minlength=num_nodes), -0.5)
+    in_norm = np.power(np.bincount(dst, minlength=num_nodes), -0.5)
+    values = (in_norm[dst] * out_norm[src]).astype(np.float32)
+    return torch.sparse_coo_tensor(np.vstack([dst, src]), values, (num_nodes, num_nodes)).coalesce()
+
+
+# --- 2. Export ---
+def to_torchscript(model):
+    """Scripts and freezes an eval-mode module (weights become constants)."""
+    return torch.jit.freeze(torch.jit.script(model.eval()))
+
+
+def to_int8(model):
+    """Dynamic int8 quantization of every nn.Linear, then TorchScript."""
+    return to_torchscript(quantize_dynamic(model.eval(), {nn.Linear}, dtype=torch.qint8))
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _time(fn, repeats):
+    # One warm-up call so TorchScript's profiling executor has specialised.
+    with torch.no_grad():
+        fn()
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+    return {"p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000)}
+
+
+def _probabilities(logits):
+    return torch.softmax(logits, dim=1)[:, 1]
+
+
+def _errors(model, x):
+    return ((model(x) - x) ** 2).mean(dim=1)
+
+
+def export_gcn(state_dict, adjacency, x, eager_logits, repeats=20):
+    """
+    Writes the fp32 and int8 GCN artifacts and returns their parity and timing
+    report. `eager_logits` are the reference train_gcn.GCN outputs on (adjacency, x).
+    """
+    base = ScriptableGCN.from_gcn_state_dict(state_dict)
+    eager_probabilities = _probabilities(eager_logits)
+    report = {}
+    for variant, build in (("fp32", to_torchscript), ("int8", to_int8)):
+        module = build(ScriptableGCN.from_gcn_state_dict(state_dict))
+        path = ARTIFACT_PATHS[("gcn", variant)]
+        torch.jit.save(module, path)
+        module = torch.jit.load(path)
+        with torch.no_grad():
+            logits = module(adjacency, adjacency, x)
+        logit_diff = float((logits - eager_logits).abs().max())
+        probability_diff = float((_probabilities(logits) - eager_probabilities).abs().max())
+        passed = logit_diff <= FP32_TOLERANCE if variant == "fp32" else probability_diff <= INT8_PROBABILITY_TOLERANCE
+        report[variant] = {
+            "path": path,
+            "max_abs_logit_diff": logit_diff,
+            "max_abs_probability_diff": probability_diff,
+            "label_agreement": float(((logits.argmax(1) == eager_logits.argmax(1)).float().mean())),
+            "parity_ok": bool(passed),
+            "full_graph": _time(lambda: module(adjacency, adjacency, x), repeats),
+        }
+    report["eager_pytorch"] = {"full_graph": _time(lambda: base(adjacency, adjacency, x), repeats)}
+    return report
+
+
+def export_autoencoder(model, x, repeats=20):
+    """Writes the fp32 and int8 autoencoder artifacts and returns their parity and timing report."""
+    with torch.no_grad():
+        eager_errors = _errors(model, x)
+    report = {}
+    for variant, build in (("fp32", to_torchscript), ("int8", to_int8)):
+        path = ARTIFACT_PATHS[("autoencoder", variant)]
+        torch.jit.save(build(model), path)
+        module = torch.jit.load(path)
+        with torch.no_grad():
+            errors = _errors(module, x)
+        diff = (errors - eager_errors).abs()
+        if variant == "fp32":
+            passed = float(diff.max()) <= FP32_TOLERANCE
+        else:
+            # Relative to the error itself: reconstruction errors span orders of magnitude.
+            passed = float((diff / eager_errors.clamp_min(1e-6)).median()) <= INT8_ERROR_TOLERANCE
+        report[variant] = {
+            "path": path,
+            "max_abs_error_diff": float(diff.max()),
+            "median_rel_error_diff": float((diff / eager_errors.clamp_min(1e-6)).median()),
+            "parity_ok": bool(passed),
+            "batch": _time(lambda: module(x), repeats),
+        }
+    report["eager"] = {"batch": _time(lambda: model(x), repeats)}
+    return report
+
+
+# --- 3. Serving-side loading ---
+def _report():
+    if not os.path.exists(OPTIMIZED_REPORT_PATH):
+        return None
+    with open(OPTIMIZED_REPORT_PATH) as f:
+        return json.load(f)
+
+
+def load_serving_model(name, state_path, variant=None):
+    """
+    The exported TorchScript module for `name` ("gcn" or "autoencoder"), or
+    None when nothing usable was exported: no report, a `state_path` that has
+    changed since the export, or no variant that passed its parity check.
+    Returns (module, variant).
+
+    `variant` defaults to $MODEL_VARIANT. int8 is opt-in and falls back to
+    fp32 when its parity check failed; on small graphs it is not faster.
+    """
+    variant = variant or os.getenv("MODEL_VARIANT", "fp32")
+    report = _report()
+    if report is None or name not in report:
+        return None, None
+    if not os.path.exists(state_path) or file_sha256(state_path) != report[name]["source_sha256"]:
+        logger.warning("%s changed since the last export; rerun models.optimized_models.", state_path)
+        return None, None
+    for candidate in ([variant, "fp32"] if variant != "fp32" else ["fp32"]):
+        entry = report[name].get(candidate)
+        if entry and entry["parity_ok"] and os.path.exists(entry["path"]):
+            return torch.jit.load(entry["path"]), candidate
+    return None, None
+
+
+def load_gcn(state_path=GCN_STATE_PATH):
+    """Serving GCN: the exported artifact if there is one, else ScriptableGCN over gcn.pth."""
+    module, variant = load_serving_model("gcn", state_path)
+    if module is None:
+        return ScriptableGCN.from_gcn_state_dict(torch.load(state_path)), "eager"
+    return module, variant
+
+
+def load_autoencoder(input_dim, state_path=AUTOENCODER_STATE_PATH):
+    """Serving autoencoder: the exported artifact if there is one, else the eager model."""
+    module, variant = load_serving_model("autoencoder", state_path)
+    if module is None:
+        model = Autoencoder(input_dim)
+        model.load_state_dict(torch.load(state_path))
+        return model.eval(), "eager"
+    return module, variant
+
+
+# --- 4. Export script ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export TorchScript and int8 inference artifacts.")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed forward passes per model/variant.")
+    parser.add_argument("--batch-size", type=int, default=4096, help="Rows per autoencoder timing batch.")
+    parser.add_argument("--rebuild-snapshot", action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    start_time = time.time()
+
+    print("--- Step 1: Loading features, scaler and eager models ---")
+    # DGL is only needed here, for the eager reference outputs.
+    import dgl
+    from .train_gcn import GCN
+
+    store = open_or_import()
+    scaler = joblib.load("scaler.pkl")
+    gcn_state = torch.load(GCN_STATE_PATH)
+    columns = trained_columns(scaler, store)
+    gcn = GCN(in_feats=len(columns), h_feats=16, num_classes=2)
+    gcn.load_state_dict(gcn_state)
+    gcn.eval()
+    autoencoder = Autoencoder(len(columns))
+    autoencoder.load_state_dict(torch.load(AUTOENCODER_STATE_PATH))
+    autoencoder.eval()
+
+    snapshot = load_or_build_snapshot(
+        os.getenv("NEO4J_URI"),
+        os.getenv("NEO4J_USER"),
+        os.getenv("NEO4J_PASSWORD"),
+        rebuild=args.rebuild_snapshot,
+    )
+    x = torch.as_tensor(scaler.transform(store.get_batch(snapshot.account_ids, columns)), dtype=torch.float32)
+    adjacency = normalized_adjacency(snapshot.src, snapshot.dst, snapshot.num_nodes)
+
+    print("\n--- Step 2: Exporting the GCN ---")
+    graph = dgl.add_self_loop(snapshot.to_dgl())
+    with torch.no_grad():
+        eager_logits = gcn(graph, x)
+    gcn_report = export_gcn(gcn_state, adjacency, x, eager_logits, args.repeats)
+    gcn_report["eager_dgl"] = {"full_graph": _time(lambda: gcn(graph, x), args.repeats)}
+    gcn_report["source_sha256"] = file_sha256(GCN_STATE_PATH)
+
+    print("\n--- Step 3: Exporting the autoencoder ---")
+    ae_report = export_autoencoder(autoencoder, x[:args.batch_size], args.repeats)
+    ae_report["source_sha256"] = file_sha256(AUTOENCODER_STATE_PATH)
+
+    report = {"created_at": time.time(), "graph_hash": snapshot.content_hash, "num_nodes": snapshot.num_nodes,
+              "batch_size": min(args.batch_size, len(x)), "gcn": gcn_report, "autoencoder": ae_report}
+    with open(OPTIMIZED_REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n--- Step 4: Parity and CPU latency ---")
+    rows = {"gcn": snapshot.num_nodes, "autoencoder": report["batch_size"]}
+    for name, timing_key, labels in (("gcn", "full_graph", ["eager_dgl", "eager_pytorch", "fp32", "int8"]),
+                                     ("autoencoder", "batch", ["eager", "fp32", "int8"])):
+        for label in labels:
+            entry = report[name][label]
+            timing = entry[timing_key]
+            parity = "" if "parity_ok" not in entry else f", parity {'PASS' if entry['parity_ok'] else 'FAIL'}"
+            print(f" > {name:<11} {label:<13} p50 {timing['p50_ms']:8.2f} ms, p99 {timing['p99_ms']:8.2f} ms, "
+                  f"{rows[name] / max(timing['p50_ms'] / 1000, 1e-9):12,.0f} rows/s{parity}")
+    print(f" > Report written to {OPTIMIZED_REPORT_PATH}")
+    print(f"\nExport complete. Total time: {time.time() - start_time:.2f} seconds.")
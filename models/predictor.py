@@ -4,46 +4,287 @@ import pandas as pd
 import joblib
 from dotenv import load_dotenv
 import numpy as np
-import random
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 
-# Make sure to import the GCN class definition
-from .train_gcn import GCN
+from .optimized_models import (
+    ScriptableGCN, load_gcn, load_autoencoder, GCN_STATE_PATH, AUTOENCODER_STATE_PATH, OPTIMIZED_REPORT_PATH,
+)
+from .attribution import (
+    ExplanationCache, attribute, feature_label, EXPLANATION_BATCH_SIZE, EXPLANATION_PRECOMPUTE_TOP_N,
+)
+from .model_registry import ModelRegistry, ModelUnavailable
+from .risk_index import RiskIndex, compute_risk_scores
+from .gcn_inference import GCNScoreStore, GCN_SCORES_PATH
+from .anomaly_scoring import AnomalyScoreStore, ANOMALY_SCORES_PATH
+from .feature_store import open_or_import, trained_columns, FEATURE_STORE_PATH, MANIFEST_NAME
+from .incremental_features import IncrementalAggregator, AGGREGATE_STATE_PATH
+from .graph_snapshot import GraphSnapshot, GRAPH_SNAPSHOT_PATH, META_NAME
+from .khop_inference import InNeighborIndex, KHopScorer
+from .typology_detection import TypologyStore, TYPOLOGY_LABELS_PATH
+from .geo_rollup import AccountGeo, GeoRollup, ACCOUNT_GEO_PATH, HEATMAP_TOP_N
+from .metrics import CallbackMetric, Counter, Histogram, ratio, timed
 
 load_dotenv()
 
-print("Loading AI Core...")
-# ... (The loading section at the top remains the same)
-try:
-    print(" > Loading data and pre-trained models...")
-    features_df = pd.read_csv("account_features.csv").set_index("account_id")
-    scaler = joblib.load("scaler.pkl")
-    gcn_model = GCN(in_feats=features_df.shape[1], h_feats=16, num_classes=2)
-    gcn_model.load_state_dict(torch.load("gcn.pth"))
-    gcn_model.eval()
-    print("AI Core loaded successfully (FAST STARTUP).")
-except FileNotFoundError as e:
-    print(f"FATAL ERROR: A required model or data file is missing: {e}")
-    exit()
+logger = logging.getLogger(__name__)
+
+# --- Metrics (served by the API's /metrics, see models/metrics.py) ---
+PREDICTOR_SECONDS = Histogram("aml_predictor_seconds", "AI core call latency by function.", ["function"])
+MODEL_SECONDS = Histogram("aml_model_inference_seconds", "Model forward passes on the serving path.", ["model"])
+_khop_seconds = MODEL_SECONDS.labels("gcn_khop")
+_autoencoder_seconds = MODEL_SECONDS.labels("autoencoder")
+_attribution_seconds = MODEL_SECONDS.labels("attribution")
+# Where feature rows came from: the live overlay (hit) or the store (miss).
+# Reported through aml_cache_* below, so not registered on their own.
+_feature_lookups = Counter("feature_lookups", "", ["source"], registry=None)
+_live_hits, _store_reads = _feature_lookups.labels("live"), _feature_lookups.labels("store")
+
+# Files whose changes trigger a reload (see models/model_registry.py). The
+# feature store and graph snapshot are directories; their manifest/meta file
+# is replaced last when a new version is written.
+WATCHED_PATHS = [
+    os.path.join(FEATURE_STORE_PATH, MANIFEST_NAME),
+    "scaler.pkl",
+    GCN_STATE_PATH,
+    AUTOENCODER_STATE_PATH,
+    OPTIMIZED_REPORT_PATH,
+    GCN_SCORES_PATH,
+    ANOMALY_SCORES_PATH,
+    os.path.join(GRAPH_SNAPSHOT_PATH, META_NAME),
+    ACCOUNT_GEO_PATH,
+    TYPOLOGY_LABELS_PATH,
+]
+
+
+class ModelBundle:
+    """
+    One consistent set of loaded artifacts plus the risk index built from
+    them. `version` identifies the artifact files and is reported with every
+    score produced from this bundle.
+    """
+
+    def __init__(self, version, sources, feature_store, columns, scaler, gcn_model, gcn_variant, attribution_model,
+                 gcn_scores, anomaly_scores, autoencoder, autoencoder_variant, typologies):
+        self.version = version
+        self.sources = sources
+        self.loaded_at = time.time()
+        self.feature_store = feature_store
+        # Store columns the models were trained on; feature rows held for
+        # this bundle (live_features included) are in this order.
+        self.columns = columns
+        self.scaler = scaler
+        self.gcn_model = gcn_model
+        self.gcn_variant = gcn_variant
+        # Differentiable fp32 copy of the GCN for attributions; the serving
+        # model may be a frozen or int8 export.
+        self.attribution_model = attribution_model
+        self.gcn_scores = gcn_scores
+        self.anomaly_scores = anomaly_scores
+        self.autoencoder = autoencoder
+        self.autoencoder_variant = autoencoder_variant
+        self.typologies = typologies
+
+        # Score and rank every account once; dashboard queries read from the index.
+        self.risk_index = RiskIndex(_risk_frame(feature_store), scores=_index_scores(feature_store, gcn_scores))
+        # Formula scores are normalised by the population's max net flow; rescoring a
+        # few accounts after ingestion keeps that scale until the next full rebuild.
+        self.formula_max_net_flow = float(feature_store.get_column("net_flow").max()) if len(feature_store) else 0.0
+
+        # Ingestion state tied to these artifacts, guarded by _ingest_lock.
+        # Reconstruction errors of accounts rescored since the last scoring run:
+        self.live_anomaly = {}
+        self.khop_scorer = None
+        # Account id of each k-hop scorer node, set with khop_scorer.
+        self.node_names = None
+        # In-neighbour index carried over from the previous bundle (it holds
+        # ingested edges the snapshot on disk does not have yet; add_edges()
+        # updates it in place).
+        self.adjacency = None
+        # Geographic risk rollups, built on first use (see _get_geo()), and the
+        # ingested activity of the previous bundle's rollup still to replay into them.
+        self.geo = None
+        self.carried_activity = None
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "feature_store_version": self.feature_store.version,
+            "gcn": self.gcn_variant,
+            "autoencoder": self.autoencoder_variant,
+            "risk_source": "gcn" if self.gcn_scores is not None else "formula",
+            "accounts": len(self.risk_index),
+        }
+
+
+def _risk_frame(store):
+    # The risk index only needs ids and net flow, not the whole feature matrix.
+    return pd.DataFrame({"net_flow": store.get_column("net_flow")}, index=np.asarray(store.account_ids))
+
+def _index_scores(store, gcn_scores):
+    if gcn_scores is None:
+        return None
+    return gcn_scores.probabilities_for(store.account_ids)
+
+def _load_optional(load, path, consequence):
+    try:
+        return load(path)
+    except FileNotFoundError:
+        logger.warning("%s not found, %s.", path, consequence)
+        return None
+
+def _build_bundle(version, sources):
+    try:
+        # Memory-mapped float32 columns: opening is cheap and pages are shared
+        # with every other process reading the same store version.
+        feature_store = open_or_import()
+        scaler = joblib.load("scaler.pkl")
+        # TorchScript export from models/optimized_models.py when present; either
+        # way no DGL import is needed to serve.
+        gcn_model, gcn_variant = load_gcn()
+        attribution_model = ScriptableGCN.from_gcn_state_dict(torch.load(GCN_STATE_PATH))
+    except FileNotFoundError as e:
+        raise ModelUnavailable(f"A required model or data file is missing: {e}") from e
+    # The models read only the columns they were trained on, so a store with
+    # new columns keeps serving; a model trained on other columns than the
+    # scaler is refused and the registry keeps the previous bundle.
+    try:
+        columns = trained_columns(scaler, feature_store)
+    except ValueError as e:
+        raise ModelUnavailable(str(e)) from e
+    gcn_inputs = attribution_model.conv1.linear.in_features
+    if gcn_inputs != len(columns):
+        raise ModelUnavailable(f"{GCN_STATE_PATH} takes {gcn_inputs} features, scaler.pkl gives {len(columns)}; "
+                               "retrain the GCN.")
+
+    # GCN probabilities come from the offline batch stage (models/gcn_inference.py).
+    # Without them we fall back to the hand-tuned formula scores.
+    gcn_scores = _load_optional(GCNScoreStore.load, GCN_SCORES_PATH, "using formula risk scores")
+    # Autoencoder reconstruction errors and their percentiles come from
+    # models/anomaly_scoring.py; they are optional and reported next to the risk.
+    anomaly_scores = _load_optional(AnomalyScoreStore.load, ANOMALY_SCORES_PATH, "anomaly scores unavailable")
+    # The autoencoder itself rescores accounts changed by ingestion, calibrated
+    # against the batch run's quantiles.
+    try:
+        autoencoder_inputs = torch.load(AUTOENCODER_STATE_PATH)["encoder.0.weight"].shape[1]
+    except FileNotFoundError:
+        autoencoder, autoencoder_variant = None, None
+    else:
+        if autoencoder_inputs != len(columns):
+            raise ModelUnavailable(f"{AUTOENCODER_STATE_PATH} takes {autoencoder_inputs} features, scaler.pkl gives "
+                                   f"{len(columns)}; retrain the autoencoder.")
+        autoencoder, autoencoder_variant = load_autoencoder(len(columns))
+    # Typology labels and their evidence from models/typology_detection.py.
+    typologies = _load_optional(TypologyStore.load, TYPOLOGY_LABELS_PATH, "pattern types unavailable")
+
+    return ModelBundle(version, sources, feature_store, columns, scaler, gcn_model, gcn_variant, attribution_model,
+                       gcn_scores, anomaly_scores, autoencoder, autoencoder_variant, typologies)
+
+def _adopt(new, old):
+    # Runs under _ingest_lock just before `new` replaces `old`: carry over
+    # what ingestion changed since the artifacts on disk were written.
+    if new.columns != old.columns:
+        # Retrained on other columns: live rows keep their ingested values and
+        # take the columns the old models did not read from the new store.
+        shared = [(new.columns.index(column), old.columns.index(column))
+                  for column in old.columns if column in new.columns]
+        for account_id in list(live_features):
+            row = new.feature_store.get_row(account_id, new.columns)
+            if row is None:
+                del live_features[account_id]
+                continue
+            row[[n for n, _ in shared]] = live_features[account_id][[o for _, o in shared]]
+            live_features[account_id] = row
+    if live_features and (new.gcn_scores is None) == (old.gcn_scores is None):
+        rescored = [a for a in live_features if a in new.risk_index and a in old.risk_index]
+        new.risk_index.update_scores(rescored, [old.risk_index.score_of(a) for a in rescored])
+    snapshot_meta = os.path.join(GRAPH_SNAPSHOT_PATH, META_NAME)
+    if old.khop_scorer is not None and new.sources[snapshot_meta] == old.sources[snapshot_meta]:
+        new.adjacency = old.khop_scorer.adjacency
+    if new.sources[ANOMALY_SCORES_PATH] == old.sources[ANOMALY_SCORES_PATH]:
+        new.live_anomaly.update(old.live_anomaly)
+    if old.geo is not None and new.sources[snapshot_meta] == old.sources[snapshot_meta]:
+        new.carried_activity = old.geo.extra_activity()
+
+
+# --- Live ingestion state ---
+# Rows updated by apply_transactions() since the feature store was last written.
+live_features = {}
+_ingest_lock = threading.RLock()
+_aggregator = None
+
+# Nothing is loaded at import time: the first call (or warmup()) loads the
+# artifacts, and the API's watcher swaps in new versions as they appear.
+registry = ModelRegistry(_build_bundle, WATCHED_PATHS, adopt=_adopt, swap_lock=_ingest_lock)
+
+# Attributions are never computed inside a request: misses are queued here
+# and filled by precompute_explanations(), which the API runs in the background.
+explanation_cache = ExplanationCache()
+_explain_requests = OrderedDict()
+_explain_lock = threading.Lock()
+
+
+def _cache_counts():
+    return [("explanation", explanation_cache.hits, explanation_cache.misses),
+            ("live_features", _live_hits.value, _store_reads.value)]
+
+CallbackMetric("aml_cache_requests_total", "Explanation cache and live feature overlay lookups.", "counter",
+               lambda: [((name, result), count) for name, hits, misses in _cache_counts()
+                        for result, count in (("hit", hits), ("miss", misses))], ["cache", "result"])
+CallbackMetric("aml_cache_hit_ratio", "Hit ratio since startup.", "gauge",
+               lambda: [((name,), ratio(hits, misses)) for name, hits, misses in _cache_counts()], ["cache"])
+CallbackMetric("aml_cache_entries", "Entries held.", "gauge",
+               lambda: [(("explanation",), len(explanation_cache)), (("live_features",), len(live_features))], ["cache"])
+CallbackMetric("aml_explanation_queue_length", "Accounts waiting for their attributions.", "gauge",
+               lambda: [((), len(_explain_requests))])
+CallbackMetric("aml_model_info", "The model version being served.", "gauge",
+               lambda: [((registry.get().version,), 1)] if registry.loaded else [], ["version"])
+
+
+@timed(PREDICTOR_SECONDS, "warmup")
+def warmup():
+    """Loads the current artifacts now instead of on the first request."""
+    bundle = registry.warmup()
+    with _ingest_lock:
+        _get_geo(bundle)
+    return bundle.describe()
+
+def get_model_info():
+    """Describes the loaded bundle, or None before the first load."""
+    return registry.get().describe() if registry.loaded else None
 
 
 # --- Live Prediction and Explanation Function ---
+@timed(PREDICTOR_SECONDS, "get_prediction_and_explanation")
 def get_prediction_and_explanation(account_id: str):
     """
     Generates a prediction and explanation for a single account
     with a robust risk score calculation.
     """
-    if account_id not in features_df.index:
+    bundle = registry.get()
+    feature_store = bundle.feature_store
+    row = live_features.get(account_id)
+    if row is None:
+        _store_reads.inc()
+        row = feature_store.get_row(account_id, bundle.columns)
+    else:
+        _live_hits.inc()
+    if row is None:
         return {"error": f"Account {account_id} not found in feature set."}
 
-    account_raw_features = features_df.loc[[account_id]]
+    account_raw_features = dict(zip(bundle.columns, row.tolist()))
     
     # --- ✅ NEW, ROBUST RISK SCORE CALCULATION ---
     # 1. Start with a base risk from your CSV
-    base_risk = float(account_raw_features['initial_risk'].iloc[0]) / 10.0
+    base_risk = float(account_raw_features['initial_risk']) / 10.0
 
     # 2. Add risk based on other factors, but control their impact
-    net_flow_risk = float(account_raw_features['net_flow'].iloc[0]) / 50000.0 # Reduce the influence of net_flow
-    volume_risk = float(account_raw_features['transaction_volume'].iloc[0]) / 100.0 # Add risk for high volume
+    net_flow_risk = float(account_raw_features['net_flow']) / 50000.0 # Reduce the influence of net_flow
+    volume_risk = float(account_raw_features['transaction_volume']) / 100.0 # Add risk for high volume
 
     # 3. Combine them. A high negative net_flow might also be risky, so we can use its absolute value.
     risk_score = base_risk + abs(net_flow_risk) + volume_risk
@@ -51,70 +292,376 @@ def get_prediction_and_explanation(account_id: str):
     # 4. CRITICAL FIX: Clamp the score to be between 0.0 and 0.99
     risk_score = max(0, min(risk_score, 0.99))
 
-    # --- Update SHAP simulation to be consistent ---
-    top_contributions = [
-        {"feature": "Initial Risk", "impact": base_risk * 0.5},
-        {"feature": "Net Flow Behavior", "impact": abs(net_flow_risk) * 0.3},
-        {"feature": "Transaction Volume", "impact": volume_risk * 0.2},
-    ]
-    top_contributions.sort(key=lambda x: x['impact'], reverse=True)
-    
-    if top_contributions and top_contributions[0]['impact'] > 0.01:
-        summary = f"Account flagged with a {risk_score:.0%} risk score. The AI's decision was primarily driven by its abnormal '{top_contributions[0]['feature']}'."
+    # 5. Prefer the GCN's probability when batch inference has run. The risk
+    # index holds the latest value, including rescoring after ingestion.
+    gcn_scores = bundle.gcn_scores
+    gcn_probability = bundle.risk_index.score_of(account_id) if gcn_scores is not None and account_id in gcn_scores else None
+    if gcn_probability is not None:
+        risk_score = gcn_probability
+
+    # --- Feature attributions ---
+    if gcn_probability is not None:
+        # Gradient x input of the GCN, precomputed in the background.
+        cached = explanation_cache.get(account_id, bundle.version)
+        if cached is None:
+            _request_explanation(account_id)
+        all_contributions = cached["contributions"] if cached is not None else []
+        attribution = {
+            "method": "gradient_x_input",
+            "status": "ready" if cached is not None else "pending",
+            "top_neighbors": cached["top_neighbors"] if cached is not None else [],
+        }
+    else:
+        # The formula score is the sum of these terms, so they are exact.
+        all_contributions = [
+            {"feature": feature_label("initial_risk"), "column": "initial_risk", "source": "self", "impact": base_risk},
+            {"feature": feature_label("net_flow"), "column": "net_flow", "source": "self", "impact": abs(net_flow_risk)},
+            {"feature": feature_label("transaction_volume"), "column": "transaction_volume", "source": "self",
+             "impact": volume_risk},
+        ]
+        all_contributions.sort(key=lambda x: abs(x['impact']), reverse=True)
+        attribution = {"method": "formula", "status": "ready", "top_neighbors": []}
+    top_contributions = all_contributions[:5]
+
+    drivers = [c for c in top_contributions if c['impact'] > 0.01]
+    if drivers:
+        summary = f"Account flagged with a {risk_score:.0%} risk score. The AI's decision was primarily driven by its abnormal '{drivers[0]['feature']}'."
+    elif attribution["status"] == "pending":
+        summary = f"This account has a network risk of {risk_score:.0%}; its feature attributions are still being computed."
     else:
         summary = f"This account has a network risk of {risk_score:.0%}, with no single dominant contributing factor."
 
-    transaction_count = int(account_raw_features['in_degree'].iloc[0] + account_raw_features['out_degree'].iloc[0])
+    transaction_count = int(account_raw_features['in_degree'] + account_raw_features['out_degree'])
 
     feature_values = {
-        "total_amount_in": float(account_raw_features['total_amount_in'].iloc[0]),
+        "total_amount_in": float(account_raw_features['total_amount_in']),
         "transaction_volume": transaction_count
     }
+    # Rolling 30-day values when the store has temporal features (models/temporal_features.py).
+    if "amount_in_30d" in account_raw_features:
+        feature_values["total_amount_in_30d"] = float(account_raw_features["amount_in_30d"])
+        feature_values["transaction_volume_30d"] = int(account_raw_features["in_count_30d"]
+                                                       + account_raw_features["out_count_30d"])
+        feature_values["max_transactions_1h"] = int(account_raw_features["max_count_1h"])
 
     return {
         "summary": summary,
         "risk_score": risk_score,
         "feature_contributions": top_contributions,
-        "all_shap_values": top_contributions,
-        "feature_values": feature_values
+        "all_shap_values": all_contributions,
+        "attribution": attribution,
+        "feature_values": feature_values,
+        "risk_source": "gcn" if gcn_probability is not None else "formula",
+        "anomaly": _anomaly_score(bundle, account_id),
+        "typologies": bundle.typologies.evidence_of(account_id) if bundle.typologies is not None else [],
+        "model_version": bundle.version,
     }
 
-def get_top_suspicious_networks(top_n=25):
+def get_anomaly_score(account_id: str):
     """
-    Returns a list of top suspicious accounts with varied patterns
-    and a smoothed risk score distribution.
+    Returns {"reconstruction_error", "percentile"} from the last anomaly
+    scoring run, or None when the account (or the score file) is missing.
     """
-    results_df = features_df.copy()
-    
-    # --- ✅ FIX 1: Smooth out the Risk Score Curve ---
-    # We use a square root transformation to make the drop-off less steep.
-    max_net_flow = results_df['net_flow'].max()
-    if max_net_flow > 0:
-        # Normalize, then apply sqrt to compress high values
-        normalized_flow = results_df['net_flow'] / max_net_flow
-        results_df['risk_score'] = normalized_flow.apply(lambda x: np.sqrt(x) if x > 0 else 0)
-    else:
-        results_df['risk_score'] = 0.0
+    return _anomaly_score(registry.get(), account_id)
 
-    results_df['risk_score'] = results_df['risk_score'].clip(0, 0.99)
-    results_df = results_df.sort_values(by='risk_score', ascending=False).head(top_n)
-    results_df = results_df.reset_index()
+def _anomaly_score(bundle, account_id):
+    if bundle.anomaly_scores is None:
+        return None
+    return bundle.live_anomaly.get(account_id) or bundle.anomaly_scores.score(account_id)
 
-    # --- ✅ FIX 2: Assign Varied, Realistic Pattern Types ---
-    # Define some plausible money laundering patterns
-    patterns = ['Smurfing', 'Mule', 'Structuring', 'Cycling']
-    
-    # Assign patterns randomly, giving more common ones to higher-risk accounts
-    pattern_list = []
-    for i, row in results_df.iterrows():
-        if row['risk_score'] > 0.8:
-            pattern_list.append(random.choice(['Smurfing', 'Mule', 'Structuring']))
-        elif row['risk_score'] > 0.6:
-            pattern_list.append(random.choice(['Cycling', 'Mule']))
+def refresh_features():
+    """
+    Swaps in a new model bundle if any watched artifact (e.g. the feature
+    store manifest) changed. Readers keep using the previous bundle until the
+    new one is ready. Returns True on a swap.
+    """
+    return registry.reload()
+
+def _get_aggregator(feature_store):
+    # Exact aggregates persisted by models/incremental_features.py. Without them
+    # we bootstrap from the float32 store, whose totals are rounded to ~7 digits.
+    global _aggregator
+    if _aggregator is None:
+        if os.path.exists(AGGREGATE_STATE_PATH):
+            _aggregator = IncrementalAggregator.load(AGGREGATE_STATE_PATH)
         else:
-            pattern_list.append('Complex')
-            
-    results_df['pattern_type'] = pattern_list
+            column = feature_store.get_column
+            _aggregator = IncrementalAggregator(
+                np.asarray(feature_store.account_ids), column("initial_risk"),
+                column("out_degree"), column("in_degree"),
+                np.rint(column("total_amount_out").astype(np.float64) * 100),
+                np.rint(column("total_amount_in").astype(np.float64) * 100),
+            )
+    return _aggregator
+
+def _get_khop_scorer(bundle):
+    # GCN rescoring of changed accounts needs the graph; without a snapshot the
+    # cached GCN probabilities are kept as they are.
+    gcn_scores = bundle.gcn_scores
+    if bundle.khop_scorer is None and gcn_scores is not None and os.path.exists(GRAPH_SNAPSHOT_PATH):
+        snapshot = GraphSnapshot.load(GRAPH_SNAPSHOT_PATH)
+        if gcn_scores.graph_hash and gcn_scores.graph_hash != snapshot.content_hash:
+            logger.warning("%s was computed on graph %s, but %s is %s; rerun models.gcn_inference.",
+                           GCN_SCORES_PATH, gcn_scores.graph_hash[:12], GRAPH_SNAPSHOT_PATH, snapshot.content_hash[:12])
+        adjacency = bundle.adjacency or InNeighborIndex(snapshot.src, snapshot.dst, snapshot.num_nodes)
+        scorer = KHopScorer(
+            adjacency, snapshot.node_map(), bundle.feature_store.get_batch(snapshot.account_ids, bundle.columns),
+            bundle.scaler, model=bundle.gcn_model,
+        )
+        live = [a for a in live_features if a in scorer.node_map]
+        if live:
+            scorer.set_features(live, np.stack([live_features[a] for a in live]))
+        bundle.node_names = snapshot.account_ids
+        bundle.khop_scorer = scorer
+    return bundle.khop_scorer
+
+def _get_geo(bundle):
+    # Built from the risk index as it is now; callers hold _ingest_lock, so no
+    # score update can fall between the build and the first update().
+    if bundle.geo is None and os.path.exists(ACCOUNT_GEO_PATH):
+        snapshot = GraphSnapshot.load(GRAPH_SNAPSHOT_PATH) if os.path.exists(GRAPH_SNAPSHOT_PATH) else None
+        account_ids, scores = bundle.risk_index.scores_array()
+        geo = GeoRollup(AccountGeo.load(ACCOUNT_GEO_PATH), account_ids, scores, snapshot=snapshot)
+        if bundle.carried_activity is not None:
+            geo.add_activity(*bundle.carried_activity)
+            bundle.carried_activity = None
+        bundle.geo = geo
+    return bundle.geo
+
+def _merge_rows(feature_store, columns, account_ids, updated):
+    # Columns the aggregator does not maintain (the temporal features) keep
+    # their last value until models.temporal_features runs again.
+    extra = [column for column in columns if column not in updated.columns]
+    if not extra:
+        return updated[columns].to_numpy(dtype=np.float32)
+    rows = np.stack([live_features[a] if a in live_features else feature_store.get_row(a, columns)
+                     for a in account_ids])
+    positions = [columns.index(column) for column in updated.columns if column in columns]
+    rows[:, positions] = updated[[columns[i] for i in positions]].to_numpy(dtype=np.float32)
+    return rows
+
+def _rescore_anomaly(bundle, account_ids, rows):
+    x = torch.as_tensor(bundle.scaler.transform(rows), dtype=torch.float32)
+    with torch.no_grad(), _autoencoder_seconds.time():
+        errors = ((bundle.autoencoder(x) - x) ** 2).mean(dim=1).numpy()
+    percentiles = bundle.anomaly_scores.percentile_of(errors)
+    for account_id, error, percentile in zip(account_ids, errors, percentiles):
+        bundle.live_anomaly[account_id] = {"reconstruction_error": float(error), "percentile": float(percentile)}
+
+@timed(PREDICTOR_SECONDS, "apply_transactions")
+def apply_transactions(transactions_df):
+    """
+    Folds a validated batch of new transactions into the live features and the
+    risk index. Returns one {account_id, old_risk, new_risk, delta,
+    model_version} per account whose features changed, plus the number of
+    rows skipped because an endpoint is not a known account.
+    """
+    registry.get()
+    with _ingest_lock:
+        # Taken under the lock, which swaps also hold: the bundle updated here
+        # is either still current at the end or handed to _adopt().
+        bundle = registry.get()
+        feature_store, risk_index, gcn_scores = bundle.feature_store, bundle.risk_index, bundle.gcn_scores
+        aggregator = _get_aggregator(feature_store)
+        affected, skipped = aggregator.apply(transactions_df)
+        updated = aggregator.features(affected)
+        updated = updated[updated["account_id"].map(lambda a: a in risk_index).astype(bool)].set_index("account_id")
+        if updated.empty:
+            return [], skipped
+
+        account_ids = updated.index.tolist()
+        rows = _merge_rows(feature_store, bundle.columns, account_ids, updated)
+        old_scores = [risk_index.score_of(a) for a in account_ids]
+
+        stale = account_ids
+        scorer = _get_khop_scorer(bundle)
+        if scorer is not None:
+            node_map = scorer.node_map
+            known = transactions_df["source_account"].isin(node_map) & transactions_df["target_account"].isin(node_map)
+            src = transactions_df["source_account"][known].map(node_map).to_numpy()
+            dst = transactions_df["target_account"][known].map(node_map).to_numpy()
+            scorer.adjacency.add_edges(src, dst)
+            # The changed features and the new edges' degree norms reach every
+            # account up to two hops downstream through the two GraphConv layers.
+            touched = np.concatenate([np.array([node_map[a] for a in account_ids if a in node_map], dtype=np.int64), src, dst])
+            stale = [str(bundle.node_names[n]) for n in scorer.adjacency.downstream(touched, hops=2)]
+            scorer.set_features(account_ids, rows)
+            with _khop_seconds.time():
+                new_scores = scorer.probabilities(account_ids).tolist()
+        elif gcn_scores is None:
+            new_scores = compute_risk_scores(updated, max_net_flow=bundle.formula_max_net_flow).tolist()
+        else:
+            new_scores = old_scores
+
+        for account_id, row in zip(account_ids, rows):
+            live_features[account_id] = row
+        risk_index.update_scores(account_ids, new_scores)
+        geo = _get_geo(bundle)
+        if geo is not None:
+            geo.update(account_ids, new_scores)
+            timestamps = pd.to_datetime(transactions_df["timestamp"], format="ISO8601", utc=True).astype("int64").to_numpy() // 10**9
+            geo.add_activity(pd.concat([transactions_df["source_account"], transactions_df["target_account"]]),
+                             np.concatenate([timestamps, timestamps]))
+        if bundle.autoencoder is not None and bundle.anomaly_scores is not None:
+            _rescore_anomaly(bundle, account_ids, rows)
+        explanation_cache.discard(stale, bundle.version)
+
+    deltas = [
+        {"account_id": a, "old_risk": old, "new_risk": new, "delta": new - old, "model_version": bundle.version}
+        for a, old, new in zip(account_ids, old_scores, new_scores)
+    ]
+    return deltas, skipped
+
+@timed(PREDICTOR_SECONDS, "flush_live_features")
+def flush_live_features():
+    """
+    Persists ingested aggregates as a new feature store version and reloads
+    it. Returns the new version, or None when nothing was ingested since the
+    last flush.
+    """
+    with _ingest_lock:
+        if _aggregator is None or not live_features:
+            return None
+        _aggregator.save(AGGREGATE_STATE_PATH)
+        feature_store = registry.get().feature_store
+        version = _aggregator.write_store(feature_store.path, carry=feature_store)
+        flushed = dict(live_features)
+    # The reload takes _ingest_lock itself (after the registry's load lock),
+    # so it must not run under it. _adopt() carries the k-hop rescored values
+    # of every live account over, since the cached GCN probabilities predate them.
+    registry.reload()
+    with _ingest_lock:
+        for account_id, row in flushed.items():
+            if live_features.get(account_id) is row:
+                del live_features[account_id]
+    return version
+
+def _request_explanation(account_id):
+    with _explain_lock:
+        _explain_requests[account_id] = None
+        _explain_requests.move_to_end(account_id)
+        while len(_explain_requests) > explanation_cache.max_entries:
+            _explain_requests.popitem(last=False)
+
+@timed(PREDICTOR_SECONDS, "precompute_explanations")
+def precompute_explanations(top_n=EXPLANATION_PRECOMPUTE_TOP_N, batch_size=EXPLANATION_BATCH_SIZE):
+    """
+    Attributes one batch of accounts for the current model version: accounts
+    requested through get_prediction_and_explanation() first (most recent
+    first), then the `top_n` riskiest ones not cached yet. Returns how many
+    were computed, 0 when there is nothing to do.
+    """
+    if not registry.loaded:
+        return 0
+    bundle = registry.get()
+    if bundle.gcn_scores is None:
+        return 0
+    with _ingest_lock:
+        scorer = _get_khop_scorer(bundle)
+    if scorer is None:
+        return 0
 
-    return results_df[['account_id', 'risk_score', 'pattern_type']].to_dict('records')
+    def wanted(account_id):
+        return (account_id in scorer.node_map and account_id not in batch
+                and (account_id, bundle.version) not in explanation_cache)
+
+    batch = []
+    with _explain_lock:
+        while _explain_requests and len(batch) < batch_size:
+            account_id, _ = _explain_requests.popitem(last=True)
+            if wanted(account_id):
+                batch.append(account_id)
+    if len(batch) < batch_size:
+        for account_id, _ in bundle.risk_index.top_n(top_n):
+            if wanted(account_id):
+                batch.append(account_id)
+                if len(batch) == batch_size:
+                    break
+    if not batch:
+        return 0
+
+    # Ingestion updates the scorer's arrays in place under _ingest_lock, so each
+    # receptive field is read under it; an account rescored after its field was
+    # read is discarded from the cache, and `since` keeps its result out.
+    since = explanation_cache.begin()
+    with _attribution_seconds.time():
+        results = attribute(scorer, bundle.attribution_model, batch, bundle.columns, lock=_ingest_lock)
+    for account_id, result in zip(batch, results):
+        for neighbor in result["top_neighbors"]:
+            neighbor["account_id"] = str(bundle.node_names[neighbor.pop("node")])
+        explanation_cache.put(account_id, bundle.version, result, since=since)
+    return len(batch)
+
+def get_account_rank(account_id: str):
+    """Returns the 1-based risk rank of an account, or None if it is unknown."""
+    return registry.get().risk_index.rank_of(account_id)
+
+@timed(PREDICTOR_SECONDS, "get_accounts_in_score_range")
+def get_accounts_in_score_range(low=0.0, high=1.0, limit=100):
+    """Returns accounts whose risk score lies within [low, high], riskiest first."""
+    bundle = registry.get()
+    return [
+        {"account_id": account_id, "risk_score": risk_score, "model_version": bundle.version}
+        for account_id, risk_score in bundle.risk_index.score_range(low, high, limit=limit)
+    ]
 
+@timed(PREDICTOR_SECONDS, "get_top_suspicious_networks")
+def get_top_suspicious_networks(top_n=25):
+    """
+    Returns the top suspicious accounts with the typology they were detected
+    in (see models/typology_detection.py). Accounts no detector matched are
+    reported as 'Complex'.
+    """
+    # Scores are precomputed and pre-sorted by the risk index, so this is a slice.
+    bundle = registry.get()
+    typologies = bundle.typologies
+    results = []
+    for account_id, risk_score in bundle.risk_index.top_n(top_n):
+        evidence = typologies.evidence_of(account_id) if typologies is not None else []
+        results.append({
+            "account_id": account_id,
+            "risk_score": risk_score,
+            "pattern_type": evidence[0]["pattern_type"] if evidence else "Complex",
+            "patterns": [row["pattern_type"] for row in evidence],
+            "model_version": bundle.version,
+        })
+    return results
+
+@timed(PREDICTOR_SECONDS, "get_geo_risk")
+def get_geo_risk(level="state", threshold=None, top_n=HEATMAP_TOP_N):
+    """
+    Risky accounts per state (level="state") or per "City, State"
+    (level="city"): every account scoring at least `threshold` when one is
+    given, otherwise the `top_n` riskiest. None when no account locations
+    are available (see models/geo_rollup.py).
+    """
+    bundle = registry.get()
+    geo = bundle.geo
+    if geo is None:
+        with _ingest_lock:
+            geo = _get_geo(bundle)
+    if geo is None:
+        return None
+    if threshold is not None:
+        return geo.counts_above(threshold, level)
+    return geo.counts_at(bundle.risk_index.top_positions(top_n), level)
+
+@timed(PREDICTOR_SECONDS, "get_geo_timeline")
+def get_geo_timeline(threshold=None, top_n=HEATMAP_TOP_N):
+    """
+    Per activity bucket, the risky accounts that transacted in it, by state.
+    Without `threshold`, it is the score of the `top_n`-th riskiest account.
+    None when no account locations are available.
+    """
+    bundle = registry.get()
+    geo = bundle.geo
+    if geo is None:
+        with _ingest_lock:
+            geo = _get_geo(bundle)
+    if geo is None:
+        return None
+    if threshold is None:
+        top = bundle.risk_index.top_n(top_n)
+        threshold = top[-1][1] if top else 1.0
+    return {"threshold": threshold, "bucket_seconds": geo.bucket_seconds, "buckets": geo.timeline(threshold),
+            "model_version": bundle.version}
@@ -0,0 +1,181 @@
+# models/risk_index.py
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# Immutable snapshot of the index. Readers grab one reference and work on it,
+# so a concurrent rebuild can never hand them half-updated arrays.
+_IndexState = namedtuple(
+    "_IndexState",
+    ["account_ids", "scores", "order", "sorted_neg_scores", "positions"],
+)
+
+
+def compute_risk_scores(features_df, max_net_flow=None):
+    """
+    Vectorized version of the dashboard risk curve: net flow normalised by the
+    largest net flow, square-rooted to smooth the drop-off, clipped to [0, 0.99].
+
+    Pass `max_net_flow` to score a subset of accounts on the full population's
+    scale (e.g. when rescoring only the accounts touched by new transactions).
+    """
+    net_flow = features_df["net_flow"].to_numpy(dtype=np.float64)
+    if max_net_flow is None:
+        max_net_flow = net_flow.max() if len(net_flow) else 0.0
+    if max_net_flow <= 0:
+        return np.zeros(len(net_flow), dtype=np.float64)
+
+    normalized_flow = np.clip(net_flow / max_net_flow, 0.0, None)
+    return np.clip(np.sqrt(normalized_flow), 0.0, 0.99)
+
+
+def _insertion_points(order, sorted_neg_scores, neg_scores, positions):
+    """
+    Where each (neg_score, position) key falls in the sorted order, which is
+    also the index of a key already in it. Ties on the score are ordered by
+    position (the stable sort's tie-break), so a binary search inside the
+    run of equal scores finds it.
+    """
+    lo = np.searchsorted(sorted_neg_scores, neg_scores, side="left")
+    hi = np.searchsorted(sorted_neg_scores, neg_scores, side="right")
+    points = lo.copy()
+    for i in np.flatnonzero(hi > lo):
+        points[i] += np.searchsorted(order[lo[i]:hi[i]], positions[i])
+    return points
+
+
+class RiskIndex:
+    """
+    Ranked, read-only view over per-account risk scores.
+
+    Scores are computed once per build, sorted once, and every query after
+    that is an array slice, a dict lookup or a binary search.
+    """
+
+    def __init__(self, features_df=None, scores=None):
+        self._lock = threading.Lock()
+        self._state = None
+        if features_df is not None:
+            self.rebuild(features_df, scores=scores)
+
+    def rebuild(self, features_df, scores=None):
+        """
+        Recomputes scores and ordering from `features_df` (indexed by account_id)
+        and swaps the new state in with a single reference assignment.
+        """
+        account_ids = features_df.index.to_numpy()
+        if scores is None:
+            scores = compute_risk_scores(features_df)
+        with self._lock:
+            self._swap(account_ids, np.asarray(scores, dtype=np.float64))
+
+    def update_scores(self, account_ids, new_scores):
+        """
+        Re-ranks after a subset of accounts changed score: the changed
+        positions are taken out of the sorted order and put back at their new
+        place, so the cost follows the number of changes plus a copy of the
+        arrays, never a full sort.
+        """
+        with self._lock:
+            state = self._require_state()
+            changed = np.array([state.positions[account_id] for account_id in account_ids], dtype=np.int64)
+            if len(changed) == 0:
+                return
+            new_scores = np.asarray(new_scores, dtype=np.float64)
+            # The last value wins for an account listed twice.
+            changed, last = np.unique(changed[::-1], return_index=True)
+            new_scores = new_scores[::-1][last]
+
+            removed = _insertion_points(state.order, state.sorted_neg_scores, -state.scores[changed], changed)
+            order = np.delete(state.order, removed)
+            sorted_neg_scores = np.delete(state.sorted_neg_scores, removed)
+
+            # Inserted in (score desc, position) order, so equal insertion
+            # points keep the same tie order a full stable sort would give.
+            insert = np.lexsort((changed, -new_scores))
+            changed, new_scores = changed[insert], new_scores[insert]
+            at = _insertion_points(order, sorted_neg_scores, -new_scores, changed)
+            order = np.insert(order, at, changed)
+            sorted_neg_scores = np.insert(sorted_neg_scores, at, -new_scores)
+
+            scores = state.scores.copy()
+            scores[changed] = new_scores
+            self._state = _IndexState(state.account_ids, scores, order, sorted_neg_scores, state.positions)
+
+    def _swap(self, account_ids, scores, positions=None):
+        # Callers hold self._lock, so writers are serialised; readers never lock.
+        # Stable sort on the negated score keeps ties in feature-file order,
+        # so repeated builds over the same data rank identically.
+        order = np.argsort(-scores, kind="stable")
+        if positions is None:
+            positions = {account_id: i for i, account_id in enumerate(account_ids)}
+
+        new_state = _IndexState(
+            account_ids=account_ids,
+            scores=scores,
+            order=order,
+            sorted_neg_scores=-scores[order],
+            positions=positions,
+        )
+        self._state = new_state
+
+    def _require_state(self):
+        state = self._state
+        if state is None:
+            raise RuntimeError("RiskIndex has not been built yet.")
+        return state
+
+    def __len__(self):
+        state = self._state
+        return 0 if state is None else len(state.order)
+
+    def __contains__(self, account_id):
+        state = self._state
+        return state is not None and account_id in state.positions
+
+    def score_of(self, account_id):
+        state = self._require_state()
+        return float(state.scores[state.positions[account_id]])
+
+    def rank_of(self, account_id):
+        """1-based rank of an account (1 = riskiest), or None if unknown."""
+        state = self._require_state()
+        position = state.positions.get(account_id)
+        if position is None:
+            return None
+        neg_score = -state.scores[position]
+        return int(_insertion_points(state.order, state.sorted_neg_scores, np.array([neg_score]), np.array([position]))[0]) + 1
+
+    def top_n(self, n=25):
+        """Returns the `n` riskiest accounts as (account_id, risk_score) pairs."""
+        state = self._require_state()
+        top = state.order[:n]
+        return list(zip(state.account_ids[top].tolist(), state.scores[top].tolist()))
+
+    def top_positions(self, n=25):
+        """Positions (in build order) of the `n` riskiest accounts."""
+        return self._require_state().order[:n]
+
+    def scores_array(self):
+        """(account_ids, scores) in build order, as of the current state."""
+        state = self._require_state()
+        return state.account_ids, state.scores
+
+    def count_above(self, threshold):
+        """Number of accounts with a risk score >= threshold."""
+        state = self._require_state()
+        return int(np.searchsorted(state.sorted_neg_scores, -threshold, side="right"))
+
+    def score_range(self, low=0.0, high=1.0, limit=None):
+        """
+        Accounts with low <= risk_score <= high, riskiest first, as
+        (account_id, risk_score) pairs.
+        """
+        state = self._require_state()
+        start = np.searchsorted(state.sorted_neg_scores, -high, side="left")
+        end = np.searchsorted(state.sorted_neg_scores, -low, side="right")
+        if limit is not None:
+            end = min(end, start + limit)
+        selected = state.order[start:end]
+        return list(zip(state.account_ids[selected].tolist(), state.scores[selected].tolist()))
@@ -0,0 +1,142 @@
+# models/temporal_features.py
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from .feature_store import FeatureStoreWriter, open_or_import
+from .graph_snapshot import load_or_build_snapshot, snapshot_from_csv
+
+# Trailing windows ending at the reference time (`as_of`).
+WINDOWS = {"1h": 3600, "24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400}
+# Windows slid over the whole history for the burst metrics.
+BURST_WINDOWS = {"1h": 3600, "24h": 86400}
+
+WINDOW_COLUMNS = [f"{name}_{window}" for window in WINDOWS
+                  for name in ("in_count", "out_count", "amount_in", "amount_out")]
+BURST_COLUMNS = ([f"max_count_{window}" for window in BURST_WINDOWS]
+                 + [f"max_amount_out_{window}" for window in BURST_WINDOWS])
+TEMPORAL_COLUMNS = WINDOW_COLUMNS + BURST_COLUMNS
+
+
+class AccountEvents:
+    """
+    One direction's transfers grouped by account and sorted by time, keyed as
+    account * span + (timestamp - t0) so one searchsorted call answers a time
+    bound for every account at once. Keys of different accounts never
+    overlap, since `span` exceeds the covered time range.
+    """
+
+    def __init__(self, account, amount, timestamp, t0, span):
+        key = np.asarray(account, dtype=np.int64) * span + (np.asarray(timestamp, dtype=np.int64) - t0)
+        order = np.argsort(key, kind="stable")
+        self.key = key[order]
+        self.account = np.asarray(account, dtype=np.int64)[order]
+        self.cumulative = np.r_[0.0, np.cumsum(np.asarray(amount, dtype=np.float64)[order])]
+        self.t0 = t0
+        self.span = span
+
+    def _bound(self, accounts, timestamp):
+        # Index of the first event of each account after `timestamp`.
+        offset = np.clip(timestamp - self.t0, -1, self.span - 1)
+        return np.searchsorted(self.key, accounts * self.span + offset, side="right")
+
+    def trailing(self, num_accounts, as_of, seconds):
+        """(count, amount) per account over (as_of - seconds, as_of]."""
+        accounts = np.arange(num_accounts, dtype=np.int64)
+        lo = self._bound(accounts, as_of - seconds)
+        hi = self._bound(accounts, as_of)
+        return hi - lo, self.cumulative[hi] - self.cumulative[lo]
+
+    def busiest(self, num_accounts, seconds):
+        """Per account, the most events and the largest amount in any window [t, t + seconds)."""
+        end = np.searchsorted(self.key, self.key + seconds - 1, side="right")
+        count = end - np.arange(len(self.key))
+        amount = self.cumulative[end] - self.cumulative[:-1]
+        max_count = np.zeros(num_accounts, dtype=np.int64)
+        max_amount = np.zeros(num_accounts, dtype=np.float64)
+        if len(self.key):
+            starts = np.flatnonzero(np.r_[True, self.account[1:] != self.account[:-1]])
+            max_count[self.account[starts]] = np.maximum.reduceat(count, starts)
+            max_amount[self.account[starts]] = np.maximum.reduceat(amount, starts)
+        return max_count, max_amount
+
+
+def compute_temporal_features(num_accounts, src, dst, amount, timestamp, as_of=None):
+    """
+    Rolling aggregates over WINDOWS and burst metrics for accounts 0..n-1,
+    from transfers given as src/dst account positions, amounts and epoch-second
+    timestamps. `as_of` defaults to the latest transfer, so historical data
+    gets meaningful windows. Transfers after `as_of` are ignored.
+    Returns ({column: float64 array}, as_of).
+    """
+    timestamp = np.asarray(timestamp, dtype=np.int64)
+    if as_of is None:
+        as_of = int(timestamp.max()) if len(timestamp) else 0
+    before = timestamp <= as_of
+    src, dst = np.asarray(src)[before], np.asarray(dst)[before]
+    amount, timestamp = np.asarray(amount)[before], timestamp[before]
+
+    t0 = min(int(timestamp.min()) if len(timestamp) else as_of, as_of - max(WINDOWS.values()))
+    span = as_of - t0 + max(BURST_WINDOWS.values()) + 2
+    outgoing = AccountEvents(src, amount, timestamp, t0, span)
+    incoming = AccountEvents(dst, amount, timestamp, t0, span)
+    both = AccountEvents(np.concatenate([src, dst]), np.zeros(2 * len(src)), np.tile(timestamp, 2), t0, span)
+
+    features = {}
+    for window, seconds in WINDOWS.items():
+        features[f"in_count_{window}"], features[f"amount_in_{window}"] = incoming.trailing(num_accounts, as_of, seconds)
+        features[f"out_count_{window}"], features[f"amount_out_{window}"] = outgoing.trailing(num_accounts, as_of, seconds)
+    for window, seconds in BURST_WINDOWS.items():
+        features[f"max_count_{window}"], _ = both.busiest(num_accounts, seconds)
+        _, features[f"max_amount_out_{window}"] = outgoing.busiest(num_accounts, seconds)
+    return {name: np.asarray(values, dtype=np.float64) for name, values in features.items()}, as_of
+
+
+def write_temporal_store(store, snapshot, as_of=None, chunk_size=200000):
+    """
+    Publishes a new feature store version: the current version's non-temporal
+    columns plus freshly computed TEMPORAL_COLUMNS. Accounts missing from the
+    snapshot get zeros. Returns (version, as_of).
+    """
+    features, as_of = compute_temporal_features(snapshot.num_nodes, snapshot.src, snapshot.dst,
+                                                snapshot.amount, snapshot.timestamp, as_of)
+    base = [column for column in store.columns if column not in TEMPORAL_COLUMNS]
+    writer = FeatureStoreWriter(store.path, columns=base + TEMPORAL_COLUMNS, source="temporal",
+                                meta={"temporal_as_of": as_of})
+    nodes = snapshot.account_index.get_indexer(np.asarray(store.account_ids))
+    for start in range(0, len(store), chunk_size):
+        rows = slice(start, min(start + chunk_size, len(store)))
+        chunk = pd.DataFrame(store.matrix(base, rows=rows), columns=base)
+        chunk.insert(0, "account_id", np.asarray(store.account_ids[rows]))
+        found = nodes[rows] >= 0
+        for column in TEMPORAL_COLUMNS:
+            chunk[column] = np.where(found, features[column][np.maximum(nodes[rows], 0)], 0.0)
+        writer.append(chunk)
+    return writer.commit(), as_of
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add rolling-window and burst features to the feature store.")
+    parser.add_argument("--csv", action="store_true", help="Read the SynthDataGen CSVs instead of Neo4j / graph_snapshot.")
+    parser.add_argument("--as-of", help="Reference time (ISO-8601, UTC); defaults to the latest transfer.")
+    args = parser.parse_args()
+    load_dotenv()
+    start_time = time.time()
+
+    if args.csv:
+        snapshot = snapshot_from_csv("SynthDataGen/accounts.csv", "SynthDataGen/transactions.csv")
+    else:
+        snapshot = load_or_build_snapshot(os.getenv("NEO4J_URI"), os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+    as_of = int(pd.Timestamp(args.as_of).timestamp()) if args.as_of else None
+
+    store = open_or_import()
+    version, as_of = write_temporal_store(store, snapshot, as_of)
+    print(f"Wrote {len(TEMPORAL_COLUMNS)} temporal features for {len(store)} accounts as of "
+          f"{pd.Timestamp(as_of, unit='s').isoformat()} to feature store version {version} "
+          f"in {time.time() - start_time:.2f} seconds.")
+    print("The served models keep reading the columns they were trained on; "
+          "retrain them (step 4 onwards) to use the new ones.")
@@ -1,10 +1,16 @@
 # models/train_autoencoder.py
+import argparse
+import time
+
+import numpy as np
 import torch
 import torch.nn as nn
-import pandas as pd
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler
 from sklearn.preprocessing import StandardScaler
 import joblib
 
+from .feature_store import open_or_import
+
 # --- 1. Define the Autoencoder Architecture ---
 class Autoencoder(nn.Module):
     def __init__(self, input_dim):
@@ -25,39 +31,103 @@ class Autoencoder(nn.Module):
         decoded = self.decoder(encoded)
         return decoded
 
-# --- 2. Training Script ---
-if __name__ == "__main__":
-    # load features
-    df = pd.read_csv("account_features.csv").set_index("account_id")
+# --- 2. Mini-batch data loading ---
+class FeatureBatches(Dataset):
+    """
+    Scaled feature rows read straight from the memory-mapped store.
+
+    Items are whole batches: the DataLoader's BatchSampler hands over a list
+    of row positions, which are read in sorted order with one memmap gather.
+    """
 
-    # Preprocessing: fit & save scaler
+    def __init__(self, store, scaler):
+        self.store = store
+        self.scaler = scaler
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, rows):
+        rows = np.sort(np.asarray(rows))
+        return torch.as_tensor(self.scaler.transform(self.store.matrix(rows=rows)), dtype=torch.float32)
+
+def fit_scaler_in_chunks(store, chunk_size=65536):
+    # Same statistics as StandardScaler.fit on the full matrix, one chunk in memory at a time.
     scaler = StandardScaler()
-    X = scaler.fit_transform(df.values)
-    joblib.dump(scaler, "scaler.pkl")   # <<-- important: save the scaler
+    for _, chunk in store.iter_chunks(chunk_size):
+        scaler.partial_fit(chunk)
+    return scaler
 
-    X_tensor = torch.FloatTensor(X)
+# --- 3. Training Script ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the feature autoencoder.")
+    parser.add_argument("--minibatch", action="store_true", help="Stream shuffled batches from the feature store.")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=2, help="DataLoader workers (mini-batch mode).")
+    parser.add_argument("--epochs", type=int, default=50)
+    args = parser.parse_args()
+
+    # load features
+    store = open_or_import()
+    print(f"Loaded feature store version {store.version} ({len(store)} accounts).")
 
     # Model Initialization
-    input_dim = X.shape[1]
+    input_dim = len(store.columns)
     model = Autoencoder(input_dim)
     criterion = nn.MSELoss()
     optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    num_epochs = args.epochs
+
+    if args.minibatch:
+        scaler = fit_scaler_in_chunks(store)
+        # Which store columns the models take (see feature_store.trained_columns).
+        scaler.feature_columns = list(store.columns)
+        joblib.dump(scaler, "scaler.pkl")   # <<-- important: save the scaler
+
+        dataset = FeatureBatches(store, scaler)
+        loader = DataLoader(
+            dataset, sampler=BatchSampler(RandomSampler(dataset), args.batch_size, drop_last=False),
+            batch_size=None, num_workers=args.workers, persistent_workers=args.workers > 0,
+        )
+
+        print(f"Training Autoencoder in mini-batches of {args.batch_size}...")
+        for epoch in range(num_epochs):
+            start = time.perf_counter()
+            total_loss = 0.0
+            for batch in loader:
+                loss = criterion(model(batch), batch)
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+                total_loss += loss.item() * len(batch)
+
+            if (epoch + 1) % 10 == 0:
+                print(f'Epoch [{epoch + 1}/{num_epochs}], Loss: {total_loss / len(dataset):.4f}, '
+                      f'Time: {time.perf_counter() - start:.2f}s')
+    else:
+        # Preprocessing: fit & save scaler
+        scaler = StandardScaler()
+        X = scaler.fit_transform(store.matrix())
+        scaler.feature_columns = list(store.columns)
+        joblib.dump(scaler, "scaler.pkl")   # <<-- important: save the scaler
+
+        X_tensor = torch.FloatTensor(X)
 
-    # Training Loop
-    print("Training Autoencoder...")
-    num_epochs = 50
-    for epoch in range(num_epochs):
-        outputs = model(X_tensor)
-        loss = criterion(outputs, X_tensor)
+        # Training Loop
+        print("Training Autoencoder...")
+        for epoch in range(num_epochs):
+            outputs = model(X_tensor)
+            loss = criterion(outputs, X_tensor)
 
-        optimizer.zero_grad()
-        loss.backward()
-        optimizer.step()
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
 
-        if (epoch + 1) % 10 == 0:
-            print(f'Epoch [{epoch + 1}/{num_epochs}], Loss: {loss.item():.4f}')
+            if (epoch + 1) % 10 == 0:
+                print(f'Epoch [{epoch + 1}/{num_epochs}], Loss: {loss.item():.4f}')
 
     # Save the trained model
     torch.save(model.state_dict(), "autoencoder.pth")
     print("Autoencoder model trained and saved to autoencoder.pth")
     print("Scaler saved to scaler.pkl")
+    print("Run `python -m models.anomaly_scoring` to score every account with it.")
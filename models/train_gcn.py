@@ -4,122 +4,269 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from dgl.nn.pytorch import GraphConv
-from neo4j import GraphDatabase
+import numpy as np
 import pandas as pd
 import joblib
+import json
 import os
+import argparse
+import copy
+import time
 from dotenv import load_dotenv
 load_dotenv()
 
+from .feature_store import open_or_import, trained_columns
+from .graph_snapshot import load_or_build_snapshot
+
 # --- 1. Define the GCN Architecture ---
 class GCN(nn.Module):
+    # One sampled block per layer in mini-batch training (see --fanouts).
+    num_layers = 2
+
     def __init__(self, in_feats, h_feats, num_classes):
         super(GCN, self).__init__()
         self.conv1 = GraphConv(in_feats, h_feats)
         self.conv2 = GraphConv(h_feats, num_classes)
 
     def forward(self, g, in_feat):
-        h = self.conv1(g, in_feat)
+        # `g` is either the whole graph or, in mini-batch training, the list of
+        # two sampled blocks (one per layer) produced by the neighbor sampler.
+        g1, g2 = g if isinstance(g, list) else (g, g)
+        h = self.conv1(g1, in_feat)
         h = F.relu(h)
-        h = self.conv2(g, h)
+        h = self.conv2(g2, h)
         return h
 
-# --- 2. Function to fetch graph data from Neo4j ---
-def build_graph_from_neo4j(uri, user, password):
-    driver = GraphDatabase.driver(uri, auth=(user, password))
-    with driver.session() as session:
-        # Get nodes
-        print(" > Step 2a: Fetching all account nodes from Neo4j...")
-        node_query = "MATCH (a:Account) RETURN a.account_id AS id"
-        nodes_df = pd.DataFrame([r.data() for r in session.run(node_query)])
-        node_map = {node_id: i for i, node_id in enumerate(nodes_df['id'])}
-        print(f"   - Found {len(node_map)} nodes.")
-
-        # Get edges
-        print(" > Step 2b: Fetching all transaction relationships from Neo4j...")
-        edge_query = "MATCH (a:Account)-[r:TRANSFER]->(b:Account) RETURN a.account_id AS src, b.account_id AS dst"
-        edges_df = pd.DataFrame([r.data() for r in session.run(edge_query)])
-        print(f"   - Found {len(edges_df)} relationships.")
-        
-        src_nodes = [node_map[sid] for sid in edges_df['src']]
-        dst_nodes = [node_map[rid] for rid in edges_df['dst']]
-
-    return dgl.graph((src_nodes, dst_nodes)), node_map
-
-# --- 3. Training Script ---
-if __name__ == "__main__":
-    print("--- Step 1: Loading DataFrames ---")
-    features_df = pd.read_csv("account_features.csv")
-    labels_df = pd.read_csv('SynthDataGen/transactions.csv')
-    print(" > DataFrames loaded successfully.")
+    def forward_with_hidden(self, g, in_feat):
+        # Same pass as forward(), but also hands back the hidden layer so batch
+        # inference can persist per-account embeddings.
+        hidden = F.relu(self.conv1(g, in_feat))
+        return self.conv2(g, hidden), hidden
 
-    print("\n--- Step 2: Creating Ground-Truth Labels ---")
-    illicit_accounts = set(labels_df[labels_df['is_illicit'] == 1]['source_account']).union(
-                         set(labels_df[labels_df['is_illicit'] == 1]['target_account']))
-    features_df['label'] = features_df['account_id'].apply(lambda x: 1 if x in illicit_accounts else 0)
-    print(f" > Labeled {features_df['label'].sum()} accounts as illicit.")
+# --- 2. Training provenance ---
+# Written next to gcn.pth so inference can tell when the model was trained on
+# a different graph than the one it is about to score.
+GCN_META_PATH = "gcn_meta.json"
 
-    print("\n--- Step 3: Building Graph from Neo4j Database ---")
-    graph, node_map = build_graph_from_neo4j(
-        os.getenv("NEO4J_URI"),
-        os.getenv("NEO4J_USER"),
-        os.getenv("NEO4J_PASSWORD")
-    )
-    graph = dgl.add_self_loop(graph)
-    print(" > Graph built successfully.")
-    
-    print("\n--- Step 4: Normalizing Features and Aligning Data ---")
-    # Align features with graph node order FIRST
-    features_df = features_df.set_index('account_id').loc[list(node_map.keys())]
-    
-    # Load the scaler saved by the autoencoder script
-    scaler = joblib.load("scaler.pkl")
-    
-    # Separate features and labels
-    features_to_scale = features_df.drop('label', axis=1).values
-    labels_final = torch.LongTensor(features_df['label'].values)
-
-    # Apply the scaler to normalize the features
-    scaled_features = scaler.transform(features_to_scale)
-    features_final = torch.FloatTensor(scaled_features)
-    print(" > Features normalized and aligned.")
-    
-    # models/train_gcn.py
+def save_training_meta(graph_hash, feature_store_version, path=GCN_META_PATH):
+    with open(path, "w") as f:
+        json.dump({"graph_hash": graph_hash, "feature_store_version": feature_store_version,
+                   "trained_at": time.time()}, f, indent=2)
 
-    print("\n--- Step 5: Training the GCN Model ---")
+def load_training_meta(path=GCN_META_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
 
-    # --- START CORRECTED CODE ---
-    # Calculate class weights to handle the highly imbalanced data
-    num_positives = labels_final.sum().item()
-    num_negatives = len(labels_final) - num_positives
+# --- 3. Data split and early stopping ---
+def stratified_split(labels, val_fraction=0.2, seed=0):
+    """Node ids for train and validation, with each class split in the same proportion."""
+    rng = np.random.default_rng(seed)
+    train, val = [], []
+    for cls in np.unique(labels):
+        members = rng.permutation(np.flatnonzero(labels == cls))
+        cut = int(round(len(members) * val_fraction))
+        val.append(members[:cut])
+        train.append(members[cut:])
+    return np.sort(np.concatenate(train)), np.sort(np.concatenate(val))
 
-    # This new weight tells the model that misclassifying an illicit account
-    # is much more "costly" than misclassifying a benign one.
-    weight_for_illicit = num_negatives / num_positives
-    weights = torch.tensor([1.0, weight_for_illicit]) 
+def class_weights(labels):
+    # Misclassifying an illicit account is made as "costly" as all benign ones
+    # together. Computed on the training split only.
+    num_positives = int(labels.sum())
+    num_negatives = len(labels) - num_positives
+    return torch.tensor([1.0, num_negatives / max(num_positives, 1)])
 
-    print(f" > Using class weights to handle imbalance: [Benign: 1.0, Illicit: {weight_for_illicit:.2f}]")
-    # --- END CORRECTED CODE ---
+class EarlyStopping:
+    """Tracks the best validation loss and keeps a copy of the weights that achieved it."""
 
-    model = GCN(features_final.shape[1], 16, 2)
-    optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+    def __init__(self, patience):
+        self.patience = patience
+        self.best_loss = float("inf")
+        self.best_state = None
+        self.stale_epochs = 0
 
-    num_epochs = 100
-    for epoch in range(num_epochs):
-        logits = model(graph, features_final)
+    def step(self, val_loss, model):
+        """Returns True when training should stop."""
+        if val_loss < self.best_loss:
+            self.best_loss = val_loss
+            self.best_state = copy.deepcopy(model.state_dict())
+            self.stale_epochs = 0
+        else:
+            self.stale_epochs += 1
+        return self.stale_epochs >= self.patience
 
-        # Apply the corrected weights to the loss function
-        loss = F.cross_entropy(logits, labels_final, weight=weights)
+# --- 4. Training loops ---
+def train_full_batch(model, graph, features, labels, train_idx, val_idx, weights, epochs, patience, lr=0.001):
+    """The whole graph goes through every step; memory grows with the graph."""
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    stopper = EarlyStopping(patience)
+    train_idx, val_idx = torch.from_numpy(train_idx), torch.from_numpy(val_idx)
 
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        model.train()
+        logits = model(graph, features)
+        loss = F.cross_entropy(logits[train_idx], labels[train_idx], weight=weights)
         optimizer.zero_grad()
         loss.backward()
         optimizer.step()
 
+        model.eval()
+        with torch.no_grad():
+            val_loss = F.cross_entropy(model(graph, features)[val_idx], labels[val_idx], weight=weights).item()
+        elapsed = time.perf_counter() - start
+
         if (epoch + 1) % 10 == 0:
-            print(f'Epoch [{epoch + 1}/{num_epochs}], Loss: {loss.item():.4f}')
+            print(f'Epoch [{epoch + 1}/{epochs}], Loss: {loss.item():.4f}, Val Loss: {val_loss:.4f}, Time: {elapsed:.3f}s')
+        if stopper.step(val_loss, model):
+            print(f" > Early stopping after epoch {epoch + 1} (best val loss {stopper.best_loss:.4f}).")
+            break
+    return stopper
+
+def train_minibatch(model, graph, feature_fn, labels, train_idx, val_idx, weights, epochs, patience,
+                    fanouts=(10, 10), batch_size=1024, num_workers=4, lr=0.001):
+    """
+    Trains on sampled 2-layer neighbourhoods of `batch_size` target nodes at a
+    time, so peak memory depends on the batch and fan-outs, not the graph.
+    `feature_fn(node_ids)` returns the scaled feature rows for those nodes and
+    is only ever called for the input nodes of one batch.
+    """
+    train_loader = dgl.dataloading.DataLoader(
+        graph, torch.from_numpy(train_idx), dgl.dataloading.NeighborSampler(list(fanouts)),
+        batch_size=batch_size, shuffle=True, drop_last=False, num_workers=num_workers,
+    )
+    # Validation uses every neighbour, so the metric does not jitter with sampling.
+    val_loader = dgl.dataloading.DataLoader(
+        graph, torch.from_numpy(val_idx), dgl.dataloading.MultiLayerFullNeighborSampler(len(fanouts)),
+        batch_size=batch_size, shuffle=False, drop_last=False, num_workers=num_workers,
+    )
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    stopper = EarlyStopping(patience)
+
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        model.train()
+        total_loss, seen = 0.0, 0
+        for input_nodes, output_nodes, blocks in train_loader:
+            logits = model(blocks, feature_fn(input_nodes))
+            loss = F.cross_entropy(logits, labels[output_nodes], weight=weights)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(output_nodes)
+            seen += len(output_nodes)
+
+        model.eval()
+        val_loss, val_seen = 0.0, 0
+        with torch.no_grad():
+            for input_nodes, output_nodes, blocks in val_loader:
+                logits = model(blocks, feature_fn(input_nodes))
+                val_loss += F.cross_entropy(logits, labels[output_nodes], weight=weights).item() * len(output_nodes)
+                val_seen += len(output_nodes)
+        val_loss /= max(val_seen, 1)
+        elapsed = time.perf_counter() - start
+
+        print(f'Epoch [{epoch + 1}/{epochs}], Loss: {total_loss / max(seen, 1):.4f}, '
+              f'Val Loss: {val_loss:.4f}, Time: {elapsed:.2f}s')
+        if stopper.step(val_loss, model):
+            print(f" > Early stopping after epoch {epoch + 1} (best val loss {stopper.best_loss:.4f}).")
+            break
+    return stopper
+
+# --- 5. Training Script ---
+def parse_fanouts(value):
+    """argparse type for --fanouts: one neighbour count per GCN layer (-1 = all)."""
+    try:
+        fanouts = [int(f) for f in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated integers, got {value!r}")
+    if len(fanouts) != GCN.num_layers:
+        raise argparse.ArgumentTypeError(f"the GCN has {GCN.num_layers} layers, so it takes "
+                                         f"{GCN.num_layers} fanouts; got {len(fanouts)}")
+    return fanouts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the GCN on the transaction graph.")
+    parser.add_argument("--minibatch", action="store_true", help="Neighbour-sampled mini-batch training.")
+    parser.add_argument("--fanouts", type=parse_fanouts, default="10,10",
+                        help="Neighbours sampled per layer (mini-batch mode).")
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=4, help="Sampling workers (mini-batch mode).")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--patience", type=int, default=10, help="Epochs without val-loss improvement before stopping.")
+    parser.add_argument("--val-fraction", type=float, default=0.2)
+    parser.add_argument("--rebuild-snapshot", action="store_true", help="Re-read the graph from Neo4j.")
+    args = parser.parse_args()
+
+    print("--- Step 1: Loading Feature Store and Labels ---")
+    store = open_or_import()
+    labels_df = pd.read_csv('SynthDataGen/transactions.csv', usecols=['source_account', 'target_account', 'is_illicit'])
+    print(f" > Feature store version {store.version} ({len(store)} accounts) and labels loaded successfully.")
+
+    print("\n--- Step 2: Creating Ground-Truth Labels ---")
+    illicit_rows = labels_df[labels_df['is_illicit'] == 1]
+    illicit_accounts = set(illicit_rows['source_account']).union(set(illicit_rows['target_account']))
+
+    print("\n--- Step 3: Loading Graph Snapshot ---")
+    # Reuses graph_snapshot/ while it matches Neo4j; pass --rebuild-snapshot to force a re-read.
+    snapshot = load_or_build_snapshot(
+        os.getenv("NEO4J_URI"),
+        os.getenv("NEO4J_USER"),
+        os.getenv("NEO4J_PASSWORD"),
+        rebuild=args.rebuild_snapshot,
+    )
+    graph = dgl.add_self_loop(snapshot.to_dgl())
+    print(f" > Graph loaded: {snapshot.num_nodes} nodes, {snapshot.num_edges} edges.")
+
+    print("\n--- Step 4: Normalizing Features and Aligning Data ---")
+    node_ids = snapshot.account_ids
+    labels_final = torch.from_numpy(np.isin(node_ids, list(illicit_accounts)).astype(np.int64))
+    print(f" > Labeled {labels_final.sum().item()} accounts as illicit.")
+
+    # Load the scaler saved by the autoencoder script
+    scaler = joblib.load("scaler.pkl")
+    columns = trained_columns(scaler, store)
+    store_rows = store.rows_of(node_ids)
+    if (store_rows < 0).any():
+        raise KeyError(f"{int((store_rows < 0).sum())} graph accounts are missing from the feature store.")
+
+    train_idx, val_idx = stratified_split(labels_final.numpy(), args.val_fraction)
+    weights = class_weights(labels_final.numpy()[train_idx])
+    print(f" > Split {len(train_idx)} train / {len(val_idx)} val accounts "
+          f"({labels_final[train_idx].sum().item()} / {labels_final[val_idx].sum().item()} illicit).")
+    print(f" > Using class weights to handle imbalance: [Benign: 1.0, Illicit: {weights[1].item():.2f}]")
+
+    print("\n--- Step 5: Training the GCN Model ---")
+    model = GCN(len(columns), 16, 2)
+    start_time = time.perf_counter()
+    if args.minibatch:
+        # Rows are read from the memory-mapped store per batch and scaled there.
+        def batch_features(input_nodes):
+            rows = store_rows[input_nodes.numpy()]
+            return torch.from_numpy(scaler.transform(store.matrix(columns, rows=rows)).astype(np.float32))
+
+        stopper = train_minibatch(
+            model, graph, batch_features, labels_final, train_idx, val_idx, weights, args.epochs, args.patience,
+            fanouts=args.fanouts, batch_size=args.batch_size, num_workers=args.workers,
+        )
+    else:
+        features_final = torch.FloatTensor(scaler.transform(store.matrix(columns, rows=store_rows)))
+        print(" > Features normalized and aligned.")
+        stopper = train_full_batch(model, graph, features_final, labels_final, train_idx, val_idx,
+                                   weights, args.epochs, args.patience)
 
-    print(" > Training complete.")
+    if stopper.best_state is not None:
+        model.load_state_dict(stopper.best_state)
+        print(f" > Training complete in {time.perf_counter() - start_time:.2f}s "
+              f"(best val loss {stopper.best_loss:.4f}).")
+    else:
+        # No epochs ran, or the validation split was empty (val loss NaN).
+        print(f" > Training complete in {time.perf_counter() - start_time:.2f}s; "
+              "no validation loss to select on, keeping the final weights.")
 
     print("\n--- Step 6: Saving Model ---")
     torch.save(model.state_dict(), "gcn.pth")
-    print(" > GCN model trained and saved to gcn.pth")
\ No newline at end of file
+    save_training_meta(snapshot.content_hash, store.version)
+    print(f" > GCN model trained and saved to gcn.pth (graph {snapshot.content_hash[:12]})")
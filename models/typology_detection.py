@@ -0,0 +1,369 @@
+# models/typology_detection.py
+import argparse
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from .graph_snapshot import GraphSnapshot, GRAPH_SNAPSHOT_PATH
+
+TYPOLOGY_LABELS_PATH = "typologies.npz"
+
+# Generator typology (illicit_pattern_type) -> name shown by the API. Bit i of
+# an account's label mask stands for the i-th entry.
+TYPOLOGY_NAMES = {"SMURFING": "Smurfing", "LAYERING": "Layering", "MULE": "Mule"}
+CODES = list(TYPOLOGY_NAMES)
+
+# Fan-in smurfing: many deposits just under the 50k reporting threshold into
+# one account, from several senders, within about three days.
+SMURF_MIN_AMOUNT = 5_000
+SMURF_MAX_AMOUNT = 50_000
+SMURF_WINDOW_SECONDS = 73 * 3600
+SMURF_MIN_DEPOSITS = 10
+SMURF_MIN_SOURCES = 5
+
+# Layering: money forwarded within hours, each hop keeping 98-99% of the
+# amount it received (with slack for rounding to paise).
+LAYER_MAX_GAP_SECONDS = 4 * 3600
+LAYER_MIN_RATIO = 0.979
+LAYER_MAX_RATIO = 0.991
+LAYER_MIN_HOPS = 3
+LAYER_MAX_HOPS = 16
+
+# Cash-out mule: a large deposit spent through a burst of small payments
+# (mostly to merchants and ATMs) within hours.
+MULE_MIN_DEPOSIT = 100_000
+MULE_WINDOW_SECONDS = 4 * 3600
+MULE_MIN_PAYMENTS = 10
+MULE_MIN_SPENT = 0.25
+
+# Edge arrays the detectors run on. src/dst index into account_ids; dst is
+# EXTERNAL for counterparties that are not accounts (merchants, ATMs).
+# timestamp is in epoch seconds.
+Edges = namedtuple("Edges", ["account_ids", "src", "dst", "amount", "timestamp"])
+EXTERNAL = -1
+
+
+def edges_from_frame(account_ids, transactions_df):
+    """Edge arrays from a frame with the generator's column names; rows not sent by an account are dropped."""
+    account_index = pd.Index(account_ids).sort_values()
+    src = account_index.get_indexer(transactions_df["source_account"])
+    dst = account_index.get_indexer(transactions_df["target_account"])
+    keep = src >= 0
+    timestamp = pd.to_datetime(transactions_df["timestamp"][keep], format="ISO8601").astype("int64").to_numpy() // 10**9
+    return Edges(account_index.to_numpy(), src[keep].astype(np.int64), dst[keep].astype(np.int64),
+                 transactions_df["amount_inr"][keep].to_numpy(dtype=np.float64), timestamp)
+
+
+def edges_from_snapshot(snapshot):
+    # The snapshot only holds account-to-account transfers, so cash-out
+    # payments to merchants are invisible and mule bursts are not found.
+    return Edges(snapshot.account_ids, np.asarray(snapshot.src, dtype=np.int64), np.asarray(snapshot.dst, dtype=np.int64),
+                 np.asarray(snapshot.amount), np.asarray(snapshot.timestamp))
+
+
+def _expand(starts, ends):
+    # (owner, position) for every position in the ranges [starts[i], ends[i]).
+    counts = ends - starts
+    owner = np.repeat(np.arange(len(starts)), counts)
+    return owner, starts[owner] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+# --- 1. Detectors over one partition ---
+# A partition owns a range of accounts and receives their incoming and
+# outgoing edges, each as (edge id, src, dst, amount, timestamp) arrays.
+# Everything a detector needs is incident to the account it anchors on, so
+# partitions never need each other's edges. Times are keyed per account as
+# account * span + (timestamp - t0), one sorted int64 array per direction.
+def _sorted_by(account, timestamp, t0, span):
+    key = account * span + (timestamp - t0)
+    order = np.argsort(key, kind="stable")
+    return order, key[order]
+
+
+def _fan_in(incoming, t0, span):
+    """Per anchor account, the deposits in its busiest SMURF_WINDOW_SECONDS, if they look like smurfing."""
+    edge, src, dst, amount, timestamp = incoming
+    keep = (amount >= SMURF_MIN_AMOUNT) & (amount < SMURF_MAX_AMOUNT)
+    order, key = _sorted_by(dst[keep], timestamp[keep], t0, span)
+    edge, src, dst = edge[keep][order], src[keep][order], dst[keep][order]
+    if not len(edge):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Deposits in [t, t + window] starting from each deposit, then the busiest start per account.
+    count = np.searchsorted(key, key + SMURF_WINDOW_SECONDS, side="right") - np.arange(len(key))
+    starts = np.flatnonzero(np.r_[True, dst[1:] != dst[:-1]])
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(dst)]))
+    best = np.maximum.reduceat(count, starts)
+    candidates = np.flatnonzero((count == best[segment]) & (best[segment] >= SMURF_MIN_DEPOSITS))
+    _, first = np.unique(segment[candidates], return_index=True)
+    window_start = candidates[first]
+
+    owner, position = _expand(window_start, window_start + count[window_start])
+    senders = np.unique(np.stack([owner, src[position]]), axis=1)[0]
+    enough = np.bincount(senders, minlength=len(window_start)) >= SMURF_MIN_SOURCES
+    position = position[enough[owner]]
+    return dst[position], edge[position]
+
+
+def _layering_links(incoming, outgoing, t0, span):
+    """(in edge, out edge) pairs through a partition account that forward 98-99% of the amount within hours."""
+    in_edge, _, in_dst, in_amount, in_time = incoming
+    out_edge, out_src, out_dst, out_amount, out_time = outgoing
+    internal = out_dst != EXTERNAL
+    order, key = _sorted_by(out_src[internal], out_time[internal], t0, span)
+    out_edge, out_amount = out_edge[internal][order], out_amount[internal][order]
+
+    in_key = in_dst * span + (in_time - t0)
+    lo = np.searchsorted(key, in_key, side="left")
+    hi = np.searchsorted(key, in_key + LAYER_MAX_GAP_SECONDS, side="right")
+    owner, position = _expand(lo, hi)
+    ratio = out_amount[position] / in_amount[owner]
+    linked = (ratio >= LAYER_MIN_RATIO) & (ratio <= LAYER_MAX_RATIO)
+    return in_edge[owner[linked]], out_edge[position[linked]]
+
+
+def _mule_bursts(incoming, outgoing, t0, span):
+    """Large deposits into a partition account followed by a burst of payments that spends most of them."""
+    in_edge, _, in_dst, in_amount, in_time = incoming
+    out_edge, out_src, _, out_amount, out_time = outgoing
+    order, key = _sorted_by(out_src, out_time, t0, span)
+    out_edge = out_edge[order]
+    spent = np.r_[0.0, np.cumsum(out_amount[order])]
+
+    deposit = in_amount >= MULE_MIN_DEPOSIT
+    in_edge, in_dst, in_amount = in_edge[deposit], in_dst[deposit], in_amount[deposit]
+    in_key = in_dst * span + (in_time[deposit] - t0)
+    lo = np.searchsorted(key, in_key, side="right")
+    hi = np.searchsorted(key, in_key + MULE_WINDOW_SECONDS, side="right")
+    burst = (hi - lo >= MULE_MIN_PAYMENTS) & (spent[hi] - spent[lo] >= MULE_MIN_SPENT * in_amount)
+
+    owner, position = _expand(lo[burst], hi[burst])
+    anchors = np.concatenate([in_dst[burst], in_dst[burst][owner]])
+    return anchors, np.concatenate([in_edge[burst], out_edge[position]])
+
+
+def _detect_partition(task):
+    incoming, outgoing, t0, span = task
+    return {
+        "SMURFING": _fan_in(incoming, t0, span),
+        "LAYERING": _layering_links(incoming, outgoing, t0, span),
+        "MULE": _mule_bursts(incoming, outgoing, t0, span),
+    }
+
+
+# --- 2. Partitioning and merging ---
+def _partitions(edges, num_partitions):
+    edge_ids = np.arange(len(edges.src))
+    t0 = int(edges.timestamp.min()) if len(edge_ids) else 0
+    # Wider than any window, so keys of different accounts never overlap.
+    span = (int(edges.timestamp.max()) - t0 if len(edge_ids) else 0) + SMURF_WINDOW_SECONDS + 1
+    bounds = np.linspace(0, len(edges.account_ids), num_partitions + 1).astype(np.int64)
+    columns = (edge_ids, edges.src, edges.dst, edges.amount, edges.timestamp)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        incoming = (edges.dst >= lo) & (edges.dst < hi)
+        outgoing = (edges.src >= lo) & (edges.src < hi)
+        yield (tuple(c[incoming] for c in columns), tuple(c[outgoing] for c in columns), t0, span)
+
+
+def _chain_lengths(first, second):
+    """
+    Longest chain of linked edges through each edge, over the (first, second)
+    link pairs. Amounts strictly decrease along links, so there are no cycles.
+    """
+    nodes, inverse = np.unique(np.concatenate([first, second]), return_inverse=True)
+    first, second = inverse[:len(first)], inverse[len(first):]
+    lengths = []
+    for a, b in ((first, second), (second, first)):
+        depth = np.ones(len(nodes), dtype=np.int64)
+        for _ in range(LAYER_MAX_HOPS):
+            deeper = depth.copy()
+            np.maximum.at(deeper, b, depth[a] + 1)
+            if np.array_equal(deeper, depth):
+                break
+            depth = deeper
+        lengths.append(depth)
+    return nodes, lengths[0] + lengths[1] - 1
+
+
+def detect_typologies(edges, workers=1, partitions=None):
+    """
+    Runs every detector over `edges`, split into account-range partitions
+    across `workers` processes. Returns one row per (account, typology) with
+    the evidence behind it, as a DataFrame sorted by account and typology;
+    the result is the same for any number of workers.
+    """
+    num_partitions = partitions or max(1, workers)
+    tasks = list(_partitions(edges, num_partitions))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_detect_partition, tasks))
+    else:
+        results = [_detect_partition(task) for task in tasks]
+
+    def merged(code):
+        return tuple(np.concatenate([r[code][i] for r in results]) for i in range(2))
+
+    hits = []
+    for code in ("SMURFING", "MULE"):
+        anchors, edge_ids = merged(code)
+        hits.append((code, anchors, edge_ids, np.zeros(len(edge_ids), dtype=np.int64)))
+    first, second = merged("LAYERING")
+    if len(first):
+        edge_ids, hops = _chain_lengths(first, second)
+        chained = hops >= LAYER_MIN_HOPS
+        hits.append(("LAYERING", np.full(chained.sum(), EXTERNAL), edge_ids[chained], hops[chained]))
+
+    frames = []
+    for code, anchors, edge_ids, hops in hits:
+        # Each hit edge counts for both of its endpoints that are accounts.
+        for account, other in ((edges.src[edge_ids], edges.dst[edge_ids]), (edges.dst[edge_ids], edges.src[edge_ids])):
+            frames.append(pd.DataFrame({
+                "account": account, "typology": CODES.index(code), "anchor": account == anchors, "edge": edge_ids,
+                "other": other, "amount": edges.amount[edge_ids], "timestamp": edges.timestamp[edge_ids], "hops": hops,
+            }))
+    rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["account", "typology", "anchor", "edge", "other", "amount", "timestamp", "hops"])
+    rows = rows[rows["account"] != EXTERNAL].drop_duplicates(["account", "typology", "edge"])
+
+    evidence = rows.groupby(["account", "typology"], sort=True).agg(
+        anchor=("anchor", "any"), transactions=("edge", "size"), amount=("amount", "sum"),
+        first_seen=("timestamp", "min"), last_seen=("timestamp", "max"),
+        counterparties=("other", "nunique"), hops=("hops", "max"),
+    ).reset_index()
+    evidence.insert(0, "account_id", np.asarray(edges.account_ids)[evidence["account"].to_numpy(dtype=np.int64)])
+    return evidence.drop(columns="account")
+
+
+# --- 3. Storage ---
+def save_typologies(path, evidence, source=""):
+    """
+    Writes the labels of each flagged account once (a bit mask over CODES)
+    plus its evidence rows, grouped by account in `account_ids` order.
+    """
+    account_ids, row_account = np.unique(evidence["account_id"].to_numpy(dtype=str), return_inverse=True)
+    labels = np.zeros(len(account_ids), dtype=np.uint8)
+    np.bitwise_or.at(labels, row_account, (1 << evidence["typology"].to_numpy()).astype(np.uint8))
+    order = np.argsort(row_account, kind="stable")
+    temp_path = f"{path}.tmp.npz"
+    np.savez(
+        temp_path,
+        account_ids=account_ids,
+        labels=labels,
+        indptr=np.r_[0, np.cumsum(np.bincount(row_account, minlength=len(account_ids)))],
+        codes=np.asarray(CODES),
+        source=np.asarray(source),
+        **{f"evidence_{column}": evidence[column].to_numpy()[order]
+           for column in ("typology", "anchor", "transactions", "amount", "first_seen", "last_seen",
+                          "counterparties", "hops")},
+    )
+    os.replace(temp_path, path)
+
+
+class TypologyStore:
+    """Read-only view over the persisted labels; a dict hit per lookup."""
+
+    def __init__(self, account_ids, labels, indptr, evidence, codes, source=""):
+        self.account_ids = account_ids
+        self.labels = labels
+        self.indptr = indptr
+        self.evidence = evidence
+        self.codes = codes
+        self.source = source
+        self._positions = {account_id: i for i, account_id in enumerate(account_ids.tolist())}
+
+    @classmethod
+    def load(cls, path=TYPOLOGY_LABELS_PATH):
+        with np.load(path) as data:
+            evidence = {name[len("evidence_"):]: data[name] for name in data.files if name.startswith("evidence_")}
+            return cls(data["account_ids"], data["labels"], data["indptr"], evidence, data["codes"].tolist(),
+                       str(data["source"]))
+
+    def __len__(self):
+        return len(self.account_ids)
+
+    def __contains__(self, account_id):
+        return account_id in self._positions
+
+    def evidence_of(self, account_id):
+        """Evidence rows of an account, the strongest first (anchor, then most transactions); [] if unflagged."""
+        position = self._positions.get(account_id)
+        if position is None:
+            return []
+        rows = []
+        for i in range(self.indptr[position], self.indptr[position + 1]):
+            code = self.codes[int(self.evidence["typology"][i])]
+            rows.append({
+                "typology": code,
+                "pattern_type": TYPOLOGY_NAMES.get(code, code.title()),
+                "anchor": bool(self.evidence["anchor"][i]),
+                "transactions": int(self.evidence["transactions"][i]),
+                "amount": float(self.evidence["amount"][i]),
+                "first_seen": int(self.evidence["first_seen"][i]),
+                "last_seen": int(self.evidence["last_seen"][i]),
+                "counterparties": int(self.evidence["counterparties"][i]),
+                "hops": int(self.evidence["hops"][i]),
+            })
+        rows.sort(key=lambda row: (not row["anchor"], -row["transactions"], self.codes.index(row["typology"])))
+        return rows
+
+
+# --- 4. Evaluation against the generator's labels ---
+def evaluate(evidence, transactions_df, account_ids):
+    """
+    Account-level precision and recall per typology. An account truly belongs
+    to a typology when it sends or receives any transaction the generator
+    labelled with it (merchant counterparties are not accounts).
+    """
+    accounts = set(account_ids)
+    report = {}
+    for i, code in enumerate(CODES):
+        planted = transactions_df[transactions_df["illicit_pattern_type"] == code]
+        truth = (set(planted["source_account"]) | set(planted["target_account"])) & accounts
+        flagged = set(evidence.loc[evidence["typology"] == i, "account_id"])
+        hits = len(truth & flagged)
+        report[code] = {
+            "flagged": len(flagged),
+            "planted": len(truth),
+            "precision": hits / len(flagged) if flagged else None,
+            "recall": hits / len(truth) if truth else None,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Label accounts with the typologies they take part in.")
+    parser.add_argument("--snapshot", action="store_true",
+                        help=f"Read {GRAPH_SNAPSHOT_PATH}/ instead of the generator CSVs (no mule bursts, no evaluation).")
+    parser.add_argument("--accounts", default="SynthDataGen/accounts.csv")
+    parser.add_argument("--transactions", default="SynthDataGen/transactions.csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    load_dotenv()
+    start_time = time.time()
+
+    transactions = None
+    if args.snapshot:
+        snapshot = GraphSnapshot.load(GRAPH_SNAPSHOT_PATH)
+        edges, source = edges_from_snapshot(snapshot), f"snapshot:{snapshot.content_hash[:12]}"
+    else:
+        accounts = pd.read_csv(args.accounts, usecols=["account_id"])
+        transactions = pd.read_csv(args.transactions, usecols=[
+            "source_account", "target_account", "timestamp", "amount_inr", "illicit_pattern_type"])
+        edges, source = edges_from_frame(accounts["account_id"], transactions), f"csv:{args.transactions}"
+    print(f"Loaded {len(edges.src)} transactions between {len(edges.account_ids)} accounts "
+          f"in {time.time() - start_time:.2f} seconds.")
+
+    detect_start = time.time()
+    evidence = detect_typologies(edges, workers=args.workers)
+    save_typologies(TYPOLOGY_LABELS_PATH, evidence, source=source)
+    print(f"Labelled {evidence['account_id'].nunique()} accounts ({len(evidence)} account/typology pairs) with "
+          f"{args.workers} workers in {time.time() - detect_start:.2f} seconds; saved to {TYPOLOGY_LABELS_PATH}.")
+
+    if transactions is not None:
+        print(json.dumps(evaluate(evidence, transactions, edges.account_ids.tolist()), indent=2))
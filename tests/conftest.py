@@ -0,0 +1,50 @@
+# tests/conftest.py
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+# Small enough to build in a few seconds, large enough for hubs and ties.
+TEST_ACCOUNTS = 300
+TEST_TRANSACTIONS = 1500
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory):
+    """
+    A generated dataset with every serving artifact built from it, the same
+    way the benchmarks build theirs (untrained, seeded weights). Shared and
+    read-only: tests that write to it use `dataset_copy`.
+    """
+    from benchmarks.datasets import build_artifacts
+
+    path = str(tmp_path_factory.mktemp("dataset"))
+    subprocess.run(
+        [sys.executable, os.path.join(REPO_ROOT, "SynthDataGen", "generate_data.py"),
+         "--accounts", str(TEST_ACCOUNTS), "--transactions", str(TEST_TRANSACTIONS),
+         "--workers", "1", "--out-dir", path],
+        check=True, capture_output=True,
+    )
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        build_artifacts(workers=1)
+    finally:
+        os.chdir(cwd)
+    return path
+
+
+@pytest.fixture(scope="module")
+def dataset_copy(dataset, tmp_path_factory):
+    """A private copy of `dataset`, made the working directory for the module."""
+    path = os.path.join(str(tmp_path_factory.mktemp("work")), "dataset")
+    shutil.copytree(dataset, path)
+    cwd = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(cwd)
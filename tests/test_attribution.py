@@ -0,0 +1,18 @@
+# tests/test_attribution.py
+from models.attribution import ExplanationCache
+
+
+def test_put_drops_results_of_accounts_discarded_after_begin():
+    cache = ExplanationCache(max_entries=10)
+    cache.discard(["ACC1"], 1)
+    since = cache.begin()
+    # Ingestion rescoring ACC2 while its explanation is being computed.
+    cache.discard(["ACC2"], 1)
+    cache.put("ACC1", 1, {"margin": 1.0}, since=since)
+    cache.put("ACC2", 1, {"margin": 2.0}, since=since)
+
+    assert cache.get("ACC1", 1) == {"margin": 1.0}
+    assert cache.get("ACC2", 1) is None
+
+    cache.put("ACC2", 1, {"margin": 3.0}, since=cache.begin())
+    assert cache.get("ACC2", 1) == {"margin": 3.0}
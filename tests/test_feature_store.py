@@ -0,0 +1,28 @@
+# tests/test_feature_store.py
+import os
+
+import numpy as np
+import pandas as pd
+
+from models.feature_store import FEATURE_COLUMNS, FeatureStore, FeatureStoreWriter
+
+
+def _commit(path, value, keep_versions):
+    writer = FeatureStoreWriter(path, keep_versions=keep_versions)
+    chunk = pd.DataFrame({column: [value, value] for column in FEATURE_COLUMNS})
+    chunk.insert(0, "account_id", ["ACC1", "ACC2"])
+    writer.append(chunk)
+    return writer.commit()
+
+
+def test_commit_keeps_current_plus_previous_versions(tmp_path):
+    path = str(tmp_path / "store")
+    for value in range(5):
+        version = _commit(path, float(value), keep_versions=2)
+
+    assert version == 5
+    assert sorted(name for name in os.listdir(path) if name.startswith("v")) == ["v0003", "v0004", "v0005"]
+    store = FeatureStore.open(path)
+    assert store.version == 5
+    np.testing.assert_array_equal(store.get_batch(["ACC2", "ACC1"]), np.full((2, len(FEATURE_COLUMNS)), 4.0))
+
@@ -0,0 +1,42 @@
+# tests/test_incremental_features.py
+import numpy as np
+import pandas as pd
+
+from models.incremental_features import IncrementalAggregator, check_consistency, full_recompute
+
+
+def _transactions(rng, accounts, n):
+    # Include transfers to an unknown account, which every path must skip.
+    pool = accounts + ["UNKNOWN"]
+    return pd.DataFrame({
+        "transaction_id": [f"TXN{rng.integers(1 << 40)}" for _ in range(n)],
+        "source_account": rng.choice(pool, n),
+        "target_account": rng.choice(pool, n),
+        "amount_inr": np.round(rng.uniform(1, 100000, n), 2),
+        "timestamp": "2024-06-01T10:00:00Z",
+    })
+
+
+def test_incremental_batches_match_full_recompute(tmp_path):
+    rng = np.random.default_rng(3)
+    accounts = [f"ACC{i:03d}" for i in range(60)]
+    initial_risk = rng.integers(0, 2, len(accounts))
+    batches = [_transactions(rng, accounts, int(n)) for n in rng.integers(1, 80, 12)]
+    # A retried batch is applied again; the history then holds it twice too.
+    batches.append(batches[4])
+
+    aggregator = IncrementalAggregator(accounts, initial_risk)
+    for batch in batches:
+        affected, skipped = aggregator.apply(batch)
+        known = batch["source_account"].isin(accounts) & batch["target_account"].isin(accounts)
+        assert skipped == int((~known).sum())
+        assert set(aggregator.account_index[affected]) == set(batch.loc[known, "source_account"]) | set(batch.loc[known, "target_account"])
+
+    history = pd.concat(batches, ignore_index=True)
+    report = check_consistency(aggregator, history)
+    assert report["ok"], report["mismatched_columns"]
+    pd.testing.assert_frame_equal(aggregator.features(), full_recompute(accounts, initial_risk, history).features())
+
+    path = str(tmp_path / "aggregates.npz")
+    aggregator.save(path)
+    pd.testing.assert_frame_equal(IncrementalAggregator.load(path).features(), aggregator.features())
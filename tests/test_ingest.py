@@ -0,0 +1,103 @@
+# tests/test_ingest.py
+import asyncio
+
+import httpx
+import pandas as pd
+import pytest
+
+import backend.main as main
+from backend.ingest import TransactionWriter
+from benchmarks.fake_neo4j import FakeNeo4jClient
+from models import predictor
+from models.graph_replica import GraphReplica
+from models.incremental_features import check_consistency
+from models.model_registry import ModelUnavailable
+
+
+class FlakyClient(FakeNeo4jClient):
+    """Fails the write calls numbered in `failing` (1-based), like a dropped connection."""
+
+    def __init__(self):
+        super().__init__(latency=0)
+        self.failing = set()
+        self.writes = 0
+
+    async def write(self, query, timeout=None, query_name="other", **params):
+        self.writes += 1
+        if self.writes in self.failing:
+            raise ConnectionError("connection lost mid-batch")
+        return await super().write(query, timeout=timeout, query_name=query_name, **params)
+
+
+@pytest.fixture(scope="module")
+def api(dataset_copy):
+    db = FlakyClient()
+    saved = main.db, main.transaction_writer, main.graph_replica
+    # Two rows per write batch, so one request spans several transactions.
+    main.db, main.transaction_writer = db, TransactionWriter(db, batch_size=2)
+    main.graph_replica = GraphReplica.load()
+    yield db
+    main.db, main.transaction_writer, main.graph_replica = saved
+
+
+def _post(rows):
+    async def go():
+        transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/transactions/ingest", json=rows)
+    return asyncio.run(go())
+
+
+def _rows(prefix, accounts, n):
+    return [{"transaction_id": f"{prefix}-{i}", "source_account": accounts[i % len(accounts)],
+             "target_account": accounts[(i + 1) % len(accounts)], "amount_inr": 100.25 + i,
+             "timestamp": "2024-06-01T10:00:00Z"} for i in range(n)]
+
+
+def _assert_applied_once(ingested):
+    # The aggregates must equal a recompute over the dataset plus every
+    # ingested row, each counted exactly once.
+    history = pd.concat([pd.read_csv("transactions.csv"), pd.DataFrame(ingested)], ignore_index=True)
+    report = check_consistency(predictor._aggregator, history)
+    assert report["ok"], report["mismatched_columns"]
+    for row in ingested:
+        page, _ = main.graph_replica.transaction_page(row["source_account"], "out", limit=1000)
+        assert [r["transaction_id"] for r in page].count(row["transaction_id"]) == 1
+
+
+def test_failed_batch_then_retry_applies_every_row_once(api):
+    accounts = pd.read_csv("accounts.csv")["account_id"].tolist()[:4]
+    rows = _rows("FAIL", accounts, 6)
+
+    api.failing = {api.writes + 2}
+    response = _post(rows)
+    assert response.status_code == 500
+    # Batches 1 and 3 committed; they are folded in even though the request failed.
+    _assert_applied_once([r for i, r in enumerate(rows) if i not in (2, 3)])
+
+    response = _post(rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["written"] == 2
+    assert sorted(r["transaction_id"] for r in body["rejected"]) == ["FAIL-0", "FAIL-1", "FAIL-4", "FAIL-5"]
+    _assert_applied_once(rows)
+
+
+def test_failed_apply_then_retry_applies_committed_rows(api, monkeypatch):
+    accounts = pd.read_csv("accounts.csv")["account_id"].tolist()[10:13]
+    rows = _rows("APPLY", accounts, 3)
+    before = _rows("FAIL", pd.read_csv("accounts.csv")["account_id"].tolist()[:4], 6)
+
+    def unavailable(_):
+        raise ModelUnavailable("models are reloading")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(main, "apply_transactions", unavailable)
+        assert _post(rows).status_code == 503
+    _assert_applied_once(before)
+
+    # Neo4j already has the rows, so the retry finds them as duplicates and applies them.
+    body = _post(rows).json()
+    assert (body["accepted"], body["written"], body["rejected"]) == (3, 0, [])
+    assert not main.unapplied_transactions
+    _assert_applied_once(before + rows)
@@ -0,0 +1,40 @@
+# tests/test_khop_inference.py
+import dgl
+import numpy as np
+import torch
+from sklearn.preprocessing import StandardScaler
+
+from models.khop_inference import LOGIT_TOLERANCE, InNeighborIndex, KHopScorer
+from models.train_gcn import GCN
+
+
+def _full_logits(model, src, dst, num_nodes, x):
+    graph = dgl.add_self_loop(dgl.graph((torch.as_tensor(src), torch.as_tensor(dst)), num_nodes=num_nodes))
+    with torch.no_grad():
+        return model(graph, torch.as_tensor(x, dtype=torch.float32)).numpy()
+
+
+def test_khop_logits_match_full_graph_before_and_after_add_edges():
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    num_nodes, num_edges = 200, 800
+    # Repeated transfers between the same pair are kept as parallel edges.
+    src = rng.integers(0, num_nodes, num_edges)
+    dst = rng.integers(0, num_nodes, num_edges)
+    raw = rng.lognormal(size=(num_nodes, 6))
+    scaler = StandardScaler().fit(raw)
+    x = scaler.transform(raw)
+    model = GCN(in_feats=raw.shape[1], h_feats=16, num_classes=2).eval()
+
+    node_map = {f"ACC{i:04d}": i for i in range(num_nodes)}
+    account_ids = list(node_map)
+    scorer = KHopScorer(InNeighborIndex(src, dst, num_nodes), node_map, raw, scaler, model.state_dict(),
+                        fanout_cap=None)
+    full = _full_logits(model, src, dst, num_nodes, x)
+    assert np.abs(scorer.logits(account_ids) - full).max() <= LOGIT_TOLERANCE
+
+    new_src = rng.integers(0, num_nodes, 50)
+    new_dst = rng.integers(0, num_nodes, 50)
+    scorer.adjacency.add_edges(new_src, new_dst)
+    full = _full_logits(model, np.concatenate([src, new_src]), np.concatenate([dst, new_dst]), num_nodes, x)
+    assert np.abs(scorer.logits(account_ids) - full).max() <= LOGIT_TOLERANCE
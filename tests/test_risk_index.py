@@ -0,0 +1,34 @@
+# tests/test_risk_index.py
+import numpy as np
+import pandas as pd
+
+from models.risk_index import RiskIndex
+
+
+def _reference(account_ids, scores):
+    # What a rebuild would give: a full stable sort, ties in build order.
+    order = np.argsort(-scores, kind="stable")
+    ranks = {account_ids[p]: rank for rank, p in enumerate(order, start=1)}
+    return order, ranks
+
+
+def test_update_scores_matches_full_stable_sort():
+    rng = np.random.default_rng(7)
+    account_ids = np.array([f"ACC{i:04d}" for i in range(500)], dtype=object)
+    # Few distinct values, so most updates land inside runs of ties.
+    scores = rng.integers(0, 10, len(account_ids)) / 10
+    index = RiskIndex(pd.DataFrame(index=account_ids), scores=scores)
+
+    for _ in range(50):
+        changed = rng.integers(0, len(account_ids), rng.integers(1, 20))
+        new_scores = rng.integers(0, 10, len(changed)) / 10
+        index.update_scores(account_ids[changed].tolist(), new_scores)
+        # An account listed twice keeps its last score.
+        for position, score in zip(changed, new_scores):
+            scores[position] = score
+
+        order, ranks = _reference(account_ids, scores)
+        assert index.top_n(len(account_ids)) == list(zip(account_ids[order].tolist(), scores[order].tolist()))
+        for account_id in account_ids[rng.integers(0, len(account_ids), 25)]:
+            assert index.rank_of(account_id) == ranks[account_id]
+    assert index.rank_of("MISSING") is None